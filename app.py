@@ -1,27 +1,66 @@
 # -----------------------------------------------------------------------------
 # Panel de mortalidad — Colombia (demo)
 #   - Visión general: Barras + Mapa (datos demo a partir del GeoJSON local)
-#   - Municipios (torta): 10 departamentos; municipios desde Excel en ./data
+#   - Municipios (torta): Top N del departamento del filtro (o del país) y el resto en "Otros";
+#       todos los municipios de DIVIPOLA (top_municipios.py); nombres desde Excel en ./data
 #       (Columnas buscadas por similitud: Departamento y Municipio)
 #   - Causas (Top 10): Tabla con código, nombre y total de casos (desde ./data)
 #   - Muertes por sexo (barras apiladas): Comparación H/M por departamento
 #   - Distribución por edad (histograma): GRUPO_EDAD1 con categorías y rangos
 #   - Tendencia mensual (líneas): Total nacional por mes (interactiva)
+#   - Filtro compartido sobre las pestañas (departamento, sexo, edad, mes, capítulo):
+#     se elige en la barra o con un clic en el mapa, las barras por sexo, edad o mes;
+#     los cruces salen del índice de mapas de bits (indice_bits.py)
 # -----------------------------------------------------------------------------
 
-from dash import Dash, html, dcc, dash_table
-from dash.dependencies import Input, Output
-import plotly.express as px
+from dash import Dash, html, dcc, dash_table, no_update, callback_context
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from flask import request
+import plotly.graph_objects as go
+from plotly.colors import sequential
 import pandas as pd
 import numpy as np
 import json
+import functools
+import hashlib
 from pathlib import Path
 import unicodedata
 import os
+import zlib
+import time
+from cache_datos import version_fuentes
+from microdatos import NOMBRE_DPTO, _norm_col, archivos_microdatos
+from divipola import DPTOS, Divipola, cod_dpto, cargar_divipola, con_departamento
+import cache_figuras
+import metricas
+import compacto
+import preparacion
+import exportar
+import trabajos
+import instantaneas
+from cubo import cargar_cubo, TOTAL as COD_TOTAL
+from indice_bits import cargar_indice
+from causas_cie10 import buscar_anexo, cargar_catalogo
+from tabla_causas import TablaCausas
+from top_municipios import TopMunicipios, top_n
+from series import ANCHO_DEFECTO, RESOLUCIONES, Series
 
 # =============================================================================
 # Utilidades
 # =============================================================================
+# Duración (s) de cada fase de carga del módulo; benchmark.py la reporta
+FASES_ARRANQUE = {}
+_t_fase = time.perf_counter()
+
+def _fase(nombre: str) -> None:
+    global _t_fase
+    ahora = time.perf_counter()
+    FASES_ARRANQUE[nombre] = ahora - _t_fase
+    _t_fase = ahora
+
+# Duración (s) de cada conjunto de datos armado con @preparacion.dato (cubo y pestañas)
+FASES_DATOS = preparacion.DURACIONES
+
 def _norm(s: str) -> str:
     if s is None:
         return ""
@@ -31,42 +70,9 @@ def _norm(s: str) -> str:
     s = " ".join(s.split())
     return s
 
-def _leer_divipola_desde_excel(data_dir: Path) -> pd.DataFrame:
-    if not data_dir.exists():
-        return pd.DataFrame()
-    frames = []
-    for p in data_dir.glob("*.xlsx"):
-        try:
-            sheets = pd.read_excel(p, sheet_name=None, engine="openpyxl")
-        except Exception:
-            continue
-        for _, df in sheets.items():
-            if not isinstance(df, pd.DataFrame) or df.empty:
-                continue
-            norm_cols = {_norm(c): c for c in df.columns}
-            dep_key = None
-            for k, original in norm_cols.items():
-                if any(t in k for t in ["DEPART", "DEPTO", "DPTO", "DEPARTAMENTO"]):
-                    dep_key = original; break
-            mun_key = None
-            for k, original in norm_cols.items():
-                if any(t in k for t in ["MUNICIP", "MPIO", "MUNICIPIO"]):
-                    mun_key = original; break
-            if dep_key and mun_key:
-                tmp = df[[dep_key, mun_key]].copy()
-                tmp.columns = ["DEPARTAMENTO", "MUNICIPIO"]
-                tmp = tmp.dropna()
-                if not tmp.empty:
-                    frames.append(tmp)
-    if not frames:
-        return pd.DataFrame()
-    out = pd.concat(frames, ignore_index=True).dropna()
-    out["DEPARTAMENTO"] = out["DEPARTAMENTO"].astype(str).str.strip()
-    out["MUNICIPIO"] = out["MUNICIPIO"].astype(str).str.strip()
-    out["DEP_NORM"] = out["DEPARTAMENTO"].map(_norm)
-    out["MUN_NORM"] = out["MUNICIPIO"].map(_norm)
-    out = out[(out["DEP_NORM"] != "") & (out["MUN_NORM"] != "")]
-    return out.drop_duplicates(subset=["DEP_NORM", "MUN_NORM"])
+def _semilla(s: str) -> int:
+    # Semilla estable entre procesos (hash() de Python cambia en cada worker)
+    return zlib.crc32(_norm(s).encode("utf-8"))
 
 # ====== lector de causas (CSV/XLSX) con encabezados flexibles =========
 def _norm_low(s: str) -> str:
@@ -77,7 +83,7 @@ def _norm_low(s: str) -> str:
     s = " ".join(s.split())
     return s
 
-def _leer_causas_desde_data(data_dir: Path) -> pd.DataFrame:
+def _leer_causas_desde_data(data_dir: Path, catalogo=None) -> pd.DataFrame:
     csv_path  = data_dir / "causas_mortalidad.csv"
     xlsx_path = data_dir / "causas_mortalidad.xlsx"
     if csv_path.exists():
@@ -93,6 +99,9 @@ def _leer_causas_desde_data(data_dir: Path) -> pd.DataFrame:
                 "Accidente cerebrovascular","Sepsis","Accidentes de transporte"],
             "CASOS": [18234,15012,14320,13980,13210,9105,8702,8540,8012,7925]
         })
+        if catalogo is not None:
+            # nombres oficiales del Anexo2 (CIE-10) para los códigos del respaldo
+            df["NOMBRE"] = [catalogo.nombre(c) or n for c, n in zip(df["CODIGO"], df["NOMBRE"])]
     cnorm = {_norm_low(c): c for c in df.columns}
     cod_col = next((cnorm[c] for c in cnorm if any(k in c for k in ["cod","codigo","code"])), None) or "CODIGO"
     nom_col = next((cnorm[c] for c in cnorm if any(k in c for k in ["nombre","causa","descripcion"])), None) or "NOMBRE"
@@ -113,6 +122,7 @@ DATA_DIR = BASE / "data"
 FILE_GEO = DATA_DIR / "departamentos.geojson"
 with open(FILE_GEO, "r", encoding="utf-8") as f:
     geo = json.load(f)
+_fase("geojson")
 
 rows = []
 for feat in geo.get("features", []):
@@ -124,6 +134,7 @@ for feat in geo.get("features", []):
         if nombre and lat is not None and lon is not None:
             rows.append({"NOMBRE_DPT": nombre.strip(), "LAT": float(lat), "LON": float(lon)})
 df_map = pd.DataFrame(rows).dropna().sort_values("NOMBRE_DPT").reset_index(drop=True)
+df_map["COD_DPTO"] = DPTOS.codigos(df_map["NOMBRE_DPT"])   # el GeoJSON trae nombres, no códigos
 
 base_val, paso = 60, 2
 df_map["MUERTES"] = [base_val + i * paso for i in range(len(df_map))]
@@ -137,104 +148,309 @@ dept_month_rows = []
 for _, r in df_map.iterrows():
     muertes_mes = (r["MUERTES"] * pesos).round().astype(int)
     for mes, val in zip(MESES, muertes_mes):
-        dept_month_rows.append({"NOMBRE_DPT": r["NOMBRE_DPT"], "MES": mes, "MUERTES": int(val)})
+        dept_month_rows.append({"COD_DPTO": r["COD_DPTO"], "MES": mes, "MUERTES": int(val)})
 dept_month = pd.DataFrame(dept_month_rows)
+_fase("demo_mensual")
+
+# ====== Cubo pre-agregado de microdatos DANE (python precalcular.py); si no hay, demo
+# MORTALIDAD_MICRODATOS apunta a otro directorio (p. ej. los sintéticos de sinteticos.py)
+MICRO_DIR = Path(os.environ.get("MORTALIDAD_MICRODATOS", DATA_DIR / "microdatos"))
+def _cod_dpto(dep) -> int:
+    # valor de los controles: código DANE (0 = total nacional); un nombre (p. ej. de
+    # una sesión guardada antes de usar códigos) se resuelve con el índice de DIVIPOLA
+    if dep in (None, "Todos", "__COL__"):
+        return COD_TOTAL
+    return cod_dpto(dep)
+
+def _nombre_dpto(cod: int, total: str = "Todos") -> str:
+    return total if cod == COD_TOTAL else NOMBRE_DPTO.get(cod, str(cod))
+
+def opciones_dpto() -> list[dict]:
+    # opciones de los controles de departamento, en orden alfabético: los del cubo
+    # (incluye Bogotá, que el GeoJSON no trae); sin cubo (demo o aún cargando), los del mapa
+    c = cubo() if preparacion.lista("cubo") else None
+    cods = [d for d in c.idx_dpto if d != COD_TOTAL] if c is not None else df_map["COD_DPTO"]
+    return sorted(({"label": _nombre_dpto(int(d)), "value": int(d)} for d in cods),
+                  key=lambda o: _norm_col(o["label"]))
+
+# Los datos derivados de ./data no son globales del módulo: cada función los
+# pide a preparacion (foto de la petición) y se rearman si cambian sus archivos
+@preparacion.dato("cubo", fuentes=lambda: archivos_microdatos(MICRO_DIR))
+def cubo():
+    # Primero en la carga en segundo plano: todas las pestañas lo usan
+    return cargar_cubo(MICRO_DIR)
+
+def hay_micro() -> bool:
+    return cubo() is not None
+
+@preparacion.dato("indice", fuentes=lambda: archivos_microdatos(MICRO_DIR))
+def indice():
+    # mapas de bits del filtro compartido (precalcular.py, etapa "indice")
+    return cargar_indice(MICRO_DIR)
+
+# ====== Filtro compartido: {"dpto": código (0 = todos), "sexo" / "edad" / "mes" /
+# "capitulo": índices de los ejes del cubo ([] = sin filtro)}; assets/panel.js lo arma
+# en el Store "filtro" a partir de la barra de filtros y de los clics en las figuras
+EJES_FILTRO = ("sexo", "edad", "mes", "capitulo")
+SEXOS = ["Hombres", "Mujeres", "Otro / sin dato"]   # índice SEXO del cubo
+CAPITULOS_CIE10 = {
+    1: "I · Infecciosas y parasitarias", 2: "II · Tumores", 3: "III · Sangre e inmunidad",
+    4: "IV · Endocrinas y metabólicas", 5: "V · Trastornos mentales", 6: "VI · Sistema nervioso",
+    7: "VII · Ojo", 8: "VIII · Oído", 9: "IX · Sistema circulatorio", 10: "X · Sistema respiratorio",
+    11: "XI · Sistema digestivo", 12: "XII · Piel", 13: "XIII · Sistema osteomuscular",
+    14: "XIV · Sistema genitourinario", 15: "XV · Embarazo, parto y puerperio", 16: "XVI · Perinatales",
+    17: "XVII · Malformaciones congénitas", 18: "XVIII · Síntomas mal definidos",
+    19: "XIX · Traumatismos y envenenamientos", 20: "XX · Causas externas",
+    21: "XXI · Contacto con servicios de salud", 22: "XXII · Propósitos especiales",
+}
+
+def _filtro(f, *propios) -> dict:
+    # Store -> argumentos de IndiceBits.filas. `propios`: ejes que la figura muestra;
+    # no se recortan (el clic en ellos filtra las demás pestañas)
+    f = f or {}
+    out = {}
+    cod = _cod_dpto(f.get("dpto"))
+    if cod != COD_TOTAL and "dpto" not in propios:
+        out["dpto"] = [cod]
+    if not hay_micro():
+        return out      # el demo solo tiene el departamento
+    for eje in EJES_FILTRO:
+        if f.get(eje) and eje not in propios:
+            out[eje] = sorted(int(v) for v in f[eje])
+    return out
+
+def _sin_cruces(filtro: dict) -> bool:
+    # solo el departamento (o nada): lo responden los totales ya sumados del cubo
+    return filtro.keys() <= {"dpto"}
+
+def contar(filtro: dict, por=()) -> np.ndarray:
+    # muertes del filtro por los ejes `por` (AND/OR de mapas de bits y np.bincount);
+    # dentro de un trabajo en segundo plano se puede cancelar entre bloques
+    return indice().contar(por, revisar=trabajos.revisar, **filtro)
+
+def _texto_filtro(filtro: dict) -> str:
+    # "Mujeres · 60 a 84 años · Capítulo IX" para títulos y tarjetas
+    partes = [", ".join(_nombre_dpto(d) for d in filtro.get("dpto", []))]
+    partes += [", ".join(SEXOS[v] for v in filtro.get("sexo", []))]
+    partes += [", ".join(EDAD_REF[v]["RANGO"] for v in filtro.get("edad", []))]
+    partes += [", ".join(MESES[v - 1] if v else "mes sin dato" for v in filtro.get("mes", []))]
+    partes += [", ".join("Capítulo " + CAPITULOS_CIE10.get(v, str(v)).split(" · ")[0]
+                         for v in filtro.get("capitulo", []))]
+    return " · ".join(p for p in partes if p)
+
+@preparacion.dato("mapa", depende=("cubo",))
+def mapa() -> pd.DataFrame:
+    # df_map con las muertes del cubo (copia: df_map no cambia, es la base demo)
+    c = cubo()
+    if c is None:
+        return df_map
+    out = df_map.copy()
+    out["MUERTES"] = out["COD_DPTO"].map(c.totales_dpto()).fillna(0).astype(int)
+    return out
+
+if not preparacion.EN_FONDO:
+    mapa()
+_fase("cubo")
 national_month = dept_month.groupby("MES", as_index=False)["MUERTES"].sum()
 
-def fig_barras(dep: str, metrica: str):
-    if dep == "Todos":
-        g = national_month.copy(); titulo = "Distribución de defunciones por mes (Total)"
+def serie_mes(f) -> pd.DataFrame:
+    # Muertes por mes (12 filas, en el orden de MESES) con el filtro compartido (sin su mes)
+    c, filtro, cod = cubo(), _filtro(f, "mes"), _cod_dpto((f or {}).get("dpto"))
+    if c is not None:
+        vals = c.sumar(por=("MES",), dpto=cod) if _sin_cruces(filtro) else contar(filtro, ("MES",))
+        return pd.DataFrame({"MES": MESES, "MUERTES": vals[1:13]})
+    if cod == COD_TOTAL:
+        g = national_month
     else:
-        g = dept_month[dept_month["NOMBRE_DPT"] == dep].copy()
-        if g.empty: g = pd.DataFrame({"MES": MESES, "MUERTES": 0})
-        titulo = f"Distribución de defunciones por mes ({dep})"
+        g = dept_month[dept_month["COD_DPTO"] == cod]
+    return g.groupby("MES")["MUERTES"].sum().reindex(MESES, fill_value=0).reset_index()
+
+ANO_DEMO = 2019   # año de los anexos del DANE: la serie demo cubre solo ese año
+
+@preparacion.dato("series", depende=("cubo",))
+def series_tiempo() -> Series:
+    # Matriz departamento × mes corrido (todos los años) para la pestaña de tendencia
+    c = cubo()
+    if c is not None:
+        return Series.desde_cubo(c)
+    t = dept_month.pivot_table(index="COD_DPTO", columns="MES", values="MUERTES", aggfunc="sum")[MESES]
+    meses = np.arange(np.datetime64(f"{ANO_DEMO}-01"), np.datetime64(f"{ANO_DEMO + 1}-01"))
+    return Series([COD_TOTAL, *t.index], meses, np.vstack([t.sum().to_numpy(), t.to_numpy()]))
+
+def series_filtradas(filtro: dict) -> Series:
+    # la misma matriz con un filtro de sexo, edad, mes o capítulo (del índice de bits)
+    ix = indice()
+    m = contar(filtro, ("DPTO", "ANO", "MES"))
+    return Series.desde_conteos([COD_TOTAL, *ix.dptos], ix.eje_ano, np.concatenate([m.sum(axis=0)[None], m]))
+
+RESALTE = "#E4572E"   # barras del valor elegido en el filtro compartido
+
+def fig_barras(f, metrica: str):
+    g = serie_mes(f)
+    texto = _texto_filtro(_filtro(f, "mes"))
+    titulo = f"Distribución de defunciones por mes ({texto or 'Total'})"
+    elegidos = set((f or {}).get("mes") or [])
     if metrica == "indice":
         max_val = g["MUERTES"].max()
         g["VAL"] = 0 if max_val == 0 else (g["MUERTES"] / max_val) * 100.0
         ylab = "Índice relativo (demo)"
     else:
         g["VAL"] = g["MUERTES"]; ylab = "Muertes (n)"
-    fig = px.bar(g, x="MES", y="VAL", title=titulo, labels={"VAL": ylab, "MES": "MES"})
-    fig.update_layout(xaxis=dict(categoryorder="array", categoryarray=MESES),
-                      margin=dict(l=20, r=20, t=60, b=20))
-    fig.update_traces(marker_color="#5A78FF")
+    with metricas.fase("figura"):
+        colores = [RESALTE if i in elegidos else "#5A78FF" for i in range(1, 13)]
+        fig = go.Figure(go.Bar(x=g["MES"], y=g["VAL"], name="", showlegend=False, marker_color=colores,
+                               hovertemplate=f"MES=%{{x}}<br>{ylab}=%{{y}}<extra></extra>"))
+        fig.update_layout(title=titulo, xaxis=dict(title="MES", categoryorder="array", categoryarray=MESES),
+                          yaxis_title=ylab, margin=dict(l=20, r=20, t=60, b=20))
     return fig, g
 
-def kpis(g: pd.DataFrame, metrica: str) -> str:
-    total = int(g["MUERTES"].sum())
-    if len(g):
-        idx_max = g["VAL"].astype(float).idxmax(); idx_min = g["VAL"].astype(float).idxmin()
-        pico_mes, pico_val = g.loc[idx_max, "MES"], g.loc[idx_max, "VAL"]
-        mini_mes, mini_val = g.loc[idx_min, "MES"], g.loc[idx_min, "VAL"]
-    else:
-        pico_mes, pico_val, mini_mes, mini_val = "-", 0, "-", 0
-    if metrica == "muertes":
-        pico_txt = f"{pico_mes}: {int(float(pico_val)):,}"
-        min_txt  = f"{mini_mes}: {int(float(mini_val)):,}"
-    else:
-        pico_txt = f"{pico_mes}: {float(pico_val):.1f}"
-        min_txt  = f"{mini_mes}: {float(mini_val):.1f}"
-    return f"Total anual: {total:,} — Pico: {pico_txt} — Mínimo: {min_txt}"
-
-def fig_mapa(df_plot: pd.DataFrame, depto: str | None):
-    fig = px.scatter_mapbox(
-        df_plot, lat="LAT", lon="LON", size="MUERTES", color="MUERTES",
-        color_continuous_scale="Reds", size_max=35, zoom=4.3 if not depto else 5.2,
-        height=540, hover_name="NOMBRE_DPT",
-        hover_data={"MUERTES": True, "LAT": False, "LON": False},
-    )
-    fig.update_traces(text=df_plot.get("LABEL"), textposition="top center",
-                      textfont=dict(size=12, color="#222"),
-                      hovertemplate="<b>%{text}</b><br>Muertes: %{marker.size:,}<extra></extra>")
-    fig.update_layout(mapbox_style="open-street-map",
-                      margin=dict(l=20, r=20, t=60, b=20),
-                      coloraxis_colorbar=dict(title="MUERTES"))
-    return fig
+ROJOS = [[i / (len(sequential.Reds) - 1), c] for i, c in enumerate(sequential.Reds)]   # = px "Reds"
+
+def _geometria_mapa() -> bytes:
+    # Lo fijo del mapa (puntos de los departamentos y figura base sin valores): viaja una
+    # sola vez, por /geometria/<versión>.json; cada actualización manda solo las muertes
+    # de cada punto (en este orden) y cuál resaltar (assets/panel.js arma la figura)
+    # graph_objects y no px: la pestaña inicial no espera la importación de plotly.express
+    fig = go.Figure(go.Scattermapbox(
+        mode="markers", name="", showlegend=False,
+        marker=dict(coloraxis="coloraxis", sizemode="area"),
+        textposition="top center", textfont=dict(size=12, color="#222"),
+        hovertemplate="<b>%{text}</b> (%{customdata})<br>Muertes: %{marker.size:,}<extra></extra>",
+    ))
+    fig.update_layout(mapbox=dict(style="open-street-map"),
+                      coloraxis=dict(colorscale=ROJOS, colorbar=dict(title="MUERTES")),
+                      height=540, margin=dict(l=20, r=20, t=60, b=20))
+    geo = {"cod": df_map["COD_DPTO"].astype(int).tolist(), "texto": df_map["LABEL"].tolist(),
+           "lat": df_map["LAT"].tolist(), "lon": df_map["LON"].tolist(), "fig": compacto.figura(fig)}
+    return json.dumps(geo, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+GEOMETRIA_MAPA = _geometria_mapa()
+VERSION_GEOMETRIA = hashlib.sha1(GEOMETRIA_MAPA).hexdigest()[:12]
 
 # =============================================================================
-# Municipios (desde Excel) + Respaldo para 10 departamentos
+# Municipios: todos los de DIVIPOLA (Excel) con sus muertes; respaldo para 10 departamentos
 # =============================================================================
-DIVI = _leer_divipola_desde_excel(DATA_DIR)
-TARGET_DEPS = ["Cundinamarca","Antioquia","Valle del Cauca","Atlántico","Bolívar","Boyacá","Santander","Cauca","Nariño","Tolima"]
-BACKUP_RAW = {
-    "Cundinamarca":["Bogotá D.C.","Soacha","Chía","Zipaquirá","Facatativá","Fusagasugá","Girardot","Madrid","Mosquera","Villeta","La Mesa","Cajicá","Sibaté","Tocancipá","Funza"],
-    "Antioquia":["Medellín","Bello","Itagüí","Envigado","Rionegro","Turbo","Apartadó","La Estrella","Caldas","Sabaneta","Copacabana","Girardota","La Ceja","Marinilla","Santa Rosa de Osos"],
-    "Valle del Cauca":["Cali","Palmira","Buenaventura","Tuluá","Buga","Cartago","Yumbo","Jamundí","Candelaria","Sevilla","Zarzal","Caicedonia","La Unión","Roldanillo","Guacarí"],
-    "Atlántico":["Barranquilla","Soledad","Malambo","Sabanalarga","Galapa","Puerto Colombia","Baranoa","Palmar de Varela","Santo Tomás","Ponedera","Polonuevo","Candelaria","Luruaco","Campo de la Cruz","Juan de Acosta"],
-    "Bolívar":["Cartagena","Magangué","Arjona","Turbaco","El Carmen de Bolívar","San Juan Nepomuceno","Mompós","María La Baja","San Jacinto","San Estanislao","Cicuco","Santa Rosa","Villanueva","Arenal","Clemencia"],
-    "Boyacá":["Tunja","Sogamoso","Duitama","Chiquinquirá","Moniquirá","Paipa","Nobsa","Samacá","Tota","Soatá","Garagoa","Puerto Boyacá","Villa de Leyva","Tibasosa","Tenza"],
-    "Santander":["Bucaramanga","Floridablanca","Girón","Piedecuesta","Barrancabermeja","San Gil","Socorro","Barbosa","Vélez","Málaga","Cimitarra","Lebrija","Puerto Wilches","Rionegro","Zapatoca"],
-    "Cauca":["Popayán","Santander de Quilichao","Puerto Tejada","Guachené","Miranda","Patía","Timbío","Piendamó","El Tambo","Morales","Caloto","Toribío","Silvia","Puracé","Inzá"],
-    "Nariño":["Pasto","Tumaco","Ipiales","Túquerres","Samaniego","Mallama","Barbacoas","La Unión","Sandoná","El Charco","Buesaco","Cumbal","Aldana","La Tola","Olaya Herrera"],
-    "Tolima":["Ibagué","Espinal","Honda","Melgar","Lérida","Mariquita","Chaparral","Líbano","Fresno","Guamo","Coello","Coyaima","Natagaima","Saldaña","Purificación"],
+# Respaldo de municipios por código de departamento (sin Excel DIVIPOLA): 10 departamentos
+BACKUP = {
+    25:["Bogotá D.C.","Soacha","Chía","Zipaquirá","Facatativá","Fusagasugá","Girardot","Madrid","Mosquera","Villeta","La Mesa","Cajicá","Sibaté","Tocancipá","Funza"],   # Cundinamarca
+    5:["Medellín","Bello","Itagüí","Envigado","Rionegro","Turbo","Apartadó","La Estrella","Caldas","Sabaneta","Copacabana","Girardota","La Ceja","Marinilla","Santa Rosa de Osos"],   # Antioquia
+    76:["Cali","Palmira","Buenaventura","Tuluá","Buga","Cartago","Yumbo","Jamundí","Candelaria","Sevilla","Zarzal","Caicedonia","La Unión","Roldanillo","Guacarí"],   # Valle del Cauca
+    8:["Barranquilla","Soledad","Malambo","Sabanalarga","Galapa","Puerto Colombia","Baranoa","Palmar de Varela","Santo Tomás","Ponedera","Polonuevo","Candelaria","Luruaco","Campo de la Cruz","Juan de Acosta"],   # Atlántico
+    13:["Cartagena","Magangué","Arjona","Turbaco","El Carmen de Bolívar","San Juan Nepomuceno","Mompós","María La Baja","San Jacinto","San Estanislao","Cicuco","Santa Rosa","Villanueva","Arenal","Clemencia"],   # Bolívar
+    15:["Tunja","Sogamoso","Duitama","Chiquinquirá","Moniquirá","Paipa","Nobsa","Samacá","Tota","Soatá","Garagoa","Puerto Boyacá","Villa de Leyva","Tibasosa","Tenza"],   # Boyacá
+    68:["Bucaramanga","Floridablanca","Girón","Piedecuesta","Barrancabermeja","San Gil","Socorro","Barbosa","Vélez","Málaga","Cimitarra","Lebrija","Puerto Wilches","Rionegro","Zapatoca"],   # Santander
+    19:["Popayán","Santander de Quilichao","Puerto Tejada","Guachené","Miranda","Patía","Timbío","Piendamó","El Tambo","Morales","Caloto","Toribío","Silvia","Puracé","Inzá"],   # Cauca
+    52:["Pasto","Tumaco","Ipiales","Túquerres","Samaniego","Mallama","Barbacoas","La Unión","Sandoná","El Charco","Buesaco","Cumbal","Aldana","La Tola","Olaya Herrera"],   # Nariño
+    73:["Ibagué","Espinal","Honda","Melgar","Lérida","Mariquita","Chaparral","Líbano","Fresno","Guamo","Coello","Coyaima","Natagaima","Saldaña","Purificación"],   # Tolima
 }
-BACKUP = {_norm(k): v for k, v in BACKUP_RAW.items()}
 
-def municipios_por_departamento(dep: str) -> list[str]:
-    dep_norm = _norm(dep)
-    if not DIVI.empty:
-        m = (DIVI[DIVI["DEP_NORM"] == dep_norm].sort_values("MUN_NORM")["MUNICIPIO"].astype(str).unique().tolist())
-        if m: return m
-    return BACKUP.get(dep_norm, [])
+@preparacion.dato("divipola_excel", fuentes=lambda: DATA_DIR.glob("*.xlsx"))
+def divipola() -> Divipola:
+    # Municipios por código de 5 dígitos: nombres para las etiquetas del cubo municipal
+    return cargar_divipola(DATA_DIR)
+
+def _muertes_demo(dpto: int, nombre: str) -> int:
+    # valor demo de un municipio, estable entre procesos (pocos municipios grandes, muchos chicos)
+    rng = np.random.default_rng(_semilla(f"{dpto}-{nombre}"))
+    return max(1, int(round(rng.lognormal(mean=4.2, sigma=0.9))))
+
+@preparacion.dato("municipios", depende=("cubo", "divipola_excel"))
+def municipios() -> TopMunicipios:
+    # Agregado de la torta: cada municipio de DIVIPOLA (0 si no tiene muertes) más los
+    # códigos del cubo municipal que DIVIPOLA no tenga; sin microdatos, valores demo
+    d, c = divipola(), cubo()
+    cods = d.municipios.index.to_numpy(dtype=np.int64)
+    if c is not None:
+        n = pd.Series(np.asarray(c.mun_totales, dtype=np.int64),
+                      index=c.mun_dpto.astype(np.int64) * 1000 + c.mun_cod.astype(np.int64))
+        cods = np.union1d(cods, n.index.to_numpy())
+        return TopMunicipios(cods // 1000, cods, d.nombres(cods), n.reindex(cods, fill_value=0).to_numpy(),
+                             d.etiquetas(cods))
+    if d.vacia:
+        filas = [(dpto, -1, nombre) for dpto, muns in BACKUP.items() for nombre in muns]
+    else:
+        filas = list(zip(d.municipios["COD_DPTO"], cods, d.municipios["MUNICIPIO"]))
+    dptos, cods, nombres = (list(v) for v in zip(*filas))
+    return TopMunicipios(dptos, cods, nombres, [_muertes_demo(dp, m) for dp, m in zip(dptos, nombres)],
+                         con_departamento(nombres, dptos))
+
+def top_municipios(f, n: int) -> tuple[list[str], np.ndarray, int, int]:
+    # Top N del departamento del filtro (o del país) y el resto ("Otros"): muertes y municipios
+    filtro = _filtro(f)
+    if _sin_cruces(filtro):
+        return municipios().top(filtro["dpto"][0] if filtro else COD_TOTAL, n)
+    cods, valores, otros, n_otros = top_n(indice().mpio_cod, contar(filtro, ("MPIO",)), n)
+    # con un solo departamento basta el nombre; si no, "Nombre (Departamento)"
+    un_dpto = len(filtro.get("dpto", ())) == 1
+    return (divipola().nombres if un_dpto else divipola().etiquetas)(cods), valores, otros, n_otros
 
 # ====== Causas (Top 10)
-CAUSAS = _leer_causas_desde_data(DATA_DIR)
-TOP10_CAUSAS = CAUSAS.sort_values("CASOS", ascending=False).head(10).reset_index(drop=True)
+FILAS_POR_PAGINA = 10
+
+@preparacion.dato("catalogo", fuentes=lambda: [p for p in [buscar_anexo(DATA_DIR)] if p is not None])
+def catalogo_cie10():
+    # catálogo CIE-10 (anexo del DANE): una instancia por versión del anexo, nunca por petición
+    return cargar_catalogo(DATA_DIR)
+
+@preparacion.dato("causas", fuentes=lambda: [*DATA_DIR.glob("*.csv"), *DATA_DIR.glob("*.xlsx")],
+                  depende=("cubo", "catalogo"))
+def tabla_causas() -> TablaCausas:
+    catalogo = catalogo_cie10()
+    c = cubo()
+    if c is not None and catalogo is not None:
+        # conteos por código CIE-10 del cubo; Top-N por selección parcial en el catálogo
+        causas = catalogo.top_n(c.causas(COD_TOTAL), n=catalogo.n_codigos)
+    else:
+        causas = _leer_causas_desde_data(DATA_DIR, catalogo)
+    # índice de la tabla (órdenes precalculados); la DataTable pide solo la página visible
+    return TablaCausas(causas)
+
+@functools.lru_cache(maxsize=16)
+def _tabla_causas_filtrada(clave: str, sello: str) -> TablaCausas:
+    # una tabla por filtro (y versión de los datos): al paginar u ordenar se reutiliza
+    catalogo, filtro = catalogo_cie10(), json.loads(clave)
+    conteos = cubo().causas(filtro["dpto"][0]) if _sin_cruces(filtro) else contar(filtro, ("CAUSA",))
+    return TablaCausas(catalogo.top_n(conteos, n=catalogo.n_codigos))
+
+def tabla_causas_filtro(f) -> TablaCausas:
+    filtro = _filtro(f)
+    if not filtro or not hay_micro() or catalogo_cie10() is None:
+        return tabla_causas()
+    return _tabla_causas_filtrada(json.dumps(filtro, sort_keys=True), preparacion.sello())
 
 # ====== Muertes por SEXO (demo reproducible)
+def _por_total(out: pd.DataFrame) -> pd.DataFrame:
+    # COD_DPTO como categoría ordenada de mayor a menor total (orden del eje X)
+    orden = (out.groupby("COD_DPTO")["MUERTES"].sum().sort_values(ascending=False).index.tolist())
+    out["COD_DPTO"] = pd.Categorical(out["COD_DPTO"], categories=orden, ordered=True)
+    return out
+
 def _sexo_demo(df_deptos: pd.DataFrame) -> pd.DataFrame:
     rows = []
     for _, r in df_deptos.iterrows():
-        dpto = r["NOMBRE_DPT"]; total = int(r["MUERTES"])
-        h_share = 0.52 + ((hash(_norm(dpto)) % 11) - 5) / 100.0
+        dpto = r["COD_DPTO"]; total = int(r["MUERTES"])
+        h_share = 0.52 + ((_semilla(r["NOMBRE_DPT"]) % 11) - 5) / 100.0
         h = int(round(total * h_share)); m = total - h
-        rows += [{"NOMBRE_DPT": dpto, "SEXO": "Hombres", "MUERTES": h},
-                 {"NOMBRE_DPT": dpto, "SEXO": "Mujeres", "MUERTES": m}]
-    out = pd.DataFrame(rows)
-    orden = (out.groupby("NOMBRE_DPT")["MUERTES"].sum().sort_values(ascending=False).index.tolist())
-    out["NOMBRE_DPT"] = pd.Categorical(out["NOMBRE_DPT"], categories=orden, ordered=True)
-    return out
-DF_SEXO = _sexo_demo(df_map)
+        rows += [{"COD_DPTO": dpto, "SEXO": "Hombres", "MUERTES": h},
+                 {"COD_DPTO": dpto, "SEXO": "Mujeres", "MUERTES": m}]
+    return _por_total(pd.DataFrame(rows))
+
+def _sexo_micro(cods, m) -> pd.DataFrame:
+    # m: departamento × SEXO (índices del cubo; el tercero, otro / sin dato, no se grafica)
+    return _por_total(pd.DataFrame({"COD_DPTO": np.repeat(cods, 2), "SEXO": SEXOS[:2] * len(cods),
+                                    "MUERTES": np.asarray(m)[:, :2].ravel()}))
+
+@preparacion.dato("sexo", depende=("cubo",))
+def df_sexo() -> pd.DataFrame:
+    c = cubo()
+    return _sexo_demo(df_map) if c is None else _sexo_micro(*c.por_dpto("SEXO"))
+
+def sexo_filtro(f) -> pd.DataFrame:
+    # barras por departamento y sexo con el filtro de edad, mes y capítulo
+    filtro = _filtro(f, "dpto", "sexo")
+    if _sin_cruces(filtro):
+        return df_sexo()
+    return _sexo_micro(list(indice().dptos), contar(filtro, ("DPTO", "SEXO")))
 
 # ====== Referencia de GRUPO_EDAD1 (con categorías y rangos) + demo
 EDAD_REF = [
@@ -261,8 +477,8 @@ PESOS_EDAD = PESOS_EDAD / PESOS_EDAD.sum()
 def _edad_demo(df_deptos: pd.DataFrame) -> pd.DataFrame:
     rows = []
     for _, r in df_deptos.iterrows():
-        dpto = r["NOMBRE_DPT"]; total = int(r["MUERTES"])
-        seed = abs(hash(_norm(dpto))) % (2**32)
+        dpto = r["COD_DPTO"]; total = int(r["MUERTES"])
+        seed = _semilla(r["NOMBRE_DPT"])
         rng = np.random.default_rng(seed)
         jitter = rng.normal(1.0, 0.03, size=len(GRUPOS_EDAD_COD))
         w = (PESOS_EDAD * jitter).clip(min=0.001); w = w / w.sum()
@@ -270,390 +486,717 @@ def _edad_demo(df_deptos: pd.DataFrame) -> pd.DataFrame:
         diff = total - int(vals.sum())
         if diff != 0: vals[np.argmax(w)] += diff
         for cod, v in zip(GRUPOS_EDAD_COD, vals):
-            rows.append({"NOMBRE_DPT": dpto, "COD": cod, "MUERTES": int(v)})
+            rows.append({"COD_DPTO": dpto, "COD": cod, "MUERTES": int(v)})
     return pd.DataFrame(rows)
 
-DF_EDAD = _edad_demo(df_map)
+def edad_dpto(f) -> pd.DataFrame:
+    # Muertes por grupo de edad (en el orden de GRUPOS_EDAD_COD) con el filtro compartido (sin su edad)
+    c, filtro, cod = cubo(), _filtro(f, "edad"), _cod_dpto((f or {}).get("dpto"))
+    if c is not None:
+        vals = c.sumar(por=("EDAD",), dpto=cod) if _sin_cruces(filtro) else contar(filtro, ("EDAD",))
+        return pd.DataFrame({"COD": GRUPOS_EDAD_COD, "MUERTES": vals})
+    g = df_edad()
+    g = g if cod == COD_TOTAL else g[g["COD_DPTO"] == cod]
+    return g.groupby("COD")["MUERTES"].sum().reindex(GRUPOS_EDAD_COD, fill_value=0).reset_index()
+
+@preparacion.dato("edad")
+def df_edad() -> pd.DataFrame:
+    return _edad_demo(df_map)   # solo sin microdatos: con cubo, edad_dpto lee del cubo
+
+def precargar() -> None:
+    # Datos y módulos de todas las pestañas de una vez (gunicorn.conf.py, MORTALIDAD_PRECARGAR=1)
+    import plotly.express  # noqa: F401
+    preparacion.cargar_todo()
 
 # =============================================================================
 # App y Layout
 # =============================================================================
-app = Dash(__name__, suppress_callback_exceptions=True)
+app = Dash(__name__, suppress_callback_exceptions=True,
+           background_callback_manager=trabajos.GESTOR)   # torta y líneas: trabajos.py
 server = app.server
+metricas.instalar(server)   # /metrics y tiempos por callback
+preparacion.instalar(server)  # /healthz, /readyz y carga en segundo plano (MORTALIDAD_CARGA_FONDO=1)
+compacto.instalar(server)   # gzip/brotli (corre antes que metricas: cuenta bytes comprimidos)
+exportar.instalar(server, cubo, divipola, MICRO_DIR)   # /exportar/<agregado|registros>.<csv|parquet>
+
+# Versión de los datos: forma parte de la clave de la caché de figuras. El GeoJSON
+# se lee solo al importar; el resto sale de la foto de la petición (cambia al recargar)
+VERSION_GEO = version_fuentes([FILE_GEO])
+
+def version_datos() -> str:
+    return f"{VERSION_GEO}-{preparacion.sello()}"
+
+instantaneas.instalar(server, version_datos)   # respuestas precalculadas (python instantaneas.py)
+
+@server.route("/geometria/<version>.json")
+def geometria_mapa(version):
+    # versión en la ruta: el navegador la guarda sin volver a preguntar (immutable)
+    if version != VERSION_GEOMETRIA:
+        return {"error": "versión de la geometría desconocida", "vigente": VERSION_GEOMETRIA}, 404
+    resp = server.response_class(GEOMETRIA_MAPA, mimetype="application/json")
+    resp.set_etag(VERSION_GEOMETRIA)
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return resp.make_conditional(request)
+
+@server.route("/cache/figuras")
+def estadisticas_cache_figuras():
+    return {"version_datos": version_datos(), **cache_figuras.estadisticas(),
+            "instantaneas": instantaneas.estadisticas()}
+
+# Los controles guardan su valor en la sesión del navegador: al volver a una
+# pestaña, su contenido se reconstruye con la selección anterior
+PERSISTIR = dict(persistence=True, persistence_type="session")
+
+def _descargas(*enlaces):
+    # enlaces a /exportar (CSV por streaming desde el servidor, sin pasar por el navegador)
+    partes = []
+    for texto, url in enlaces:
+        partes += [" · " if partes else "Descargar (CSV): ", html.A(texto, href=url, download="")]
+    return html.Small(partes, style={"color":"#666","display":"block","marginTop":"6px"})
+
+def _barra_filtros():
+    # Filtro compartido por todas las pestañas. Sin persistence: los clics en las
+    # figuras lo cambian desde callbacks y Dash solo guarda lo que elige el usuario
+    def control(etiqueta, id_componente, opciones, ancho, **kw):
+        return html.Div([html.Label(etiqueta), dcc.Dropdown(id=id_componente, options=opciones, **kw)],
+                        style={"flex": ancho, "minWidth": "150px"})
+
+    return html.Div(
+        style={"display": "flex", "gap": "8px", "alignItems": "flex-end", "flexWrap": "wrap",
+               "margin": "8px 0", "padding": "8px", "background": "#f7f7f9", "borderRadius": "6px"},
+        children=[
+            control("Departamento:", "filtro_dpto", opciones_dpto(), 2,
+                    value=None, placeholder="Todos"),
+            control("Sexo:", "filtro_sexo", [{"label": n, "value": i} for i, n in enumerate(SEXOS)], 1,
+                    value=[], multi=True, placeholder="Todos"),
+            control("Edad:", "filtro_edad", [{"label": d["RANGO"], "value": i} for i, d in enumerate(EDAD_REF)], 2,
+                    value=[], multi=True, placeholder="Todas"),
+            control("Mes:", "filtro_mes", [{"label": m, "value": i} for i, m in enumerate(MESES, start=1)], 2,
+                    value=[], multi=True, placeholder="Todos"),
+            control("Capítulo CIE-10:", "filtro_capitulo",
+                    [{"label": n, "value": c} for c, n in CAPITULOS_CIE10.items()], 3,
+                    value=[], multi=True, placeholder="Todos"),
+            html.Button("Quitar filtros", id="quitar_filtros", n_clicks=0, style={"height": "36px"}),
+            dcc.Store(id="filtro"),
+        ],
+    )
 
-app.layout = html.Div(
-    style={"maxWidth": "1080px", "margin": "0 auto", "fontFamily": "Arial, sans-serif"},
-    children=[
-        html.H3("Panel de mortalidad — Colombia (demo)"),
-        dcc.Tabs(
-            id="tabs",
-            value="tab-general",
+def _pestana_general() -> list:
+    return [
+        html.Div(
+            style={"display": "grid", "gridTemplateColumns": "1fr 1fr", "gap": "12px"},
             children=[
-                dcc.Tab(
-                    label="Visión general",
-                    value="tab-general",
-                    children=[
-                        html.Div(
-                            style={"display": "grid", "gridTemplateColumns": "1fr 1fr", "gap": "12px"},
-                            children=[
-                                html.Div([
-                                    html.Label("Departamento (para barras):"),
-                                    dcc.Dropdown(id="dep_barras",
-                                        options=["Todos"] + sorted(df_map["NOMBRE_DPT"].unique().tolist()),
-                                        value="Todos", clearable=False),
-                                ]),
-                                html.Div([
-                                    html.Label("Métrica:"),
-                                    dcc.Dropdown(id="metrica",
-                                        options=[{"label":"Índice relativo (demo)","value":"indice"},
-                                                 {"label":"Muertes (n)","value":"muertes"}],
-                                        value="indice", clearable=False),
-                                ]),
-                            ],
-                        ),
-                        html.Div(id="kpi_text", style={"margin":"6px 0 10px","fontSize":"14px","color":"#444"}),
-                        dcc.Graph(id="fig_barras"),
-                        html.Hr(),
-                        html.Label("Resaltar en el mapa (opcional):"),
-                        dcc.Dropdown(
-                            id="sel-depto",
-                            options=[{"label": d, "value": d} for d in sorted(df_map["NOMBRE_DPT"].unique())],
-                            value=None, placeholder="Todos los departamentos", clearable=True,
-                            style={"maxWidth":"520px","marginBottom":"10px"},
-                        ),
-                        dcc.Graph(id="fig_map"),
-                        html.Div(id="card-depto", style={"marginTop":"6px","fontSize":"14px","color":"#555"}),
-                    ],
-                ),
-
-                dcc.Tab(
-                    label="Municipios (torta)",
-                    value="tab-muni",
-                    children=[
-                        html.Div(
-                            style={"display":"flex","gap":"16px","alignItems":"flex-end","margin":"12px 0"},
-                            children=[
-                                html.Div([
-                                    html.Label("Departamento (10 disponibles):"),
-                                    dcc.Dropdown(id="dep_muni",
-                                        options=[{"label":d,"value":d} for d in TARGET_DEPS],
-                                        value=TARGET_DEPS[0], clearable=False, style={"minWidth":"340px"}),
-                                ], style={"flex":1}),
-                                html.Div([
-                                    html.Label("Número de municipios a mostrar (Top N):"),
-                                    dcc.Slider(id="topn", min=5, max=20, step=1, value=12,
-                                               tooltip={"placement":"bottom","always_visible":True}),
-                                ], style={"flex":2}),
-                            ],
-                        ),
-                        dcc.Graph(id="fig_pie"),
-                        html.Small("Nombres de municipios desde Excel en ./data (columnas de Departamento y Municipio).",
-                                   style={"color":"#666"}),
-                    ],
-                ),
-
-                dcc.Tab(
-                    label="Causas (Top 10)",
-                    value="tab-causas",
-                    children=[
-                        html.Div(style={"margin":"12px 0"}, children=[
-                            html.P("Listado de las 10 principales causas de muerte en Colombia (ordenadas de mayor a menor)."),
-                            dash_table.DataTable(
-                                id="tabla-top10-causas",
-                                data=TOP10_CAUSAS.to_dict("records"),
-                                columns=[
-                                    {"name":"Código","id":"CODIGO","type":"text"},
-                                    {"name":"Nombre de la causa","id":"NOMBRE","type":"text"},
-                                    {"name":"Total de casos","id":"CASOS","type":"numeric"},
-                                ],
-                                sort_action="native", filter_action="native", page_action="none",
-                                export_format="csv", export_headers="display",
-                                style_table={"overflowX":"auto"},
-                                style_header={"backgroundColor":"#f5f5f5","fontWeight":"bold","border":"1px solid #ddd"},
-                                style_cell={"padding":"10px","border":"1px solid #eee","fontSize":"14px"},
-                                style_data_conditional=[
-                                    {"if":{"row_index":"odd"},"backgroundColor":"#fafafa"},
-                                    {"if":{"column_id":"CASOS"},"textAlign":"right"},
-                                ],
-                            ),
-                            html.Small("Fuente: ./data/causas_mortalidad.csv o .xlsx (los nombres de columnas son flexibles).",
-                                       style={"color":"#666","display":"block","marginTop":"8px"}),
-                        ]),
-                    ],
-                ),
-
-                dcc.Tab(
-                    label="Muertes por sexo",
-                    value="tab-sexo",
-                    children=[
-                        html.Div(style={"display":"flex","gap":"12px","alignItems":"center","margin":"10px 0"}, children=[
-                            html.Label("Modo:"),
-                            dcc.RadioItems(id="modo_sexo",
-                                options=[{"label":" Totales","value":"abs"},{"label":" Porcentaje","value":"pct"}],
-                                value="abs", inline=True),
-                        ]),
-                        dcc.Graph(id="fig_sexo"),
-                        html.Small("Barras apiladas por departamento (Hombres/Mujeres). "
-                                   "Si no hay datos por sexo, se usa una partición demo reproducible.",
-                                   style={"color":"#666"}),
-                    ],
-                ),
-
-                dcc.Tab(
-                    label="Distribución por edad (histograma)",
-                    value="tab-edad",
-                    children=[
-                        html.Div(style={"display":"flex","gap":"16px","alignItems":"center","margin":"12px 0"}, children=[
-                            html.Div(style={"minWidth":"320px"}, children=[
-                                html.Label("Departamento:"),
-                                dcc.Dropdown(
-                                    id="dep_edad",
-                                    options=[{"label":"Todos","value":"Todos"}] +
-                                            [{"label":d,"value":d} for d in df_map["NOMBRE_DPT"].unique()],
-                                    value="Todos", clearable=False),
-                            ]),
-                            html.Div(children=[
-                                html.Label("Modo:"),
-                                dcc.RadioItems(id="modo_edad",
-                                    options=[{"label":" Totales","value":"abs"},{"label":" Porcentaje","value":"pct"}],
-                                    value="abs", inline=True),
-                            ]),
-                        ]),
-                        dcc.Graph(id="fig_edad"),
-                        html.Small("Eje X con Código DANE + Categoría. Tooltip incluye categoría y rango de edad.",
-                                   style={"color":"#666"}),
-                    ],
-                ),
-
-                # ---- Pestaña: líneas mensuales (INTERACTIVA)
-                dcc.Tab(
-                    label="Tendencia mensual (líneas)",
-                    value="tab-lineas",
-                    children=[
-                        html.Div(style={"margin":"12px 0"}, children=[
-                            html.P("Gráfico de líneas: total de muertes por mes (demo). Selecciona las series y la métrica."),
-                            html.Div(style={"display":"flex","gap":"12px","flexWrap":"wrap","alignItems":"end"}, children=[
-                                html.Div(style={"minWidth":"320px"}, children=[
-                                    html.Label("Series a mostrar:"),
-                                    dcc.Dropdown(
-                                        id="series_lineas",
-                                        options=[{"label":"Colombia (Total)","value":"__COL__"}] +
-                                                [{"label":d,"value":d} for d in sorted(df_map["NOMBRE_DPT"].unique())],
-                                        value=["__COL__"], multi=True, clearable=False
-                                    ),
-                                ]),
-                                html.Div(children=[
-                                    html.Label("Métrica:"),
-                                    dcc.RadioItems(
-                                        id="metrica_lineas",
-                                        options=[{"label":" Totales","value":"abs"},
-                                                 {"label":" Índice relativo (100 = mes pico)","value":"idx"}],
-                                        value="abs", inline=True
-                                    ),
-                                ]),
-                                html.Div(children=[
-                                    html.Label("Modo de línea:"),
-                                    dcc.RadioItems(
-                                        id="modo_lineas",
-                                        options=[{"label":" Líneas","value":"lines"},
-                                                 {"label":" Líneas + marcadores","value":"lines+markers"}],
-                                        value="lines+markers", inline=True
-                                    ),
-                                ]),
-                            ]),
-                            dcc.Graph(id="fig_lineas"),
-                            html.Small("Fuente: serie mensual agregada a partir del demo por departamento.",
-                                       style={"color":"#666"})
-                        ])
-                    ],
-                ),
+                html.Div([
+                    html.Label("Métrica:"),
+                    dcc.Dropdown(id="metrica", **PERSISTIR,
+                        options=[{"label":"Índice relativo (demo)","value":"indice"},
+                                 {"label":"Muertes (n)","value":"muertes"}],
+                        value="indice", clearable=False),
+                ]),
             ],
         ),
-    ],
-)
+        dcc.Store(id="base_barras"),
+        html.Div(id="kpi_text", style={"margin":"6px 0 10px","fontSize":"14px","color":"#444"}),
+        dcc.Graph(id="fig_barras"),
+        html.Small("Clic en un mes para filtrar las demás pestañas.", style={"color":"#666"}),
+        html.Div(id="descargas-barras"),
+        html.Hr(),
+        html.Small("Clic en un departamento del mapa para filtrar todas las pestañas.",
+                   style={"color":"#666","display":"block","marginBottom":"10px"}),
+        dcc.Store(id="base_mapa"),
+        dcc.Graph(id="fig_map"),
+        html.Div(id="card-depto", style={"marginTop":"6px","fontSize":"14px","color":"#555"}),
+    ]
+
+def _pestana_municipios() -> list:
+    return [
+        html.Div(
+            style={"display":"flex","gap":"16px","alignItems":"flex-end","margin":"12px 0"},
+            children=[
+                html.Div([
+                    html.Label("Número de municipios a mostrar (Top N):"),
+                    dcc.Slider(id="topn", **PERSISTIR, min=5, max=20, step=1, value=12,
+                               tooltip={"placement":"bottom","always_visible":True}),
+                ], style={"flex":2}),
+            ],
+        ),
+        trabajos.indicador("progreso_muni"),
+        dcc.Graph(id="fig_pie"),
+        html.Div(id="descargas-muni"),
+        html.Small("Municipios del departamento del filtro (de todo el país con \"Todos\"), de mayor a menor; "
+                   "el resto se suma en \"Otros\". "
+                   "Nombres de municipios desde Excel en ./data (columnas de Departamento y Municipio).",
+                   style={"color":"#666"}),
+    ]
+
+def _pestana_causas() -> list:
+    # primera página ya en el layout; en carga en segundo plano, vacía hasta tener el índice
+    datos, paginas = (tabla_causas().pagina(0, FILAS_POR_PAGINA) if preparacion.lista("causas") else ([], 1))
+    return [
+        html.Div(style={"margin":"12px 0"}, children=[
+            html.P("Principales causas de muerte en Colombia (ordenadas de mayor a menor). "
+                   "La primera página es el Top 10; filtre por código (p. ej. I21) o nombre."),
+            dash_table.DataTable(
+                id="tabla-top10-causas", **PERSISTIR,
+                data=datos,
+                columns=[
+                    {"name":"Código","id":"CODIGO","type":"text"},
+                    {"name":"Nombre de la causa","id":"NOMBRE","type":"text"},
+                    {"name":"Total de casos","id":"CASOS","type":"numeric"},
+                ],
+                sort_action="custom", filter_action="custom", page_action="custom",
+                sort_mode="multi", sort_by=[], filter_query="",
+                page_current=0, page_size=FILAS_POR_PAGINA,
+                page_count=paginas,
+                export_format="csv", export_headers="display",
+                style_table={"overflowX":"auto"},
+                style_header={"backgroundColor":"#f5f5f5","fontWeight":"bold","border":"1px solid #ddd"},
+                style_cell={"padding":"10px","border":"1px solid #eee","fontSize":"14px"},
+                style_data_conditional=[
+                    {"if":{"row_index":"odd"},"backgroundColor":"#fafafa"},
+                    {"if":{"column_id":"CASOS"},"textAlign":"right"},
+                ],
+            ),
+            html.Small("Fuente: ./data/causas_mortalidad.csv o .xlsx (los nombres de columnas son flexibles).",
+                       style={"color":"#666","display":"block","marginTop":"8px"}),
+            _descargas(("todas las causas por año", exportar.url_exportar("agregado", por=("ANO", "CAUSA"))))
+            if preparacion.lista("cubo") and hay_micro() else None,
+        ]),
+    ]
+
+def _pestana_sexo() -> list:
+    return [
+        html.Div(style={"display":"flex","gap":"12px","alignItems":"center","margin":"10px 0"}, children=[
+            html.Label("Modo:"),
+            dcc.RadioItems(id="modo_sexo", **PERSISTIR,
+                options=[{"label":" Totales","value":"abs"},{"label":" Porcentaje","value":"pct"}],
+                value="abs", inline=True),
+        ]),
+        dcc.Store(id="base_sexo"),
+        dcc.Graph(id="fig_sexo"),
+        html.Small("Barras apiladas por departamento (Hombres/Mujeres); clic en una barra para filtrar "
+                   "por ese departamento y sexo. "
+                   "Si no hay datos por sexo, se usa una partición demo reproducible.",
+                   style={"color":"#666"}),
+    ]
+
+def _pestana_edad() -> list:
+    return [
+        html.Div(style={"display":"flex","gap":"16px","alignItems":"center","margin":"12px 0"}, children=[
+            html.Div(children=[
+                html.Label("Modo:"),
+                dcc.RadioItems(id="modo_edad", **PERSISTIR,
+                    options=[{"label":" Totales","value":"abs"},{"label":" Porcentaje","value":"pct"}],
+                    value="abs", inline=True),
+            ]),
+        ]),
+        dcc.Store(id="base_edad"),
+        dcc.Graph(id="fig_edad"),
+        html.Small("Eje X con Código DANE + Categoría. Tooltip incluye categoría y rango de edad. "
+                   "Clic en una barra para filtrar por ese grupo de edad.",
+                   style={"color":"#666"}),
+    ]
+
+# ---- Pestaña: líneas mensuales (INTERACTIVA)
+def _pestana_lineas() -> list:
+    return [
+        html.Div(style={"margin":"12px 0"}, children=[
+            html.P("Gráfico de líneas: total de muertes en el tiempo. Selecciona las series, la resolución "
+                   "y la métrica; al hacer zoom se piden al servidor solo los periodos visibles. "
+                   "Las series siguen el filtro de sexo, edad, mes y capítulo."),
+            html.Div(style={"display":"flex","gap":"12px","flexWrap":"wrap","alignItems":"end"}, children=[
+                html.Div(style={"minWidth":"320px"}, children=[
+                    html.Label("Series a mostrar:"),
+                    dcc.Dropdown(
+                        id="series_lineas", **PERSISTIR,
+                        options=[{"label":"Colombia (Total)","value":COD_TOTAL}] + opciones_dpto(),
+                        value=[COD_TOTAL], multi=True, clearable=False
+                    ),
+                ]),
+                html.Div(children=[
+                    html.Label("Resolución:"),
+                    dcc.RadioItems(
+                        id="resolucion_lineas", **PERSISTIR,
+                        options=[{"label":" Mes","value":"mes"},
+                                 {"label":" Trimestre","value":"trimestre"},
+                                 {"label":" Año","value":"ano"}],
+                        value="mes", inline=True
+                    ),
+                ]),
+                html.Div(children=[
+                    html.Label("Métrica:"),
+                    dcc.RadioItems(
+                        id="metrica_lineas", **PERSISTIR,
+                        options=[{"label":" Totales","value":"abs"},
+                                 {"label":" Índice relativo (100 = pico de la serie)","value":"idx"}],
+                        value="abs", inline=True
+                    ),
+                ]),
+                html.Div(children=[
+                    html.Label("Modo de línea:"),
+                    dcc.RadioItems(
+                        id="modo_lineas", **PERSISTIR,
+                        options=[{"label":" Líneas","value":"lines"},
+                                 {"label":" Líneas + marcadores","value":"lines+markers"}],
+                        value="lines+markers", inline=True
+                    ),
+                ]),
+            ]),
+            dcc.Store(id="base_lineas"),
+            dcc.Store(id="vista_lineas"),
+            trabajos.indicador("progreso_lineas"),
+            dcc.Graph(id="fig_lineas"),
+            html.Small("Fuente: microdatos del DANE (año y mes de la defunción) o, sin ellos, el demo "
+                       "por departamento.", style={"color":"#666"})
+        ]),
+    ]
+
+# Contenido de cada pestaña, armado al activarla (mostrar_pestana): los callbacks
+# de las pestañas ocultas no corren y sus datos (@preparacion.dato) no se cargan
+PESTANAS = {
+    "tab-general": ("Visión general", _pestana_general),
+    "tab-muni": ("Municipios (torta)", _pestana_municipios),
+    "tab-causas": ("Causas (Top 10)", _pestana_causas),
+    "tab-sexo": ("Muertes por sexo", _pestana_sexo),
+    "tab-edad": ("Distribución por edad (histograma)", _pestana_edad),
+    "tab-lineas": ("Tendencia mensual (líneas)", _pestana_lineas),
+}
+
+# Datos que necesita cada pestaña: al terminar de cargarse (segundo plano) se
+# vuelve a armar la pestaña visible y sus callbacks reemplazan el "cargando"
+REQUISITOS = {
+    "tab-general": {"cubo", "indice", "mapa"},
+    "tab-muni": {"cubo", "indice", "divipola_excel", "municipios"},
+    "tab-causas": {"cubo", "indice", "catalogo", "causas"},
+    "tab-sexo": {"cubo", "indice", "sexo"},
+    "tab-edad": {"cubo", "indice", "edad"},
+    "tab-lineas": {"cubo", "indice", "series"},
+}
+ESPERA_MS = 1500
+
+def _layout():
+    # función: el estado de la carga se toma en cada visita a la página
+    return html.Div(
+        style={"maxWidth": "1080px", "margin": "0 auto", "fontFamily": "Arial, sans-serif"},
+        children=[
+            html.H3("Panel de mortalidad — Colombia (demo)"),
+            _barra_filtros(),
+            dcc.Tabs(
+                id="tabs",
+                value="tab-general",
+                children=[dcc.Tab(label=label, value=valor) for valor, (label, _) in PESTANAS.items()],
+            ),
+            html.Div(id="contenido-tab", children=_pestana_general()),
+            dcc.Store(id="datos-listos", data={"listos": preparacion.listos(), "nuevos": []}),
+            dcc.Interval(id="espera-datos", interval=ESPERA_MS, disabled=preparacion.todo_listo()),
+        ],
+    )
+
+app.layout = _layout
 
 # =============================================================================
 # Callbacks
 # =============================================================================
 @app.callback(
+    Output("contenido-tab", "children"),
+    Input("tabs", "value"),
+    Input("datos-listos", "data"),
+    prevent_initial_call=True,   # la pestaña inicial ya viene en el layout
+)
+@metricas.instrumentar("mostrar_pestana")
+def mostrar_pestana(tab, datos_listos):
+    if tab not in PESTANAS:
+        tab = "tab-general"
+    if (callback_context.triggered_id == "datos-listos"
+            and not REQUISITOS[tab] & set((datos_listos or {}).get("nuevos", []))):
+        return no_update
+    return PESTANAS[tab][1]()
+
+@app.callback(
+    Output("datos-listos", "data"),
+    Output("espera-datos", "disabled"),
+    Input("espera-datos", "n_intervals"),
+    State("datos-listos", "data"),
+    prevent_initial_call=True,
+)
+def vigilar_carga(_, previo):
+    # solo mientras haya datos cargándose en segundo plano (el Interval se apaga al terminar)
+    listos = preparacion.listos()
+    antes = (previo or {}).get("listos", [])
+    if listos == antes:
+        return no_update, preparacion.todo_listo()
+    return {"listos": listos, "nuevos": [n for n in listos if n not in antes]}, preparacion.todo_listo()
+
+# Respuesta de los callbacks mientras falta un dato que necesitan (@preparacion.requiere)
+FIG_CARGANDO = compacto.figura(go.Figure(layout=dict(
+    xaxis=dict(visible=False), yaxis=dict(visible=False), height=320, margin=dict(l=20, r=20, t=20, b=20),
+    annotations=[dict(text="Cargando datos…", showarrow=False, font=dict(size=16, color="#888"))],
+)))
+
+def _base_cargando() -> dict:
+    # assets/panel.js muestra la figura tal cual, sin series ni modos
+    return {"cargando": True, "fig": FIG_CARGANDO}
+
+def _base(fig, **textos) -> dict:
+    # Figura en su modo base + series crudas: los modos de presentación (índice,
+    # porcentaje, marcadores) se aplican en el navegador (assets/panel.js)
+    # Las series viajan una sola vez (y como arreglo binario tipado si ocupa menos):
+    # se quitan de las trazas de la figura, que clonar() rellena en el navegador
+    with metricas.fase("figura"):
+        x = [[str(v) for v in tr.x] for tr in fig.data]
+        y = [compacto.arreglo_binario(tr.y) for tr in fig.data]
+        fig.update_traces(x=None, y=None)
+        return {"fig": compacto.figura(fig), "x": x, "y": y, "textos": textos}
+
+# --- Filtro compartido: la barra y los clics en las figuras (assets/panel.js)
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="filtro"),
+    Output("filtro", "data"),
+    Input("filtro_dpto", "value"),
+    *[Input(f"filtro_{eje}", "value") for eje in EJES_FILTRO],
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="quitarFiltros"),
+    Output("filtro_dpto", "value", allow_duplicate=True),
+    *[Output(f"filtro_{eje}", "value", allow_duplicate=True) for eje in EJES_FILTRO],
+    Input("quitar_filtros", "n_clicks"),
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="clicMapa"),
+    Output("filtro_dpto", "value", allow_duplicate=True),
+    Input("fig_map", "clickData"),
+    State("filtro_dpto", "value"),
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="clicSexo"),
+    Output("filtro_dpto", "value", allow_duplicate=True),
+    Output("filtro_sexo", "value", allow_duplicate=True),
+    Input("fig_sexo", "clickData"),
+    State("filtro_dpto", "value"),
+    State("filtro_sexo", "value"),
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="clicEdad"),
+    Output("filtro_edad", "value", allow_duplicate=True),
+    Input("fig_edad", "clickData"),
+    State("filtro_edad", "value"),
+    prevent_initial_call=True,
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="clicMes"),
+    Output("filtro_mes", "value", allow_duplicate=True),
+    Input("fig_barras", "clickData"),
+    State("filtro_mes", "value"),
+    prevent_initial_call=True,
+)
+
+@app.callback(
+    Output("base_barras", "data"),
+    Input("filtro", "data"),
+)
+@metricas.instrumentar("actualizar_barras", "tab-general")
+@preparacion.requiere("cubo", "indice", cargando=_base_cargando)
+@cache_figuras.memoizar("actualizar_barras", version_datos)
+def actualizar_barras(filtro):
+    fig, _ = fig_barras(filtro, "muertes")
+    # las barras suman todos los años del cubo: el KPI dice cuáles ("Total 2015–2021")
+    anos = cubo().eje_ano if hay_micro() else []
+    periodo = f"{anos[0]}–{anos[-1]}" if len(anos) > 1 else f"{anos[0]}" if len(anos) else ""
+    return _base(fig, ylab={"indice": "Índice relativo (demo)", "muertes": "Muertes (n)"}, periodo=periodo)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="barras"),
     Output("fig_barras", "figure"),
     Output("kpi_text", "children"),
-    Input("dep_barras", "value"),
+    Input("base_barras", "data"),
     Input("metrica", "value"),
 )
-def actualizar_barras(dep_barras, metrica):
-    fig, g = fig_barras(dep_barras, metrica)
-    return fig, kpis(g, metrica)
+
+def _seleccion(filtro: dict) -> dict:
+    # filtro compartido -> parámetros de /exportar (ahí SEXO va en el código del DANE: 1, 2, 3)
+    out = dict(filtro)
+    if "sexo" in out:
+        out["sexo"] = [v + 1 for v in out["sexo"]]
+    return out
 
 @app.callback(
-    Output("fig_map", "figure"),
+    Output("descargas-barras", "children"),
+    Input("filtro", "data"),
+)
+def enlaces_barras(f):
+    if not preparacion.lista("cubo") or not hay_micro():
+        return None
+    sel = _seleccion(_filtro(f))
+    return _descargas(("muertes por año y mes", exportar.url_exportar("agregado", por=("ANO", "MES"), **sel)),
+                      ("registros", exportar.url_exportar("registros", **sel)))
+
+def mapa_filtro(f) -> pd.DataFrame:
+    # mapa() con las muertes del filtro de sexo, edad, mes y capítulo
+    filtro = _filtro(f, "dpto")
+    if _sin_cruces(filtro):
+        return mapa()
+    ix = indice()
+    out = df_map.copy()
+    out["MUERTES"] = out["COD_DPTO"].map(pd.Series(contar(filtro, ("DPTO",)), index=ix.dptos)).fillna(0).astype(int)
+    return out
+
+@app.callback(
+    Output("base_mapa", "data"),
     Output("card-depto", "children"),
-    Input("sel-depto", "value"),
+    Input("filtro", "data"),
 )
-def actualizar_mapa_y_card(depto):
-    if depto:
-        df_plot = df_map[df_map["NOMBRE_DPT"] == depto].copy()
-        nota = f"Departamento seleccionado: {depto}"
+@metricas.instrumentar("actualizar_mapa_y_card", "tab-general")
+@preparacion.requiere("cubo", "indice", "mapa", cargando=lambda: (_base_cargando(), "Cargando datos…"))
+@cache_figuras.memoizar("actualizar_mapa_y_card", version_datos)
+def actualizar_mapa_y_card(f):
+    # solo valores: la geometría (GEOMETRIA_MAPA) ya está en el navegador
+    m, cod = mapa_filtro(f), _cod_dpto((f or {}).get("dpto"))
+    texto = _texto_filtro(_filtro(f, "dpto"))
+    muertes = m["MUERTES"].to_numpy(dtype=np.int64)
+    filas = np.flatnonzero(m["COD_DPTO"].to_numpy() == cod)
+    if cod != COD_TOTAL:
+        nota = f"Departamento seleccionado: {_nombre_dpto(cod)}"
     else:
-        df_plot = df_map.copy()
         nota = "Mostrando todos los departamentos"
-    fig = fig_mapa(df_plot, depto)
-    if depto and not df_plot.empty:
-        total = int(df_plot["MUERTES"].iloc[0])
-        card = f"🧭 {nota} — Muertes: {total:,}"
+    nota += f" ({texto})" if texto else ""
+    if cod != COD_TOTAL and len(filas):
+        card = f"🧭 {nota} — Muertes: {int(muertes[filas[0]]):,}"
     else:
-        total = int(df_map["MUERTES"].sum())
-        card = f"🧭 {nota} — Muertes (suma de todos los puntos): {total:,}"
-    return fig, card
+        card = f"🧭 {nota} — Muertes (suma de todos los puntos): {int(muertes.sum()):,}"
+    # resalte: fila del departamento elegido (-1 si no está en el mapa), None = todos
+    base = {"geo": app.get_relative_path(f"/geometria/{VERSION_GEOMETRIA}.json"),
+            "valores": compacto.arreglo_binario(muertes),
+            "resalte": None if cod == COD_TOTAL else (int(filas[0]) if len(filas) else -1)}
+    return base, card
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="mapa"),
+    Output("fig_map", "figure"),
+    Input("base_mapa", "data"),
+)
 
-@app.callback(
+@trabajos.callback(
+    app,
     Output("fig_pie", "figure"),
-    Input("dep_muni", "value"),
+    Input("filtro", "data"),
     Input("topn", "value"),
+    progreso="progreso_muni", cancelar=[Input("tabs", "value")],
 )
-def actualizar_pie(dep, topn):
-    muns = municipios_por_departamento(dep)
-    muns = sorted(muns, key=_norm)[: max(1, int(topn))]
+@metricas.instrumentar("actualizar_pie", "tab-muni")
+@preparacion.requiere("cubo", "indice", "divipola_excel", "municipios", cargando=lambda: FIG_CARGANDO)
+@cache_figuras.memoizar("actualizar_pie", version_datos)
+def actualizar_pie(f, topn):
+    cod = _cod_dpto((f or {}).get("dpto"))
+    texto = _texto_filtro(_filtro(f, "dpto"))
+    etiqueta = "Muertes" if hay_micro() else "Muertes (demo)"
+    trabajos.avanzar("Eligiendo los municipios…")
+    muns, valores, otros, n_otros = top_municipios(f, max(1, int(topn)))
+    n_top = len(muns)
+    if otros > 0:
+        muns, valores = [*muns, f"Otros ({n_otros:,} municipios)"], np.append(valores, otros)
     if not muns:
-        muns = ["(Sin municipios)"]
-    rng = np.random.default_rng(abs(hash(_norm(dep))) % (2**32))
-    valores = np.clip(rng.normal(loc=100, scale=25, size=len(muns)), 10, None)
-    df = pd.DataFrame({"Municipio": muns, "Muertes (demo)": valores})
-    fig = px.pie(df, names="Municipio", values="Muertes (demo)",
-                 title=f"{dep}: municipios (Top {len(df)})", hole=0.45)
-    fig.update_traces(textposition="inside", textinfo="label+percent")
-    total = int(df["Muertes (demo)"].sum())
-    fig.update_layout(annotations=[dict(text=f"Total demo:<br><b>{total:,}</b>",
-                                        x=0.5, y=0.5, showarrow=False, font=dict(size=13))],
-                      margin=dict(l=20, r=20, t=60, b=20))
-    return fig
+        muns, valores = ["(Sin municipios)"], np.zeros(1)
+    df = pd.DataFrame({"Municipio": muns, etiqueta: valores})
+    import plotly.express as px   # diferido: solo lo necesitan las pestañas que no son la inicial
+    trabajos.avanzar("Armando la figura…")
+    with metricas.fase("figura"):
+        fig = px.pie(df, names="Municipio", values=etiqueta, color="Municipio",
+                     color_discrete_map={muns[-1]: "#BBBBBB"} if otros > 0 else None,
+                     title=f"{_nombre_dpto(cod, 'Colombia')}: municipios (Top {n_top})"
+                           + (f" — {texto}" if texto and etiqueta == "Muertes" else ""), hole=0.45)
+        # el Top N de mayor a menor y "Otros" al final, aunque sea la porción más grande
+        fig.update_traces(textposition="inside", textinfo="label+percent", sort=False, direction="clockwise")
+        trabajos.revisar()
+        total = int(df[etiqueta].sum())
+        fig.update_layout(annotations=[dict(text=f"Total{' demo' if etiqueta != 'Muertes' else ''}:<br><b>{total:,}</b>",
+                                            x=0.5, y=0.5, showarrow=False, font=dict(size=13))],
+                          margin=dict(l=20, r=20, t=60, b=20))
+        return compacto.figura(fig)
+
+@app.callback(
+    Output("descargas-muni", "children"),
+    Input("filtro", "data"),
+)
+def enlaces_muni(f):
+    if not preparacion.lista("cubo") or not hay_micro():
+        return None
+    return _descargas(("muertes por municipio y año",
+                       exportar.url_exportar("agregado", por=("ANO", "COD_MPIO"), **_seleccion(_filtro(f)))))
+
+@app.callback(
+    Output("tabla-top10-causas", "data"),
+    Output("tabla-top10-causas", "page_count"),
+    Input("tabla-top10-causas", "page_current"),
+    Input("tabla-top10-causas", "page_size"),
+    Input("tabla-top10-causas", "sort_by"),
+    Input("tabla-top10-causas", "filter_query"),
+    Input("filtro", "data"),
+)
+@metricas.instrumentar("actualizar_tabla_causas", "tab-causas")
+@preparacion.requiere("cubo", "indice", "catalogo", "causas", cargando=lambda: ([], 1))
+def actualizar_tabla_causas(page_current, page_size, sort_by, filter_query, filtro=None):
+    # sin caché de figuras: cada página sale de los índices en microsegundos (la tabla
+    # de un filtro se arma una vez, del índice de bits, y queda en _tabla_causas_filtrada)
+    return tabla_causas_filtro(filtro).pagina(page_current, page_size, sort_by, filter_query)
 
 @app.callback(
+    Output("base_sexo", "data"),
+    Input("filtro", "data"),
+)
+@metricas.instrumentar("actualizar_barras_sexo", "tab-sexo")
+@preparacion.requiere("cubo", "indice", "sexo", cargando=_base_cargando)
+@cache_figuras.memoizar("actualizar_barras_sexo", version_datos)
+def actualizar_barras_sexo(f):
+    import plotly.express as px
+    g = sexo_filtro(f)
+    texto = _texto_filtro(_filtro(f, "dpto", "sexo"))
+    g = g.assign(NOMBRE_DPT=g["COD_DPTO"].cat.rename_categories(lambda c: NOMBRE_DPTO.get(c, str(c))),
+                 COD=g["COD_DPTO"].astype(int), I_SEXO=g["SEXO"].map(SEXOS.index))
+    titulo = "Muertes por sexo y departamento" + (f" — {texto}" if texto else "")
+    with metricas.fase("figura"):
+        # customdata (código y sexo): el clic en una barra fija ambos en el filtro compartido
+        fig = px.bar(g.sort_values(["NOMBRE_DPT","SEXO"]), x="NOMBRE_DPT", y="MUERTES", color="SEXO",
+                     barmode="stack", title=f"{titulo} (totales)", custom_data=["COD", "I_SEXO"],
+                     labels={"NOMBRE_DPT":"Departamento", "MUERTES": "Muertes (n)"})
+        fig.update_traces(hovertemplate="%{x} (%{customdata[0]})<br>Muertes (n): %{y}<extra>%{fullData.name}</extra>")
+        fig.update_layout(xaxis=dict(tickangle=-30), margin=dict(l=20, r=20, t=60, b=80), legend_title_text="Sexo")
+    return _base(fig, ylab={"abs": "Muertes (n)", "pct": "Porcentaje (%)"},
+                 titulo={"abs": f"{titulo} (totales)", "pct": f"{titulo} (% dentro de cada dpto.)"})
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="sexo"),
     Output("fig_sexo", "figure"),
+    Input("base_sexo", "data"),
     Input("modo_sexo", "value"),
 )
-def actualizar_barras_sexo(modo):
-    df = DF_SEXO.copy()
-    titulo = "Muertes por sexo y departamento (totales)" if modo == "abs" else \
-             "Muertes por sexo y departamento (% dentro de cada dpto.)"
-    if modo == "pct":
-        df["TOTAL"] = df.groupby("NOMBRE_DPT")["MUERTES"].transform("sum")
-        df["VAL"] = (df["MUERTES"] / df["TOTAL"]) * 100.0
-        y_col, y_lab, text = "VAL", "Porcentaje (%)", df["VAL"].round(1).astype(str) + "%"
-    else:
-        y_col, y_lab, text = "MUERTES", "Muertes (n)", None
-    fig = px.bar(df.sort_values(["NOMBRE_DPT","SEXO"]), x="NOMBRE_DPT", y=y_col, color="SEXO",
-                 barmode="stack", title=titulo, labels={"NOMBRE_DPT":"Departamento", y_col: y_lab}, text=text)
-    fig.update_layout(xaxis=dict(tickangle=-30), margin=dict(l=20, r=20, t=60, b=80), legend_title_text="Sexo")
-    return fig
 
 # --- Histograma por edad (con nombres y rangos en el eje/tooltip)
 @app.callback(
-    Output("fig_edad", "figure"),
-    Input("dep_edad", "value"),
-    Input("modo_edad", "value"),
+    Output("base_edad", "data"),
+    Input("filtro", "data"),
 )
-def actualizar_histograma_edad(dep, modo):
-    if dep == "Todos":
-        g = DF_EDAD.groupby("COD", as_index=False)["MUERTES"].sum()
-        titulo_base = "Distribución por edad (Todos los departamentos)"
-    else:
-        g = DF_EDAD[DF_EDAD["NOMBRE_DPT"] == dep].groupby("COD", as_index=False)["MUERTES"].sum()
-        titulo_base = f"Distribución por edad ({dep})"
+@metricas.instrumentar("actualizar_histograma_edad", "tab-edad")
+@preparacion.requiere("cubo", "indice", "edad", cargando=_base_cargando)
+@cache_figuras.memoizar("actualizar_histograma_edad", version_datos)
+def actualizar_histograma_edad(f):
+    g = edad_dpto(f)
+    titulo_base = f"Distribución por edad ({_texto_filtro(_filtro(f, 'edad')) or 'Todos los departamentos'})"
+    elegidos = set((f or {}).get("edad") or [])
 
-    g = g.set_index("COD").reindex(GRUPOS_EDAD_COD).fillna(0).reset_index()
     g["CATEGORIA"] = g["COD"].map(MAP_CATEG)
     g["RANGO"]     = g["COD"].map(MAP_RANGO)
-
-    if modo == "pct":
-        total = g["MUERTES"].sum()
-        g["VAL"] = 0 if total == 0 else (g["MUERTES"] / total) * 100.0
-        y_col, y_lab, text = "VAL", "Porcentaje (%)", g["VAL"].round(1).astype(str) + "%"
-        titulo = titulo_base + " — % dentro del total"
-    else:
-        g["VAL"] = g["MUERTES"]
-        y_col, y_lab, text = "VAL", "Muertes (n)", None
-        titulo = titulo_base + " — totales"
-
-    fig = px.bar(
-        g, x="COD", y=y_col, title=titulo,
-        labels={"COD":"Código · Categoría (GRUPO_EDAD1)", y_col: y_lab},
-        hover_data={"CATEGORIA": True, "RANGO": True, "MUERTES": True, "VAL": False},
-        text=text
-    )
-    fig.update_layout(
-        xaxis=dict(
-            categoryorder="array",
-            categoryarray=GRUPOS_EDAD_COD,
-            tickmode="array",
-            tickvals=GRUPOS_EDAD_COD,
-            ticktext=TICKTEXT_EDAD,
-            tickangle=-10,
-        ),
-        margin=dict(l=20, r=20, t=60, b=80),
+    g["VAL"] = g["MUERTES"]
+
+    import plotly.express as px
+    with metricas.fase("figura"):
+        fig = px.bar(
+            g, x="COD", y="VAL", title=titulo_base + " — totales",
+            labels={"COD":"Código · Categoría (GRUPO_EDAD1)", "VAL": "Muertes (n)"},
+            hover_data={"CATEGORIA": True, "RANGO": True, "MUERTES": True, "VAL": False},
+        )
+        fig.update_layout(
+            xaxis=dict(
+                categoryorder="array",
+                categoryarray=GRUPOS_EDAD_COD,
+                tickmode="array",
+                tickvals=GRUPOS_EDAD_COD,
+                ticktext=TICKTEXT_EDAD,
+                tickangle=-10,
+            ),
+            margin=dict(l=20, r=20, t=60, b=80),
+        )
+        fig.update_traces(
+            hovertemplate="<b>%{x}</b><br>Categoría: %{customdata[0]}<br>Rango: %{customdata[1]}"
+                          "<br>Muertes: %{customdata[2]:,}<extra></extra>",
+            marker_color=[RESALTE if i in elegidos else "#636EFA" for i in range(len(g))],
     )
-    fig.update_traces(
-        hovertemplate="<b>%{x}</b><br>Categoría: %{customdata[0]}<br>Rango: %{customdata[1]}"
-                      "<br>Muertes: %{customdata[2]:,}<extra></extra>"
-    )
-    return fig
+    return _base(fig, ylab={"abs": "Muertes (n)", "pct": "Porcentaje (%)"},
+                 titulo={"abs": titulo_base + " — totales", "pct": titulo_base + " — % dentro del total"})
 
-# --- NUEVO: Líneas mensuales interactivas
-@app.callback(
-    Output("fig_lineas", "figure"),
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="edad"),
+    Output("fig_edad", "figure"),
+    Input("base_edad", "data"),
+    Input("modo_edad", "value"),
+)
+
+# --- Líneas en el tiempo: todas las series en un paso, solo el rango visible
+TITULO_RESOLUCION = {"mes": "mensual", "trimestre": "trimestral", "ano": "anual"}
+
+@trabajos.callback(
+    app,
+    Output("base_lineas", "data"),
     Input("series_lineas", "value"),
+    Input("resolucion_lineas", "value"),
+    Input("vista_lineas", "data"),
+    Input("filtro", "data"),
+    progreso="progreso_lineas", cancelar=[Input("tabs", "value")],
+)
+@metricas.instrumentar("actualizar_lineas", "tab-lineas")
+@preparacion.requiere("cubo", "indice", "series", cargando=_base_cargando)
+@cache_figuras.memoizar("actualizar_lineas", version_datos)
+def actualizar_lineas(series_sel, resolucion="mes", vista=None, f=None):
+    # vista: {ancho, x0, x1} del gráfico (assets/panel.js, al hacer zoom o cambiar de tamaño);
+    # las series son departamentos: del filtro compartido se toman los demás ejes
+    cods = [_cod_dpto(s) for s in (series_sel or [COD_TOTAL])]
+    resolucion = resolucion if resolucion in RESOLUCIONES else "mes"
+    vista = vista or {}
+    filtro = _filtro(f, "dpto")
+    trabajos.avanzar(f"Sumando {len(cods)} serie{'s' if len(cods) > 1 else ''}…")
+    series = series_tiempo() if _sin_cruces(filtro) else series_filtradas(filtro)
+    xs, ys = series.seleccion(cods, resolucion, vista.get("x0"), vista.get("x1"),
+                              vista.get("ancho") or ANCHO_DEFECTO, revisar=trabajos.revisar)
+    texto = _texto_filtro(filtro)
+    ylab = "Muertes (n)"
+    trabajos.avanzar("Armando la figura…")
+    with metricas.fase("figura"):
+        fig = go.Figure([
+            go.Scattergl(x=x, y=y, name=_nombre_dpto(cod, "Colombia"), mode="lines+markers",
+                         connectgaps=True, line_width=3,
+                         hovertemplate=f"{_nombre_dpto(cod, 'Colombia')}: %{{y}} · {ylab}<extra></extra>")
+            for cod, x, y in zip(cods, xs, ys)
+        ])
+        trabajos.revisar()
+        fig.update_layout(
+            title=f"Tendencia {TITULO_RESOLUCION[resolucion]} del total de muertes" + (f" — {texto}" if texto else ""),
+            xaxis=dict(type="date", title="Periodo"), yaxis_title=ylab, legend_title_text="Serie",
+            margin=dict(l=20, r=20, t=60, b=40), height=480, hovermode="x unified",
+            uirevision="lineas",   # el zoom del usuario se conserva al llegar los datos del rango
+        )
+    return _base(fig, ylab={"abs": ylab, "idx": "Índice (máx=100)"})
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="vistaLineas"),
+    Output("vista_lineas", "data"),
+    Input("fig_lineas", "relayoutData"),
+    State("vista_lineas", "data"),
+)
+
+app.clientside_callback(
+    ClientsideFunction(namespace="panel", function_name="lineas"),
+    Output("fig_lineas", "figure"),
+    Input("base_lineas", "data"),
     Input("metrica_lineas", "value"),
     Input("modo_lineas", "value"),
 )
-def actualizar_lineas(series_sel, metrica, modo):
-    # fallback
-    if not series_sel:
-        series_sel = ["__COL__"]
-
-    frames = []
-    for s in series_sel:
-        if s == "__COL__":
-            g = national_month.copy()
-            g["Serie"] = "Colombia"
-        else:
-            g = (dept_month[dept_month["NOMBRE_DPT"] == s]
-                 .groupby("MES", as_index=False)["MUERTES"].sum())
-            g["Serie"] = s
-        # asegurar todos los meses
-        g = g.set_index("MES").reindex(MESES).fillna(0).reset_index()
-        # métrica
-        if metrica == "idx":
-            maxv = g["MUERTES"].max()
-            g["VAL"] = 0 if maxv == 0 else (g["MUERTES"] / maxv) * 100.0
-        else:
-            g["VAL"] = g["MUERTES"]
-        frames.append(g[["MES","VAL","Serie"]])
-
-    plot = pd.concat(frames, ignore_index=True)
-    cat_mes = pd.Categorical(plot["MES"], categories=MESES, ordered=True)
-    plot = plot.assign(MES=cat_mes).sort_values(["Serie","MES"])
-
-    ylab = "Índice (máx=100)" if metrica == "idx" else "Muertes (n)"
-    fig = px.line(
-        plot, x="MES", y="VAL", color="Serie",
-        markers=(modo == "lines+markers"),
-        labels={"MES":"Mes","VAL": ylab, "Serie":"Serie"},
-        title="Tendencia mensual del total de muertes (demo)"
-    )
-    fig.update_layout(
-        xaxis=dict(categoryorder="array", categoryarray=MESES),
-        margin=dict(l=20, r=20, t=60, b=40),
-        height=480,
-        hovermode="x unified",
-    )
-    fig.update_traces(connectgaps=True, line_width=3)
-    return fig
+
+_fase("layout_callbacks")
+metricas.registrar_arranque(FASES_ARRANQUE)
 
 # =============================================================================
 # Main
 # =============================================================================
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8050))
+    preparacion.iniciar()
     app.run_server(host="0.0.0.0", port=port, debug=False)
 
 
@@ -0,0 +1,258 @@
+// -----------------------------------------------------------------------------
+// Modos de presentación del panel (callbacks del lado del cliente)
+//   - El servidor envía una vez la figura base y sus series crudas a un dcc.Store
+//   - Índice / porcentaje / marcadores se aplican aquí, sin ida y vuelta al servidor
+//   - Las series largas llegan como arreglos binarios tipados ({dtype, bdata})
+//   - {cargando: true, fig}: los datos aún se cargan en el servidor; se muestra fig
+//   - Mapa: la geometría (puntos y figura base) se pide una vez por versión y queda
+//     en memoria (y en la caché HTTP); cada cambio trae solo las muertes y el resalte
+//   - Filtro compartido: la barra de filtros y los clics en las figuras arman el
+//     Store "filtro" que siguen los callbacks de todas las pestañas
+// -----------------------------------------------------------------------------
+
+(function () {
+    var TIPOS = {f8: Float64Array, f4: Float32Array, i4: Int32Array, u4: Uint32Array,
+                 i2: Int16Array, u2: Uint16Array, i1: Int8Array, u1: Uint8Array};
+
+    function serie(v) {
+        // lista JSON, o arreglo binario tipado (compacto.arreglo_binario) decodificado a lista
+        if (Array.isArray(v) || !v || !v.bdata) { return (v || []).slice(); }
+        var bin = atob(v.bdata), bytes = new Uint8Array(bin.length);
+        for (var i = 0; i < bin.length; i++) { bytes[i] = bin.charCodeAt(i); }
+        return Array.prototype.slice.call(new TIPOS[v.dtype](bytes.buffer));
+    }
+
+    function clonar(base) {
+        var fig = JSON.parse(JSON.stringify(base.fig));
+        fig.data.forEach(function (tr, i) {
+            tr.x = serie(base.x[i]);
+            tr.y = serie(base.y[i]);
+        });
+        return fig;
+    }
+
+    function indice(v) {
+        var m = Math.max.apply(null, v);
+        return v.map(function (x) { return m === 0 ? 0 : (x / m) * 100.0; });
+    }
+
+    function porcentaje(v, total) {
+        return v.map(function (x, i) {
+            var t = Array.isArray(total) ? total[i] : total;
+            return t === 0 ? 0 : (x / t) * 100.0;
+        });
+    }
+
+    function etiquetaY(fig, desde, hasta) {
+        fig.layout.yaxis = fig.layout.yaxis || {};
+        fig.layout.yaxis.title = Object.assign({}, fig.layout.yaxis.title, {text: hasta});
+        fig.data.forEach(function (tr) {
+            if (tr.hovertemplate) { tr.hovertemplate = tr.hovertemplate.split(desde).join(hasta); }
+        });
+    }
+
+    function textoPct(tr) {
+        tr.text = tr.y.map(function (v) { return v.toFixed(1) + "%"; });
+    }
+
+    function titulo(fig, texto) {
+        fig.layout.title = Object.assign({}, fig.layout.title, {text: texto});
+    }
+
+    function miles(x) {
+        return Math.trunc(x).toLocaleString("en-US");
+    }
+
+    var GEOMETRIAS = {};       // url versionada -> promesa de la geometría del mapa
+
+    function geometria(url) {
+        if (!GEOMETRIAS[url]) {
+            GEOMETRIAS[url] = fetch(url).then(function (r) {
+                if (!r.ok) { throw new Error("geometría " + url + ": " + r.status); }
+                return r.json();
+            }).catch(function (e) {
+                delete GEOMETRIAS[url];   // se reintenta en la próxima actualización
+                throw e;
+            });
+        }
+        return GEOMETRIAS[url];
+    }
+
+    function promedio(v) {
+        return v.reduce(function (a, b) { return a + b; }, 0) / v.length;
+    }
+
+    var PASO_ANCHO = 50;       // píxeles: anchos parecidos comparten entrada en la caché de figuras
+
+    function sinCambios() {
+        return window.dash_clientside.no_update;
+    }
+
+    function alternar(valores, v) {
+        // clic en un valor ya elegido: se quita; si no, se agrega
+        valores = (valores || []).slice();
+        var i = valores.indexOf(v);
+        if (i >= 0) { valores.splice(i, 1); } else { valores.push(v); }
+        return valores.sort(function (a, b) { return a - b; });
+    }
+
+    function punto(click) {
+        return click && click.points && click.points.length ? click.points[0] : null;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        panel: {
+            barras: function (base, metrica) {
+                if (!base) { return [sinCambios(), sinCambios()]; }
+                if (base.cargando) { return [base.fig, "Cargando datos…"]; }
+                var fig = clonar(base), tr = fig.data[0], muertes = serie(base.y[0]);
+                if (metrica === "indice") {
+                    tr.y = indice(muertes);
+                    etiquetaY(fig, base.textos.ylab.muertes, base.textos.ylab.indice);
+                }
+                // KPIs: total, mes pico y mes mínimo de la métrica visible
+                var total = muertes.reduce(function (a, b) { return a + b; }, 0);
+                var iMax = 0, iMin = 0;
+                tr.y.forEach(function (v, i) {
+                    if (v > tr.y[iMax]) { iMax = i; }
+                    if (v < tr.y[iMin]) { iMin = i; }
+                });
+                var fmt = metrica === "muertes" ? miles : function (v) { return v.toFixed(1); };
+                var rotulo = base.textos.periodo ? "Total " + base.textos.periodo : "Total";
+                var kpi = tr.y.length
+                    ? rotulo + ": " + miles(total) + " — Pico: " + tr.x[iMax] + ": " + fmt(tr.y[iMax]) +
+                      " — Mínimo: " + tr.x[iMin] + ": " + fmt(tr.y[iMin])
+                    : rotulo + ": 0 — Pico: -: 0 — Mínimo: -: 0";
+                return [fig, kpi];
+            },
+
+            mapa: function (base) {
+                // puntos de todos los departamentos o solo el resaltado (con más zoom)
+                if (!base) { return sinCambios(); }
+                if (base.cargando) { return base.fig; }
+                return geometria(base.geo).then(function (geo) {
+                    var fig = JSON.parse(JSON.stringify(geo.fig)), tr = fig.data[0], muertes = serie(base.valores);
+                    var filas = base.resalte === null ? geo.cod.map(function (_, i) { return i; })
+                              : base.resalte >= 0 ? [base.resalte] : [];
+                    function de(v) { return filas.map(function (i) { return v[i]; }); }
+                    var n = de(muertes);
+                    tr.lat = de(geo.lat); tr.lon = de(geo.lon); tr.text = de(geo.texto);
+                    tr.customdata = de(geo.cod);   // el clic fija el departamento del filtro compartido
+                    tr.marker = Object.assign({}, tr.marker, {size: n, color: n,
+                        sizeref: (n.length ? Math.max.apply(null, n) : 0) / (35 * 35)});
+                    // -1: el departamento pedido no está en el mapa (p. ej. Bogotá); vista nacional
+                    var enfocado = base.resalte !== null && base.resalte >= 0;
+                    fig.layout.mapbox = Object.assign({}, fig.layout.mapbox, {
+                        zoom: enfocado ? 5.2 : 4.3,
+                        center: enfocado ? {lat: tr.lat[0], lon: tr.lon[0]}
+                                         : {lat: promedio(geo.lat), lon: promedio(geo.lon)}});
+                    return fig;
+                });
+            },
+
+            sexo: function (base, modo) {
+                if (!base) { return sinCambios(); }
+                if (base.cargando) { return base.fig; }
+                var fig = clonar(base);
+                titulo(fig, base.textos.titulo[modo]);
+                if (modo === "pct") {
+                    var totales = {};
+                    fig.data.forEach(function (tr) {
+                        tr.x.forEach(function (d, i) { totales[d] = (totales[d] || 0) + tr.y[i]; });
+                    });
+                    fig.data.forEach(function (tr) {
+                        tr.y = porcentaje(tr.y, tr.x.map(function (d) { return totales[d]; }));
+                        textoPct(tr);
+                    });
+                    etiquetaY(fig, base.textos.ylab.abs, base.textos.ylab.pct);
+                }
+                return fig;
+            },
+
+            edad: function (base, modo) {
+                if (!base) { return sinCambios(); }
+                if (base.cargando) { return base.fig; }
+                var fig = clonar(base);
+                titulo(fig, base.textos.titulo[modo]);
+                if (modo === "pct") {
+                    var tr = fig.data[0];
+                    var total = tr.y.reduce(function (a, b) { return a + b; }, 0);
+                    tr.y = porcentaje(tr.y, total);
+                    textoPct(tr);
+                    etiquetaY(fig, base.textos.ylab.abs, base.textos.ylab.pct);
+                }
+                return fig;
+            },
+
+            lineas: function (base, metrica, modo) {
+                if (!base) { return sinCambios(); }
+                if (base.cargando) { return base.fig; }
+                var fig = clonar(base);
+                fig.data.forEach(function (tr) {
+                    if (metrica === "idx") { tr.y = indice(tr.y); }
+                    tr.mode = modo;
+                });
+                if (metrica === "idx") { etiquetaY(fig, base.textos.ylab.abs, base.textos.ylab.idx); }
+                return fig;
+            },
+
+            filtro: function (dpto, sexo, edad, mes, capitulo) {
+                // listas ordenadas: el mismo filtro es la misma clave en la caché de figuras
+                function orden(v) { return (v || []).slice().sort(function (a, b) { return a - b; }); }
+                return {dpto: dpto || 0, sexo: orden(sexo), edad: orden(edad), mes: orden(mes),
+                        capitulo: orden(capitulo)};
+            },
+
+            quitarFiltros: function () {
+                return [null, [], [], [], []];
+            },
+
+            clicMapa: function (click, dpto) {
+                var p = punto(click);
+                if (!p || p.customdata === undefined) { return sinCambios(); }
+                return p.customdata === dpto ? null : p.customdata;
+            },
+
+            clicSexo: function (click, dpto, sexo) {
+                // barra de un departamento y un sexo: fija ambos (o los quita si ya eran esos)
+                var p = punto(click);
+                if (!p || !p.customdata) { return [sinCambios(), sinCambios()]; }
+                var cod = p.customdata[0], s = p.customdata[1];
+                if (cod === dpto && sexo && sexo.length === 1 && sexo[0] === s) { return [null, []]; }
+                return [cod, [s]];
+            },
+
+            clicEdad: function (click, edad) {
+                var p = punto(click);
+                return p ? alternar(edad, p.pointNumber) : sinCambios();
+            },
+
+            clicMes: function (click, mes) {
+                var p = punto(click);
+                return p ? alternar(mes, p.pointNumber + 1) : sinCambios();
+            },
+
+            vistaLineas: function (relayout, vista) {
+                // ancho del área de trazado (de a PASO_ANCHO px) y rango visible al mes: el
+                // servidor devuelve solo esos periodos, reducidos con LTTB a ese ancho
+                var gd = document.querySelector("#fig_lineas .js-plotly-plot");
+                var largo = gd && gd._fullLayout && gd._fullLayout.xaxis ? gd._fullLayout.xaxis._length : 0;
+                var ancho = largo ? Math.max(PASO_ANCHO, Math.round(largo / PASO_ANCHO) * PASO_ANCHO) : null;
+                var r = relayout || {}, x0 = vista ? vista.x0 : null, x1 = vista ? vista.x1 : null;
+                if (r["xaxis.autorange"]) {
+                    x0 = x1 = null;
+                } else if (r["xaxis.range[0]"] !== undefined) {
+                    x0 = String(r["xaxis.range[0]"]).slice(0, 7);
+                    x1 = String(r["xaxis.range[1]"]).slice(0, 7);
+                } else if (r["xaxis.range"]) {
+                    x0 = String(r["xaxis.range"][0]).slice(0, 7);
+                    x1 = String(r["xaxis.range"][1]).slice(0, 7);
+                }
+                var nueva = {ancho: ancho, x0: x0, x1: x1};
+                if (vista && vista.ancho === nueva.ancho && vista.x0 === x0 && vista.x1 === x1) { return sinCambios(); }
+                if (!vista && !ancho && x0 === null) { return sinCambios(); }
+                return nueva;
+            }
+        }
+    });
+})();
@@ -0,0 +1,249 @@
+# -----------------------------------------------------------------------------
+# Benchmark del panel: arranque, latencia por callback y tamaño de respuestas
+#   - Cada conjunto de datos corre en procesos nuevos (caché vacía → "frío", luego "caliente")
+#   - Arranque: tiempo de `import app` y sus fases (app.FASES_ARRANQUE); la duración de
+#     cada conjunto de datos (@preparacion.dato: cubo y pestañas) sale aparte (app.FASES_DATOS)
+#   - Callbacks: p50/p99 sobre todo su dominio de entradas (opciones del layout),
+#     pico de memoria asignada (tracemalloc), bytes de la respuesta serializada
+#     (sin comprimir y con gzip) y tiempo de serialización con el motor JSON de Dash
+#   - La caché de figuras se desactiva: se mide el cálculo, no la lectura de SQLite
+#   - Salida JSON; --comparar contrasta contra un JSON anterior (p. ej. de otro commit)
+#
+#   python benchmark.py --conjuntos demo datos x1 x10 --salida bench.json
+#   python benchmark.py --comparar bench_main.json --salida bench.json
+# -----------------------------------------------------------------------------
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+BASE = Path(__file__).parent
+CALLBACKS = ["actualizar_barras", "actualizar_mapa_y_card", "actualizar_pie", "actualizar_barras_sexo",
+             "actualizar_histograma_edad", "actualizar_lineas", "actualizar_tabla_causas"]
+
+
+# ====== Dentro del proceso medido =============================================
+def _opciones(arbol, id_componente: str) -> list:
+    for c in arbol._traverse():
+        if getattr(c, "id", None) == id_componente:
+            return [o["value"] if isinstance(o, dict) else o for o in c.options]
+    return []
+
+
+def _filtros(app_mod) -> list[dict]:
+    # filtros compartidos (Store "filtro"): sin filtro, cada departamento solo y cruces
+    # que solo responde el índice de bits
+    from dash import html
+    arbol = html.Div([app_mod._barra_filtros()])
+    vacio = {"dpto": app_mod.COD_TOTAL, **{e: [] for e in app_mod.EJES_FILTRO}}
+    dptos = _opciones(arbol, "filtro_dpto")
+    cruces = [{"sexo": [1]}, {"edad": [8], "capitulo": [9]}, {"mes": [1, 2, 3], "sexo": [0]},
+              {"dpto": dptos[0], "capitulo": [2]}, {"dpto": dptos[-1], "sexo": [1], "edad": [9, 10]}]
+    return [vacio] + [{**vacio, "dpto": d} for d in dptos] + [{**vacio, **c} for c in cruces]
+
+
+def _dominios(app_mod) -> dict:
+    # combinaciones de entradas de cada callback, tomadas de las opciones de todas las pestañas
+    from dash import html
+    arbol = html.Div([c for _, crear in app_mod.PESTANAS.values() for c in crear()])
+    total = app_mod.COD_TOTAL
+    deps_lineas = [v for v in _opciones(arbol, "series_lineas") if v != total]
+    topn = [5, 12, 20]
+    filtros = _filtros(app_mod)
+    cruces = [f for f in filtros if any(f[e] for e in app_mod.EJES_FILTRO)]
+    return {
+        "actualizar_barras": [(f,) for f in filtros],
+        "actualizar_mapa_y_card": [(f,) for f in filtros],
+        "actualizar_pie": [(f, n) for f in filtros for n in topn],
+        "actualizar_barras_sexo": [(f,) for f in filtros[:1] + cruces],
+        "actualizar_histograma_edad": [(f,) for f in filtros],
+        "actualizar_lineas": [([total], "mes", None), ([total] + deps_lineas[:3], "mes", None),
+                              ([total] + deps_lineas, "mes", None), ([total] + deps_lineas, "ano", None),
+                              ([total] + deps_lineas, "mes", {"ancho": 300, "x0": None, "x1": None}),
+                              *[([total] + deps_lineas[:3], "mes", None, f) for f in cruces]],
+        "actualizar_tabla_causas": [(p, 10, s, q, f) for p in (0, 3)
+                                    for s in ([], [{"column_id": "NOMBRE", "direction": "asc"}])
+                                    for q in ("", '{CODIGO} contains "I"', '{NOMBRE} contains "tumor"')
+                                    for f in filtros[:1] + cruces],
+    }
+
+
+def _serializar(valor) -> tuple[bytes, float]:
+    # lo mismo que hace Dash con la respuesta de un callback (plotly.io.json, motor por defecto)
+    from plotly.io.json import to_json_plotly
+    t0 = time.perf_counter()
+    texto = to_json_plotly(valor)
+    return texto.encode("utf-8"), time.perf_counter() - t0
+
+
+def _percentil(v, q) -> float:
+    return float(np.percentile(np.asarray(v, dtype=float), q)) if len(v) else 0.0
+
+
+def medir_callbacks(app_mod, repeticiones: int) -> dict:
+    out = {}
+    dominios = _dominios(app_mod)
+    for nombre in CALLBACKS:
+        fn = getattr(app_mod, nombre, None)
+        entradas = dominios.get(nombre, [])
+        if fn is None or not entradas:
+            continue
+        tiempos, picos, payload, payload_gz, serializacion = [], [], [], [], []
+        for args in entradas:
+            res = fn(*args)                                     # calentamiento + tamaño
+            for _ in range(max(1, repeticiones)):
+                datos, dt = _serializar(res)
+                serializacion.append(dt)
+            payload.append(len(datos))
+            payload_gz.append(len(gzip.compress(datos, compresslevel=5, mtime=0)))
+            tracemalloc.start()
+            fn(*args)
+            picos.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            for _ in range(repeticiones):
+                t0 = time.perf_counter()
+                fn(*args)
+                tiempos.append(time.perf_counter() - t0)
+        out[nombre] = {
+            "entradas": len(entradas), "llamadas": len(tiempos),
+            "p50_ms": _percentil(tiempos, 50) * 1e3, "p99_ms": _percentil(tiempos, 99) * 1e3,
+            "max_ms": max(tiempos) * 1e3,
+            "asignado_pico_kb_p50": _percentil(picos, 50) / 1024, "asignado_pico_kb_max": max(picos) / 1024,
+            "payload_bytes_p50": int(_percentil(payload, 50)), "payload_bytes_max": max(payload),
+            "payload_gzip_bytes_max": max(payload_gz),
+            "serializacion_ms_p50": _percentil(serializacion, 50) * 1e3,
+        }
+    return out
+
+
+def _interno(repeticiones: int) -> None:
+    t0 = time.perf_counter()
+    import app as app_mod
+    import_s = time.perf_counter() - t0
+    fases = dict(app_mod.FASES_ARRANQUE)
+    fases["importaciones"] = import_s - sum(fases.values())   # dash, plotly, pandas, módulos propios
+    app_mod.precargar()                                       # primera activación de cada pestaña
+    res = {"import_s": import_s, "fases_s": fases, "datos_s": dict(app_mod.FASES_DATOS),
+           "hay_micro": app_mod.hay_micro()}
+    if repeticiones > 0:
+        res["callbacks"] = medir_callbacks(app_mod, repeticiones)
+    print("@@BENCH@@" + json.dumps(res))
+
+
+# ====== Orquestación ==========================================================
+def _micro_dir(conjunto: str, vacio: Path) -> Path | None:
+    if conjunto == "demo":
+        return vacio
+    if conjunto == "datos":
+        return None
+    escala = float(conjunto.lstrip("x"))
+    d = BASE / "data" / "sintetico" / f"x{escala:g}"
+    if not any(d.glob("nofetal*")):
+        from sinteticos import generar
+        print(f"[benchmark] generando sintéticos {conjunto} en {d}", file=sys.stderr)
+        generar(d, escala)
+    return d
+
+
+def _correr(env: dict, repeticiones: int) -> dict:
+    p = subprocess.run([sys.executable, "-W", "ignore", __file__, "--interno", str(repeticiones)],
+                       env=env, cwd=BASE, capture_output=True, text=True)
+    linea = next((l for l in p.stdout.splitlines() if l.startswith("@@BENCH@@")), None)
+    if p.returncode != 0 or linea is None:
+        raise RuntimeError(f"falló el proceso medido:\n{p.stderr[-2000:]}")
+    return json.loads(linea[len("@@BENCH@@"):])
+
+
+def medir_conjunto(conjunto: str, repeticiones: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        vacio = Path(tmp) / "sin_microdatos"
+        vacio.mkdir()
+        env = dict(os.environ, MORTALIDAD_CACHE_DIR=str(Path(tmp) / "cache"), MORTALIDAD_CACHE_FIGURAS_MB="0",
+                   PYTHONHASHSEED="0")
+        micro = _micro_dir(conjunto, vacio)
+        if micro is not None:
+            env["MORTALIDAD_MICRODATOS"] = str(micro)
+        frio = _correr(env, 0)
+        caliente = _correr(env, repeticiones)
+    return {
+        "hay_micro": caliente.pop("hay_micro"),
+        "arranque": {"frio": frio, "caliente": {k: caliente[k] for k in ("import_s", "fases_s", "datos_s")}},
+        "callbacks": caliente.get("callbacks", {}),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(previo: dict, actual: dict, umbral: float) -> list[str]:
+    # regresiones de p50/p99/payload e import en caliente por encima de `umbral` (fracción)
+    regresiones = []
+    for conj, a in actual["conjuntos"].items():
+        b = previo.get("conjuntos", {}).get(conj)
+        if not b:
+            continue
+        pares = [("arranque.caliente.import_s", b["arranque"]["caliente"]["import_s"],
+                  a["arranque"]["caliente"]["import_s"])]
+        for cb, m in a["callbacks"].items():
+            if cb in b["callbacks"]:
+                pares += [(f"{cb}.{k}", b["callbacks"][cb][k], m[k])
+                          for k in ("p50_ms", "p99_ms", "payload_bytes_max", "payload_gzip_bytes_max",
+                                    "serializacion_ms_p50")
+                          if k in b["callbacks"][cb] and k in m]
+        for clave, antes, ahora in pares:
+            cambio = (ahora - antes) / antes if antes else 0.0
+            print(f"{conj:>6} {clave:<48} {antes:>12.3f} → {ahora:>12.3f} ({cambio:+.0%})", file=sys.stderr)
+            if cambio > umbral:
+                regresiones.append(f"{conj}:{clave}")
+    return regresiones
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--interno":
+        _interno(int(sys.argv[2]))
+        sys.exit(0)
+    ap = argparse.ArgumentParser(description="Benchmark de arranque y callbacks del panel")
+    ap.add_argument("--conjuntos", nargs="+", default=["demo", "datos", "x1", "x10"],
+                    help="demo (sin microdatos), datos (./data/microdatos) o xN (sintéticos a escala N)")
+    ap.add_argument("--repeticiones", type=int, default=5, help="llamadas medidas por combinación de entradas")
+    ap.add_argument("--salida", type=Path, help="archivo JSON (por defecto, stdout)")
+    ap.add_argument("--comparar", type=Path, help="JSON de una corrida anterior")
+    ap.add_argument("--umbral", type=float, default=0.2, help="regresión tolerada en --comparar (0.2 = 20 %%)")
+    a = ap.parse_args()
+
+    resultado = {
+        "commit": _git_commit(), "fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(), "plataforma": platform.platform(), "cpus": os.cpu_count(),
+        "repeticiones": a.repeticiones, "conjuntos": {},
+    }
+    for c in a.conjuntos:
+        t0 = time.perf_counter()
+        resultado["conjuntos"][c] = medir_conjunto(c, a.repeticiones)
+        print(f"[benchmark] {c}: {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if a.salida:
+        a.salida.write_text(texto, encoding="utf-8")
+    else:
+        print(texto)
+    if a.comparar:
+        regresiones = comparar(json.loads(a.comparar.read_text(encoding="utf-8")), resultado, a.umbral)
+        if regresiones:
+            print(f"[benchmark] regresiones > {a.umbral:.0%}: {', '.join(regresiones)}", file=sys.stderr)
+            sys.exit(1)
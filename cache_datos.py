@@ -0,0 +1,152 @@
+# -----------------------------------------------------------------------------
+# Caché columnar en disco para los datos derivados de ./data
+#   - Cada tabla se guarda como un .npz (una columna = un arreglo NumPy, sin pickle)
+#   - Un manifiesto JSON registra tamaño, mtime y SHA-256 de cada archivo fuente
+#   - Se reconstruye solo si cambia el contenido (hash) de alguna fuente
+# -----------------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = Path(os.environ.get("MORTALIDAD_CACHE_DIR", Path(__file__).parent / "data" / ".cache"))
+
+
+def _sha256(p: Path) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def huella_fuentes(paths, previa: dict | None = None) -> dict:
+    # {nombre: {size, mtime_ns, sha256}}; reutiliza el hash previo si size/mtime no cambiaron
+    previa = previa or {}
+    out = {}
+    for p in sorted(Path(x) for x in paths):
+        st = p.stat()
+        ant = previa.get(p.name)
+        if ant and ant.get("size") == st.st_size and ant.get("mtime_ns") == st.st_mtime_ns:
+            sha = ant["sha256"]
+        else:
+            sha = _sha256(p)
+        out[p.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": sha}
+    return out
+
+
+def version_fuentes(paths) -> str:
+    # Versión barata (nombre, tamaño, mtime) para invalidar cachés derivadas
+    h = hashlib.sha1()
+    for p in sorted(Path(x) for x in paths):
+        st = p.stat()
+        h.update(f"{p.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:12]
+
+
+def _mismo_contenido(a: dict, b: dict) -> bool:
+    return a.keys() == b.keys() and all(a[k]["sha256"] == b[k]["sha256"] for k in a)
+
+
+def _a_columnar(df: pd.DataFrame) -> dict:
+    cols = {}
+    for c in df.columns:
+        s = df[c]
+        if pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s):
+            cols[c] = s.to_numpy()
+        else:
+            cols[c] = s.astype(str).to_numpy(dtype=str)   # unicode de ancho fijo (<U..), sin objetos
+    return cols
+
+
+def guardar_arreglos(nombre: str, arreglos: dict, huella: dict, version: int = 1, extra: dict | None = None,
+                     mmap: bool = False) -> None:
+    # mmap=True guarda un .npy por arreglo para abrirlos con np.load(mmap_mode="r"): los
+    # workers comparten las páginas del archivo en lugar de tener cada uno su copia
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    meta = {"version": version, "columnas": list(arreglos), "fuentes": huella, **(extra or {})}
+    if mmap:
+        sello = hashlib.sha1(f"{json.dumps(huella, sort_keys=True)}{time.time_ns()}{os.getpid()}".encode()).hexdigest()[:10]
+        for k, a in arreglos.items():
+            tmp = CACHE_DIR / f".{nombre}-{sello}.{k}.tmp.npy"
+            np.save(tmp, np.ascontiguousarray(a))
+            os.replace(tmp, CACHE_DIR / f"{nombre}-{sello}.{k}.npy")
+        _guardar_meta(nombre, {**meta, "mmap": sello})
+        # los archivos de sellos anteriores se borran; un proceso que aún los tenga
+        # mapeados sigue leyéndolos sin problema (Linux conserva el inodo)
+        for p in CACHE_DIR.glob(f"{nombre}-*.npy"):
+            if not p.name.startswith(f"{nombre}-{sello}."):
+                p.unlink(missing_ok=True)
+        return
+    tmp = CACHE_DIR / f".{nombre}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, **arreglos)
+    os.replace(tmp, CACHE_DIR / f"{nombre}.npz")   # escritura atómica: otro worker nunca ve un archivo a medias
+    _guardar_meta(nombre, meta)
+
+
+def _guardar_meta(nombre: str, meta: dict) -> None:
+    tmp = CACHE_DIR / f".{nombre}.{os.getpid()}.tmp.json"
+    tmp.write_text(json.dumps(meta, indent=1), encoding="utf-8")
+    os.replace(tmp, CACHE_DIR / f"{nombre}.json")
+
+
+def leer_meta(nombre: str) -> dict | None:
+    p = CACHE_DIR / f"{nombre}.json"
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def cargar_arreglos(nombre: str, fuentes, version: int = 1) -> tuple[dict | None, dict]:
+    # Devuelve (arreglos o None si la caché no es válida, huella actual de las fuentes).
+    # `version` cambia cuando cambia el formato guardado y obliga a reconstruirlo.
+    meta = leer_meta(nombre)
+    previa = (meta or {}).get("fuentes", {})
+    huella = huella_fuentes(fuentes, previa)
+    if meta is None or meta.get("version", 1) != version or not _mismo_contenido(previa, huella):
+        return None, huella
+    try:
+        if meta.get("mmap"):
+            arreglos = {c: np.load(CACHE_DIR / f"{nombre}-{meta['mmap']}.{c}.npy", mmap_mode="r", allow_pickle=False)
+                        for c in meta["columnas"]}
+        else:
+            with np.load(CACHE_DIR / f"{nombre}.npz", allow_pickle=False) as z:
+                arreglos = {c: z[c] for c in meta["columnas"]}
+    except (OSError, ValueError, KeyError):
+        return None, huella
+    if previa != huella:
+        # solo cambió el mtime (p. ej. checkout de git): se refresca el manifiesto
+        try:
+            _guardar_meta(nombre, {**meta, "fuentes": huella})
+        except OSError:
+            pass
+    return arreglos, huella
+
+
+def guardar_frame(nombre: str, df: pd.DataFrame, huella: dict, version: int = 1) -> None:
+    guardar_arreglos(nombre, _a_columnar(df), huella, version)
+
+
+def cargar_frame(nombre: str, fuentes, version: int = 1) -> tuple[pd.DataFrame | None, dict]:
+    arreglos, huella = cargar_arreglos(nombre, fuentes, version)
+    return (None if arreglos is None else pd.DataFrame(arreglos)), huella
+
+
+def frame_cacheado(nombre: str, fuentes, construir, version: int = 1) -> pd.DataFrame:
+    # Carga la tabla desde la caché o la reconstruye con `construir()` y la persiste
+    fuentes = list(fuentes)
+    df, huella = cargar_frame(nombre, fuentes, version)
+    if df is not None:
+        return df
+    df = construir()
+    try:
+        guardar_frame(nombre, df, huella, version)
+    except OSError:
+        pass   # disco de solo lectura: se sirve lo construido sin persistir
+    return df
@@ -0,0 +1,143 @@
+# -----------------------------------------------------------------------------
+# Caché de respuestas de los callbacks, compartida entre workers de gunicorn
+#   - Clave: (callback, entradas normalizadas, versión de los datos)
+#   - Almacén: SQLite en data/.cache (modo WAL), valores JSON comprimidos con zlib
+#   - Expulsión LRU cuando el total supera el tope (MORTALIDAD_CACHE_FIGURAS_MB).
+#     Un acierto es solo un SELECT: `usado` se refresca si tiene más de
+#     REFRESCAR_USADO_S (el orden LRU no necesita más precisión)
+#   - Aciertos/fallos por callback en la memoria de cada worker (metricas.py,
+#     que ya los junta entre workers para /metrics)
+# -----------------------------------------------------------------------------
+
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from plotly.io.json import from_json_plotly, to_json_plotly
+
+from cache_datos import CACHE_DIR
+from metricas import aciertos_cache, contar_cache, fase
+
+TOPE_BYTES = int(float(os.environ.get("MORTALIDAD_CACHE_FIGURAS_MB", "64")) * 1024 * 1024)
+RUTA = CACHE_DIR / "figuras.sqlite"
+_PURGAR_CADA = 32   # inserciones entre revisiones del tope
+REFRESCAR_USADO_S = 60.0
+
+_local = threading.local()
+_inserciones = 0
+_lock = threading.Lock()
+
+
+def _conexion() -> sqlite3.Connection | None:
+    # una conexión por hilo y por proceso (no se heredan conexiones tras el fork)
+    if getattr(_local, "pid", None) == os.getpid():
+        return _local.con
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(RUTA, timeout=1.0, isolation_level=None, check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        con.execute("CREATE TABLE IF NOT EXISTS figuras (clave TEXT PRIMARY KEY, callback TEXT, "
+                    "valor BLOB, bytes INTEGER, usado REAL)")
+        con.execute("CREATE INDEX IF NOT EXISTS figuras_usado ON figuras (usado)")
+    except sqlite3.Error as e:
+        print(f"[cache_figuras] deshabilitada: {e}")
+        con = None
+    _local.con, _local.pid = con, os.getpid()
+    return con
+
+
+def _clave(callback: str, args, version: str) -> str:
+    entrada = json.dumps([callback, args, version], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(entrada.encode("utf-8")).hexdigest()
+
+
+def leer(callback: str, clave: str):
+    con = _conexion()
+    if con is None:
+        return None
+    try:
+        fila = con.execute("SELECT valor, usado FROM figuras WHERE clave = ?", (clave,)).fetchone()
+        contar_cache(callback, fila is not None)
+        if fila is None:
+            return None
+        ahora = time.time()
+        if ahora - fila[1] > REFRESCAR_USADO_S:
+            con.execute("UPDATE figuras SET usado = ? WHERE clave = ?", (ahora, clave))
+        return from_json_plotly(zlib.decompress(fila[0]))
+    except (sqlite3.Error, zlib.error, ValueError):
+        return None
+
+
+def escribir(callback: str, clave: str, valor) -> None:
+    global _inserciones
+    con = _conexion()
+    if con is None:
+        return
+    try:
+        blob = zlib.compress(to_json_plotly(valor).encode("utf-8"), 6)
+        if len(blob) > TOPE_BYTES // 4:
+            return   # una sola respuesta no debe desplazar media caché
+        con.execute("INSERT OR REPLACE INTO figuras VALUES (?, ?, ?, ?, ?)",
+                    (clave, callback, blob, len(blob), time.time()))
+        with _lock:
+            _inserciones += 1
+            purgar = _inserciones % _PURGAR_CADA == 0
+        if purgar:
+            _aplicar_tope(con)
+    except (sqlite3.Error, TypeError, ValueError):
+        pass
+
+
+def _aplicar_tope(con) -> None:
+    total = con.execute("SELECT COALESCE(SUM(bytes), 0) FROM figuras").fetchone()[0]
+    if total <= TOPE_BYTES:
+        return
+    # LRU: se borran las entradas menos usadas hasta quedar en el 80 % del tope
+    exceso = total - int(TOPE_BYTES * 0.8)
+    filas = con.execute("SELECT clave, bytes FROM figuras ORDER BY usado").fetchall()
+    borrar, acumulado = [], 0
+    for clave, b in filas:
+        if acumulado >= exceso:
+            break
+        borrar.append((clave,)); acumulado += b
+    con.executemany("DELETE FROM figuras WHERE clave = ?", borrar)
+
+
+def memoizar(callback: str, version):
+    # Decorador para callbacks de Dash: `version` es un str o una función que lo devuelve
+    def deco(fn):
+        if TOPE_BYTES <= 0:
+            return fn
+
+        @functools.wraps(fn)
+        def envoltura(*args):
+            clave = _clave(callback, args, version() if callable(version) else version)
+            with fase("cache"):
+                guardado = leer(callback, clave)
+            if guardado is not None:
+                return tuple(guardado["valor"]) if guardado["tupla"] else guardado["valor"]
+            out = fn(*args)
+            # varias salidas llegan como tupla; JSON no distingue tupla de lista
+            with fase("cache"):
+                escribir(callback, clave, {"tupla": isinstance(out, tuple), "valor": out})
+            return out
+
+        return envoltura
+    return deco
+
+
+def estadisticas() -> dict:
+    con = _conexion()
+    if con is None:
+        return {"habilitada": False}
+    try:
+        n, b = con.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM figuras").fetchone()
+    except sqlite3.Error as e:
+        return {"habilitada": True, "error": str(e)}
+    return {"habilitada": True, "entradas": n, "bytes": b, "tope_bytes": TOPE_BYTES, "callbacks": aciertos_cache()}
@@ -0,0 +1,490 @@
+# -----------------------------------------------------------------------------
+# Prueba de carga local contra gunicorn (misma línea de arranque que render.yaml)
+#   - Levanta `app:server` en 127.0.0.1 con los --workers/--threads indicados
+#   - Usuarios simulados (hilos) que repiten sesiones reales del navegador:
+#       carga inicial (/, _dash-layout, _dash-dependencies y callbacks iniciales)
+#       y luego acciones al azar: cambiar de pestaña, el filtro compartido, el Top N,
+#       la página/filtro de la tabla y el modo (los modos no llegan al servidor).
+#       El filtro compartido lo arma el navegador (assets/panel.js): aquí se elige
+#       directamente el Store "filtro" con valores de la barra de filtros
+#   - Las peticiones _dash-update-component se arman desde _dash-dependencies,
+#     igual que el renderer de Dash; las salidas alimentan callbacks encadenados.
+#     Los callbacks en segundo plano (trabajos.py) se sondean hasta su resultado
+#   - El contenido de cada pestaña llega como `children` al activarla: sus
+#     componentes disparan sus callbacks iniciales y solo entonces se pueden usar
+#   - Reporta rendimiento (req/s), latencias p50/p95/p99, tasa de errores y
+#     CPU/RSS/PSS por worker (leídos de /proc). Un worker que no pasa de ~100 %
+#     de CPU con varios hilos está limitado por el GIL.
+#
+#   python carga.py --usuarios 200 --duracion 60
+#   python carga.py --configs 2x8 4x4 8x1 --usuarios 300 --salida carga.json
+# -----------------------------------------------------------------------------
+
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import re
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+BASE = Path(__file__).parent
+PAUSA_MEDIA = 1.0      # segundos de "lectura" entre acciones de un usuario
+
+# Acciones de un usuario: (peso, componente, propiedad). Los valores salen del layout.
+ACCIONES = [
+    (3, "tabs", "value"),
+    (4, "filtro", "data"), (1, "metrica", "value"),
+    (2, "topn", "value"),
+    (2, "tabla-top10-causas", "page_current"), (1, "tabla-top10-causas", "filter_query"),
+    (1, "tabla-top10-causas", "sort_by"),
+    (1, "modo_sexo", "value"),
+    (1, "modo_edad", "value"),
+    (2, "series_lineas", "value"), (1, "resolucion_lineas", "value"),
+    (1, "metrica_lineas", "value"), (1, "modo_lineas", "value"),
+]
+FILTROS = ["", '{CODIGO} contains "I2"', '{NOMBRE} contains "tumor"', '{CASOS} > 100', '{CODIGO} contains "J"']
+ORDENES = [[], [{"column_id": "CASOS", "direction": "asc"}], [{"column_id": "NOMBRE", "direction": "asc"}]]
+
+
+# ====== gunicorn ==============================================================
+def comando_render(ruta: Path = BASE / "render.yaml") -> list[str]:
+    m = re.search(r'startCommand:\s*"([^"]+)"', ruta.read_text(encoding="utf-8"))
+    return shlex.split(m.group(1)) if m else ["gunicorn", "app:server", "--workers=2", "--threads=8", "--timeout=120"]
+
+
+def _con_opcion(cmd: list[str], opcion: str, valor) -> list[str]:
+    cmd = [a for a in cmd if not a.startswith(f"--{opcion}=")]
+    return cmd + [f"--{opcion}={valor}"]
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def iniciar_gunicorn(workers: int | None, threads: int | None, puerto: int, env: dict) -> subprocess.Popen:
+    cmd = comando_render()
+    if cmd[0] == "gunicorn":
+        cmd = [sys.executable, "-m", "gunicorn"] + cmd[1:]    # mismo intérprete que este script
+    if workers:
+        cmd = _con_opcion(cmd, "workers", workers)
+    if threads:
+        cmd = _con_opcion(cmd, "threads", threads)
+    cmd = _con_opcion(cmd, "bind", f"127.0.0.1:{puerto}")
+    print(f"[carga] {' '.join(cmd)}", file=sys.stderr)
+    return subprocess.Popen(cmd, cwd=BASE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+
+def esperar_listo(puerto: int, proc: subprocess.Popen, limite: float = 180.0) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < limite:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn terminó al arrancar:\n{proc.stderr.read()[-2000:]}")
+        try:
+            con = http.client.HTTPConnection("127.0.0.1", puerto, timeout=2)
+            con.request("GET", "/_dash-layout")
+            if con.getresponse().status == 200:
+                return time.perf_counter() - t0
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("gunicorn no respondió a tiempo")
+
+
+# ====== CPU / memoria por worker (/proc) ======================================
+_TICK = os.sysconf("SC_CLK_TCK")
+_PAGINA = os.sysconf("SC_PAGE_SIZE")
+
+
+def _hijos(pid: int) -> list[int]:
+    hijos = []
+    for t in Path(f"/proc/{pid}/task").glob("*/children"):
+        hijos += [int(x) for x in t.read_text().split()]
+    return hijos
+
+
+def _cpu_s(pid: int) -> float:
+    campos = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    return (int(campos[11]) + int(campos[12])) / _TICK       # utime + stime
+
+
+def _memoria_mb(pid: int) -> tuple[float, float]:
+    rss = int(Path(f"/proc/{pid}/statm").read_text().split()[1]) * _PAGINA / 2**20
+    pss = 0.0
+    try:
+        for linea in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+            if linea.startswith("Pss:"):
+                pss = int(linea.split()[1]) / 1024
+                break
+    except OSError:
+        pass
+    return rss, pss
+
+
+class Monitor(threading.Thread):
+    def __init__(self, pid_maestro: int, intervalo: float = 0.5):
+        super().__init__(daemon=True)
+        self.pid, self.intervalo = pid_maestro, intervalo
+        self.muestras = {}          # pid -> lista de (cpu_pct, rss_mb, pss_mb)
+        self._alto = threading.Event()
+
+    def run(self):
+        previo = {}
+        while not self._alto.wait(self.intervalo):
+            ahora = time.perf_counter()
+            for pid in _hijos(self.pid):
+                try:
+                    cpu = _cpu_s(pid)
+                    rss, pss = _memoria_mb(pid)
+                except OSError:
+                    continue
+                if pid in previo:
+                    t, c = previo[pid]
+                    self.muestras.setdefault(pid, []).append((100.0 * (cpu - c) / (ahora - t), rss, pss))
+                previo[pid] = (ahora, cpu)
+
+    def detener(self) -> dict:
+        self._alto.set()
+        self.join()
+        out = {}
+        for pid, m in self.muestras.items():
+            a = np.array(m)
+            out[str(pid)] = {"cpu_pct_media": float(a[:, 0].mean()), "cpu_pct_max": float(a[:, 0].max()),
+                             "rss_mb_max": float(a[:, 1].max()), "pss_mb_max": float(a[:, 2].max())}
+        return out
+
+
+# ====== Cliente Dash ==========================================================
+def _valores_layout(nodo, out: dict, podar: str | None = None) -> dict:
+    # (id, propiedad) -> valor inicial, recorriendo el JSON de _dash-layout (sin bajar por `podar`)
+    if isinstance(nodo, list):
+        for n in nodo:
+            _valores_layout(n, out, podar)
+    elif isinstance(nodo, dict) and "props" in nodo:
+        props = nodo["props"]
+        cid = props.get("id")
+        if isinstance(cid, str):
+            for k, v in props.items():
+                if k != "children":
+                    out[(cid, k)] = v
+            out[(cid, "id")] = cid
+        if cid is None or cid != podar:
+            _valores_layout(props.get("children"), out, podar)
+    return out
+
+
+def _pestanas(nodo, out: list) -> list:
+    if isinstance(nodo, list):
+        for n in nodo:
+            _pestanas(n, out)
+    elif isinstance(nodo, dict) and "props" in nodo:
+        if nodo.get("type") == "Tab" and nodo["props"].get("value"):
+            out.append(nodo["props"]["value"])
+        _pestanas(nodo["props"].get("children"), out)
+    return out
+
+
+def _salidas(output: str) -> list[tuple[str, str]]:
+    partes = output[2:-2].split("...") if output.startswith("..") else [output]
+    return [tuple(p.rsplit(".", 1)) for p in partes]
+
+
+class Sitio:
+    # Lo que un navegador aprende al cargar la página: callbacks del servidor y dominios de entrada
+    def __init__(self, dependencias: list, layout: dict):
+        self.callbacks = _callbacks_servidor(dependencias)
+        self.layout = layout
+        self.inicial = _valores_layout(layout, {})
+        self._fuera = {}
+        self.pestanas = _pestanas(layout, [])
+        self.por_entrada = {}
+        for d in self.callbacks:
+            for i in d["inputs"]:
+                self.por_entrada.setdefault((i["id"], i["property"]), []).append(d)
+
+    def fuera_de(self, cid: str) -> set:
+        # ids del layout que no están dentro de `cid` (lo que sigue visible al reemplazar su contenido)
+        if cid not in self._fuera:
+            self._fuera[cid] = {c for c, _ in _valores_layout(self.layout, {}, podar=cid)}
+        return self._fuera[cid]
+
+    def opciones(self, cid: str, prop: str, rng: random.Random, estado: dict):
+        if cid == "tabs":
+            return rng.choice(self.pestanas)
+        if cid == "tabla-top10-causas":
+            return {"page_current": rng.randint(0, 5), "filter_query": rng.choice(FILTROS),
+                    "sort_by": rng.choice(ORDENES)}[prop]
+        if cid == "filtro":
+            return self._filtro(rng, estado)
+        if cid == "topn":
+            return rng.randint(int(estado.get((cid, "min"), 5)), int(estado.get((cid, "max"), 20)))
+        ops = [o["value"] if isinstance(o, dict) else o for o in estado.get((cid, "options")) or []]
+        if not ops:
+            return estado.get((cid, prop))
+        if estado.get((cid, "multi")):
+            return [ops[0]] + rng.sample(ops[1:], k=rng.randint(0, min(5, len(ops) - 1)))
+        return rng.choice(ops)
+
+
+    @staticmethod
+    def _filtro(rng: random.Random, estado: dict) -> dict:
+        # lo que arma assets/panel.js (filtro) desde la barra de filtros o un clic en una figura
+        def ops(cid):
+            return [o["value"] for o in estado.get((cid, "options")) or []]
+        f = {"dpto": rng.choice([0] + ops("filtro_dpto"))}
+        for eje in ("sexo", "edad", "mes", "capitulo"):
+            valores = ops(f"filtro_{eje}")
+            f[eje] = sorted(rng.sample(valores, k=1)) if valores and rng.random() < 0.3 else []
+        return f
+
+
+def _callbacks_servidor(deps: list) -> list:
+    # los callbacks del lado del cliente no generan peticiones
+    return [d for d in deps if not d.get("clientside_function")]
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.registros = []         # (t_fin, endpoint, latencia_s, ok)
+
+    def anotar(self, endpoint: str, latencia: float, ok: bool):
+        with self._lock:
+            self.registros.append((time.perf_counter(), endpoint, latencia, ok))
+
+
+class Usuario(threading.Thread):
+    def __init__(self, n: int, puerto: int, sitio: Sitio, metricas: Metricas, fin: float, retraso: float,
+                 pausa: float, semilla: int):
+        super().__init__(daemon=True)
+        self.puerto, self.sitio, self.metricas = puerto, sitio, metricas
+        self.fin, self.retraso, self.pausa = fin, retraso, pausa
+        self.rng = random.Random(semilla * 100_003 + n)
+        self.con = None
+        self.estado = {}
+        self.visibles = set()
+
+    def _peticion(self, metodo: str, ruta: str, endpoint: str, cuerpo=None):
+        datos = None if cuerpo is None else json.dumps(cuerpo).encode("utf-8")
+        cab = {"Accept-Encoding": "gzip"}
+        if datos:
+            cab["Content-Type"] = "application/json"
+        t0 = time.perf_counter()
+        for intento in (0, 1):
+            reutilizada = self.con is not None
+            if self.con is None:
+                self.con = http.client.HTTPConnection("127.0.0.1", self.puerto, timeout=60)
+            try:
+                self.con.request(metodo, ruta, body=datos, headers=cab)
+                r = self.con.getresponse()
+                cuerpo_r = r.read()
+                ok = r.status in (200, 204)     # 204: PreventUpdate (p. ej. cancelar un trabajo)
+                self.metricas.anotar(endpoint, time.perf_counter() - t0, ok)
+                if not ok or not r.getheader("Content-Type", "").startswith("application/json"):
+                    return None
+                if r.getheader("Content-Encoding") == "gzip":
+                    cuerpo_r = gzip.decompress(cuerpo_r)
+                return json.loads(cuerpo_r)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # keep-alive vencido del lado del servidor: se reintenta una vez con conexión nueva
+                self.con.close(); self.con = None
+                if intento or not reutilizada:
+                    break
+            except OSError:
+                self.con.close(); self.con = None
+                break
+        self.metricas.anotar(endpoint, time.perf_counter() - t0, False)
+        return None
+
+    def _esperar_trabajo(self, d: dict, cuerpo: dict, r: dict):
+        # callback en segundo plano (trabajos.py): se sondea como el renderer hasta el
+        # resultado; "(trabajo)" anota la espera completa y "(sondeo)" cada petición
+        t0 = time.perf_counter()
+        espera = (d.get("long") or {}).get("interval", 1000) / 1000
+        ruta = f"/_dash-update-component?cacheKey={r['cacheKey']}&job={r['job']}"
+        while r is not None and "response" not in r and time.perf_counter() - t0 < 60:
+            time.sleep(espera)
+            r = self._peticion("POST", ruta, d["output"] + " (sondeo)", cuerpo)
+        self.metricas.anotar(d["output"] + " (trabajo)", time.perf_counter() - t0, bool(r and "response" in r))
+        return r
+
+    def _montado(self, d: dict) -> bool:
+        # el renderer no dispara un callback con entradas fuera de la vista (p. ej. el
+        # filtro compartido, siempre visible, con la pestaña que lo usa sin montar)
+        return all(i["id"] in self.visibles for i in d["inputs"])
+
+    def _iniciales(self, callbacks) -> list:
+        # los que el renderer dispara al montar componentes: entradas a la vista y sin prevent_initial_call
+        return [d for d in callbacks if not d.get("prevent_initial_call") and self._montado(d)]
+
+    def _disparar(self, cambios: list[tuple[str, str]], inicial: bool = False):
+        # callbacks afectados por los cambios; sus salidas pueden disparar otros (encadenados)
+        pendientes = self._iniciales(self.sitio.callbacks) if inicial else \
+            [d for c in cambios for d in self.sitio.por_entrada.get(c, [])]
+        vistos = set()
+        while pendientes:
+            d = pendientes.pop(0)
+            if d["output"] in vistos or not self._montado(d):
+                continue
+            vistos.add(d["output"])
+            salidas = _salidas(d["output"])
+            cuerpo = {
+                "output": d["output"],
+                "outputs": ([{"id": i, "property": p} for i, p in salidas] if len(salidas) > 1
+                            else {"id": salidas[0][0], "property": salidas[0][1]}),
+                "inputs": [{**i, "value": self.estado.get((i["id"], i["property"]))} for i in d["inputs"]],
+                "state": [{**s, "value": self.estado.get((s["id"], s["property"]))} for s in d.get("state", [])],
+                "changedPropIds": [f"{i}.{p}" for i, p in cambios] if not inicial else [],
+            }
+            r = self._peticion("POST", "/_dash-update-component", d["output"], cuerpo)
+            if r and "job" in r:
+                r = self._esperar_trabajo(d, cuerpo, r)
+            if not r or "response" not in r:
+                continue
+            nuevos = []
+            for cid, props in r["response"].items():
+                for p, v in props.items():
+                    self.estado[(cid, p)] = v
+                    nuevos.append((cid, p))
+                    if p == "children" and isinstance(v, (dict, list)):
+                        # contenido nuevo (pestaña): sus componentes disparan sus callbacks iniciales
+                        montados = _valores_layout(v, {})
+                        self.estado.update(montados)
+                        self.visibles = self.sitio.fuera_de(cid) | {c for c, _ in montados}
+                        pendientes += self._iniciales({id(x): x for c in montados
+                                                       for x in self.sitio.por_entrada.get(c, [])}.values())
+            pendientes += [x for c in nuevos for x in self.sitio.por_entrada.get(c, [])]
+
+    def run(self):
+        time.sleep(self.retraso)
+        self.estado = dict(self.sitio.inicial)
+        self.visibles = {c for c, _ in self.sitio.inicial}
+        self._peticion("GET", "/", "GET /")
+        self._peticion("GET", "/_dash-layout", "GET /_dash-layout")
+        self._peticion("GET", "/_dash-dependencies", "GET /_dash-dependencies")
+        self._disparar([], inicial=True)
+        while time.perf_counter() < self.fin:
+            time.sleep(self.rng.expovariate(1.0 / self.pausa))
+            if time.perf_counter() >= self.fin:
+                break
+            acciones = [a for a in ACCIONES if a[1] in self.visibles]    # solo la pestaña a la vista
+            _, cid, prop = self.rng.choices(acciones, weights=[a[0] for a in acciones])[0]
+            self.estado[(cid, prop)] = self.sitio.opciones(cid, prop, self.rng, self.estado)
+            self._disparar([(cid, prop)])
+        if self.con is not None:
+            self.con.close()
+
+
+# ====== Corrida ===============================================================
+def _resumen(registros: list, duracion: float) -> dict:
+    if not registros:
+        return {"peticiones": 0}
+    lat = np.array([r[2] for r in registros]) * 1e3
+    ok = np.array([r[3] for r in registros])
+    return {
+        "peticiones": len(registros), "errores": int((~ok).sum()), "tasa_error": float((~ok).mean()),
+        "req_s": float(ok.sum() / duracion),
+        "p50_ms": float(np.percentile(lat, 50)), "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)), "max_ms": float(lat.max()),
+    }
+
+
+def correr(workers, threads, usuarios: int, duracion: float, rampa: float, pausa: float, semilla: int,
+           env: dict) -> dict:
+    puerto = _puerto_libre()
+    proc = iniciar_gunicorn(workers, threads, puerto, env)
+    try:
+        arranque = esperar_listo(puerto, proc)
+        con = http.client.HTTPConnection("127.0.0.1", puerto, timeout=30)
+        con.request("GET", "/_dash-dependencies"); deps = json.loads(con.getresponse().read())
+        con.request("GET", "/_dash-layout"); layout = json.loads(con.getresponse().read())
+        con.close()
+        sitio = Sitio(deps, layout)
+
+        metricas, monitor = Metricas(), Monitor(proc.pid)
+        monitor.start()
+        t0 = time.perf_counter()
+        fin = t0 + rampa + duracion
+        hilos = [Usuario(i, puerto, sitio, metricas, fin, rampa * i / max(1, usuarios), pausa, semilla)
+                 for i in range(usuarios)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join(timeout=max(0.0, fin - time.perf_counter()) + 90)
+        total = time.perf_counter() - t0
+        por_worker = monitor.detener()
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    # solo la ventana estable (tras la rampa) entra en el resumen
+    estable = [r for r in metricas.registros if r[0] >= t0 + rampa]
+    por_endpoint = {}
+    for r in estable:
+        por_endpoint.setdefault(r[1], []).append(r)
+    return {
+        "workers": workers, "threads": threads, "usuarios": usuarios, "duracion_s": duracion, "rampa_s": rampa,
+        "arranque_s": arranque, "total_s": total,
+        "global": _resumen(estable, duracion),
+        "endpoints": {k: _resumen(v, duracion) for k, v in sorted(por_endpoint.items())},
+        "workers_proc": por_worker,
+    }
+
+
+def _imprimir(r: dict) -> None:
+    g = r["global"]
+    print(f"[carga] {r['workers']}x{r['threads']} · {r['usuarios']} usuarios: {g.get('req_s', 0):.1f} req/s, "
+          f"p50 {g.get('p50_ms', 0):.0f} ms, p99 {g.get('p99_ms', 0):.0f} ms, "
+          f"errores {g.get('tasa_error', 0):.2%}", file=sys.stderr)
+    for pid, w in r["workers_proc"].items():
+        print(f"[carga]   worker {pid}: CPU media {w['cpu_pct_media']:.0f} % (máx {w['cpu_pct_max']:.0f} %), "
+              f"RSS {w['rss_mb_max']:.0f} MB, PSS {w['pss_mb_max']:.0f} MB", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Prueba de carga local contra gunicorn")
+    ap.add_argument("--usuarios", type=int, default=100)
+    ap.add_argument("--duracion", type=float, default=60.0, help="segundos medidos tras la rampa")
+    ap.add_argument("--rampa", type=float, default=10.0, help="segundos para incorporar a todos los usuarios")
+    ap.add_argument("--pausa", type=float, default=PAUSA_MEDIA, help="pausa media entre acciones (s)")
+    ap.add_argument("--configs", nargs="+", default=[None],
+                    help="combinaciones WORKERSxTHREADS (p. ej. 2x8 4x4); por defecto la de render.yaml")
+    ap.add_argument("--microdatos", type=Path, help="directorio de microdatos (MORTALIDAD_MICRODATOS)")
+    ap.add_argument("--sin-cache-figuras", action="store_true", help="MORTALIDAD_CACHE_FIGURAS_MB=0")
+    ap.add_argument("--semilla", type=int, default=1)
+    ap.add_argument("--salida", type=Path, help="archivo JSON (por defecto, stdout)")
+    a = ap.parse_args()
+
+    env = dict(os.environ)
+    if a.microdatos:
+        env["MORTALIDAD_MICRODATOS"] = str(a.microdatos.resolve())
+    if a.sin_cache_figuras:
+        env["MORTALIDAD_CACHE_FIGURAS_MB"] = "0"
+
+    corridas = []
+    for cfg in a.configs:
+        w, t = (int(x) for x in cfg.lower().split("x")) if cfg else (None, None)
+        corridas.append(correr(w, t, a.usuarios, a.duracion, a.rampa, a.pausa, a.semilla, env))
+        _imprimir(corridas[-1])
+
+    texto = json.dumps({"fecha": datetime.now(timezone.utc).isoformat(timespec="seconds"), "cpus": os.cpu_count(),
+                        "comando": comando_render(), "corridas": corridas}, indent=2, ensure_ascii=False)
+    if a.salida:
+        a.salida.write_text(texto, encoding="utf-8")
+    else:
+        print(texto)
@@ -0,0 +1,147 @@
+# -----------------------------------------------------------------------------
+# Catálogo CIE-10 indexado (desde el Anexo2 "CodigosDeMuerte" en ./data)
+#   - Se lee una vez del Excel y queda en la caché columnar (cache_datos)
+#   - Índice por prefijo: capítulo → código de 3 caracteres → código de 4 caracteres
+#   - Los códigos usan la misma codificación entera que microdatos.codificar_cie10:
+#       * nombre de un código = acceso directo a un arreglo (O(1))
+#       * los hijos de cualquier prefijo ("I", "I2", "I21") son un rango contiguo,
+#         así que el total de un prefijo es una suma sobre una rebanada
+#   - Top-N a cualquier nivel por selección parcial (np.argpartition), sin ordenar todo
+# -----------------------------------------------------------------------------
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cache_datos import frame_cacheado
+from microdatos import codificar_cie10, decodificar_cie10, _norm_col
+
+N_COD4 = 1 + 26 * 1100      # espacio de codificar_cie10 (0 = sin código)
+N_COD3 = 26 * 100           # índice de tres caracteres: (cod4 - 1) // 11
+N_CAP = 23                  # capítulos 1..22 (0 = sin capítulo)
+NIVELES = ("capitulo", "cod3", "cod4")
+
+
+def buscar_anexo(data_dir: Path) -> Path | None:
+    for p in sorted(data_dir.glob("*.xlsx")):
+        n = _norm_col(p.name).replace(".", "").replace("_", "").replace(" ", "")
+        if "CODIGOSDEMUERTE" in n:
+            return p
+    return None
+
+
+def _leer_anexo(p: Path) -> pd.DataFrame:
+    crudo = pd.read_excel(p, sheet_name=0, header=None, dtype=str, engine="openpyxl")
+    # la fila de encabezados es la que empieza con "Capítulo" (antes hay títulos)
+    fila = next(i for i, v in enumerate(crudo.iloc[:, 0]) if _norm_col(v).startswith("CAPITULO"))
+    enc = [_norm_col(v) for v in crudo.iloc[fila]]
+
+    def col(*tokens):
+        return next(i for i, h in enumerate(enc) if all(t in h for t in tokens))
+
+    cuerpo = crudo.iloc[fila + 1:]
+    out = pd.DataFrame({
+        "CAPITULO": pd.to_numeric(cuerpo.iloc[:, col("CAPITULO")], errors="coerce"),
+        "NOMBRE_CAPITULO": cuerpo.iloc[:, col("NOMBRE", "CAPITULO")],
+        "COD3": cuerpo.iloc[:, col("CODIGO", "TRES")],
+        "NOMBRE3": cuerpo.iloc[:, col("DESCRIPCION", "TRES")],
+        "COD4": cuerpo.iloc[:, col("CODIGO", "CUATRO")],
+        "NOMBRE4": cuerpo.iloc[:, col("DESCRIPCION", "CUATRO")],
+    }).dropna(subset=["CAPITULO", "COD4"])
+    for c in ["NOMBRE_CAPITULO", "COD3", "NOMBRE3", "COD4", "NOMBRE4"]:
+        out[c] = out[c].fillna("").astype(str).str.strip()
+    out["CAPITULO"] = out["CAPITULO"].astype(int)
+    return out.reset_index(drop=True)
+
+
+class CatalogoCIE10:
+    def __init__(self, df: pd.DataFrame):
+        cod4 = codificar_cie10(df["COD4"]).astype(np.int64)
+        ok = cod4 > 0
+        df, cod4 = df[ok], cod4[ok]
+        self.nombre4 = np.full(N_COD4, "", dtype=object)
+        self.nombre4[cod4] = df["NOMBRE4"].to_numpy()
+        self.nombre3 = np.full(N_COD3, "", dtype=object)
+        self.nombre3[(cod4 - 1) // 11] = df["NOMBRE3"].to_numpy()
+        self.capitulo4 = np.zeros(N_COD4, dtype=np.uint8)
+        self.capitulo4[cod4] = df["CAPITULO"].to_numpy()
+        # códigos sin cuarto carácter en el anexo heredan el capítulo de su código de 3
+        cap3 = np.zeros(N_COD3, dtype=np.uint8)
+        cap3[(cod4 - 1) // 11] = df["CAPITULO"].to_numpy()
+        sin_cap = np.flatnonzero(self.capitulo4[1:] == 0) + 1
+        self.capitulo4[sin_cap] = cap3[(sin_cap - 1) // 11]
+        self.nombre_capitulo = np.full(N_CAP, "", dtype=object)
+        self.nombre_capitulo[df["CAPITULO"].to_numpy()] = df["NOMBRE_CAPITULO"].to_numpy()
+        self.n_codigos = int(ok.sum())
+
+    # ---- búsqueda directa
+    def nombre(self, codigo: str) -> str:
+        c = str(codigo).strip().upper().replace(".", "")
+        if len(c) == 3:
+            cod = int(codificar_cie10([c + "0"])[0])
+            return self.nombre3[(cod - 1) // 11] if cod else ""
+        cod = int(codificar_cie10([c])[0])
+        if not cod:
+            return ""
+        return self.nombre4[cod] or self.nombre3[(cod - 1) // 11]
+
+    def nombres(self, codigos) -> list[str]:
+        return [self.nombre(c) for c in codigos]
+
+    # ---- prefijos y agregación por nivel
+    @staticmethod
+    def rango_prefijo(prefijo: str) -> tuple[int, int]:
+        # [lo, hi) en el espacio de 4 caracteres para "I", "I2", "I21" o "I219"
+        p = prefijo.strip().upper().replace(".", "")
+        lo = int(codificar_cie10([p + "000"[: 4 - len(p)] if len(p) < 4 else p])[0])
+        if not lo:
+            return 0, 0
+        ancho = {1: 1100, 2: 110, 3: 11}.get(len(p), 1)
+        return lo, lo + ancho
+
+    def total_prefijo(self, conteos4: np.ndarray, prefijo: str) -> int:
+        lo, hi = self.rango_prefijo(prefijo)
+        return int(np.asarray(conteos4)[lo:hi].sum())
+
+    def agregar(self, conteos4: np.ndarray, nivel: str) -> np.ndarray:
+        v = np.asarray(conteos4, dtype=np.int64)
+        if nivel == "cod4":
+            return v
+        if nivel == "cod3":
+            return v[1:].reshape(N_COD3, 11).sum(axis=1)
+        if nivel == "capitulo":
+            return np.bincount(self.capitulo4, weights=v, minlength=N_CAP).astype(np.int64)
+        raise ValueError(f"nivel desconocido: {nivel}")
+
+    def top_n(self, conteos4: np.ndarray, n: int = 10, nivel: str = "cod4") -> pd.DataFrame:
+        v = self.agregar(conteos4, nivel).copy()
+        if nivel != "cod3":
+            v[0] = 0                                   # "sin código" no compite en el ranking
+        n = max(0, min(int(n), int(np.count_nonzero(v))))
+        if n == 0:
+            return pd.DataFrame(columns=["CODIGO", "NOMBRE", "CASOS"])
+        idx = np.argpartition(-v, n - 1)[:n]           # selección parcial O(N)
+        idx = idx[np.lexsort((idx, -v[idx]))]          # solo se ordenan los n elegidos
+        if nivel == "cod4":
+            cods = decodificar_cie10(idx)
+            nombres = [self.nombre4[i] or self.nombre3[(i - 1) // 11] for i in idx]
+        elif nivel == "cod3":
+            cods = [c[:3] for c in decodificar_cie10(idx * 11 + 1)]
+            nombres = list(self.nombre3[idx])
+        else:
+            cods = [str(i) for i in idx]
+            nombres = list(self.nombre_capitulo[idx])
+        return pd.DataFrame({"CODIGO": cods, "NOMBRE": nombres, "CASOS": v[idx]})
+
+
+def cargar_catalogo(data_dir: Path) -> CatalogoCIE10 | None:
+    p = buscar_anexo(data_dir)
+    if p is None:
+        return None
+    try:
+        df = frame_cacheado("cie10", [p], lambda: _leer_anexo(p))
+    except (StopIteration, ValueError, OSError) as e:
+        print(f"[cie10] no se pudo leer {p.name}: {e}")
+        return None
+    return CatalogoCIE10(df)
@@ -0,0 +1,182 @@
+# -----------------------------------------------------------------------------
+# Respuestas compactas
+#   - Compresión HTTP en el servidor Flask: brotli si está instalado, si no gzip
+#     (solo tipos de texto, >= MIN_BYTES; los paquetes JS de Dash se comprimen
+#     una vez y quedan en memoria, por ruta y codificación, hasta MAX_ESTATICOS).
+#     Un cuerpo comprimido no es idéntico byte a byte al original: su ETag pasa
+#     a débil (W/"...") y los 304 siguen funcionando (If-None-Match compara débil)
+#   - Figuras como dict plano, construido una vez (y guardado en la caché de
+#     figuras): sin los valores por defecto que px repite en cada traza y con la
+#     plantilla reducida a los tipos de traza presentes
+#   - Series numéricas como arreglos binarios tipados {"dtype", "bdata"}, el
+#     formato que Plotly.js (>= 2.28) y assets/panel.js leen directamente
+#   - JSON con orjson cuando está disponible (motor de plotly.io.json, el que usa
+#     Dash): sobre dicts planos es varias veces más rápido que PlotlyJSONEncoder
+# -----------------------------------------------------------------------------
+
+import base64
+import gzip
+import json
+import threading
+
+import numpy as np
+import plotly.io as pio
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson  # noqa: F401  (plotly lo usa como motor JSON)
+    pio.json.config.default_engine = "orjson"
+except ImportError:
+    pass
+
+MIN_BYTES = 1024
+MIN_BINARIO = 16           # con menos valores la lista JSON ocupa lo mismo o menos
+TIPOS_TEXTO = ("application/json", "text/html", "text/css", "text/plain",
+               "application/javascript", "text/javascript")
+ESTATICOS = ("/_dash-component-suites/", "/assets/")
+
+# Atributos que px escribe en cada traza con el mismo valor que Plotly.js ya usa por defecto
+DEFECTOS_TRAZA = {"xaxis": "x", "yaxis": "y", "showlegend": True, "orientation": "v", "legendgroup": ""}
+DEFECTOS_ANIDADOS = {"marker": {"symbol": "circle"}, "line": {"dash": "solid"}}
+
+MAX_ESTATICOS = 256        # entradas de _estaticos (las rutas de Dash aceptan cualquier huella)
+_estaticos = {}            # (ruta, codificación) -> (sello del archivo, cuerpo comprimido)
+_lock = threading.Lock()
+
+
+# ====== Arreglos binarios =====================================================
+def arreglo_binario(v):
+    # lista JSON, o {"dtype", "bdata"} (little-endian) cuando ocupa menos que la lista
+    a = np.asarray(v)
+    if a.ndim != 1 or a.dtype.kind not in "iufb":
+        return a.tolist()
+    if a.dtype.kind == "f" and np.all(np.isfinite(a)) and np.all(a == np.round(a)):
+        a = a.astype(np.int64)        # conteos que llegan como float
+    lista = a.tolist()
+    if len(a) < MIN_BINARIO:
+        return lista
+    if a.dtype.kind in "iub":
+        lo, hi = int(a.min()), int(a.max())
+        for dt in ("u1", "i1", "u2", "i2", "u4", "i4"):
+            info = np.iinfo(dt)
+            if info.min <= lo and hi <= info.max:
+                a = a.astype(dt)
+                break
+        else:
+            a = a.astype("f8")
+    else:
+        a = a.astype("f8")
+    bdata = base64.b64encode(a.astype(a.dtype.newbyteorder("<")).tobytes()).decode("ascii")
+    if len(bdata) >= len(json.dumps(lista, separators=(",", ":"))):
+        return lista                  # p. ej. coordenadas con un decimal
+    return {"dtype": a.dtype.str.lstrip("<|"), "bdata": bdata}
+
+
+# ====== Figuras ===============================================================
+def _planos(d: dict) -> dict:
+    # arreglos numpy -> lista o binario, recorriendo los dicts anidados de la traza
+    for k, v in d.items():
+        if isinstance(v, dict):
+            _planos(v)
+        elif isinstance(v, np.ndarray):
+            d[k] = arreglo_binario(v)
+    return d
+
+
+def _traza(tr: dict) -> dict:
+    for k, defecto in DEFECTOS_TRAZA.items():
+        if tr.get(k) == defecto:
+            del tr[k]
+    for k, defectos in DEFECTOS_ANIDADOS.items():
+        sub = tr.get(k)
+        if isinstance(sub, dict):
+            for kk, defecto in defectos.items():
+                if sub.get(kk) == defecto:
+                    del sub[kk]
+            if not sub:
+                del tr[k]
+    plantilla = tr.get("hovertemplate")
+    if isinstance(plantilla, str):
+        for k in ("customdata", "hovertext"):      # px las llena aunque el hovertemplate no las use
+            if k in tr and k not in plantilla:
+                del tr[k]
+    return _planos(tr)
+
+
+def figura(fig) -> dict:
+    # go.Figure -> dict plano y compacto, listo para Dash, dcc.Store o la caché de figuras
+    d = fig.to_plotly_json()
+    d["data"] = [_traza(tr) for tr in d["data"]]
+    tipos = {tr.get("type", "scatter") for tr in d["data"]}
+    plantilla = d.get("layout", {}).get("template")
+    if isinstance(plantilla, dict) and isinstance(plantilla.get("data"), dict):
+        plantilla["data"] = {t: v for t, v in plantilla["data"].items() if t in tipos}
+    return d
+
+
+# ====== Compresión HTTP =======================================================
+def _codificacion(aceptadas: str) -> str | None:
+    tokens = {}
+    for parte in aceptadas.lower().split(","):
+        nombre, _, q = parte.strip().partition(";q=")
+        try:
+            tokens[nombre] = float(q) if q else 1.0
+        except ValueError:
+            tokens[nombre] = 0.0
+    if brotli is not None and tokens.get("br", 0) > 0:
+        return "br"
+    if tokens.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def _comprimir_bytes(datos: bytes, cod: str) -> bytes:
+    if cod == "br":
+        return brotli.compress(datos, quality=4)
+    return gzip.compress(datos, compresslevel=5, mtime=0)
+
+
+def _comprimir(resp):
+    estatico = request.path.startswith(ESTATICOS)
+    if (((resp.direct_passthrough or resp.is_streamed) and not estatico) or not 200 <= resp.status_code < 300
+            or "Content-Encoding" in resp.headers or not (resp.mimetype or "").startswith(TIPOS_TEXTO)):
+        return resp
+    resp.vary.add("Accept-Encoding")
+    cod = _codificacion(request.headers.get("Accept-Encoding", ""))
+    if cod is None:
+        return resp
+    resp.direct_passthrough = False   # /assets/ llega como archivo (send_from_directory)
+    datos = resp.get_data()
+    if len(datos) < MIN_BYTES:
+        return resp
+    if estatico:
+        # la query (?v=... de /assets/) no cambia el archivo: lo identifican su mtime y tamaño
+        clave = (request.path, cod)
+        sello = (resp.headers.get("Last-Modified"), len(datos))
+        with _lock:
+            guardado = _estaticos.get(clave)
+        if guardado is not None and guardado[0] == sello:
+            comp = guardado[1]
+        else:
+            comp = _comprimir_bytes(datos, cod)
+            with _lock:
+                _estaticos.pop(clave, None)
+                if len(_estaticos) >= MAX_ESTATICOS:
+                    del _estaticos[next(iter(_estaticos))]   # el más antiguo
+                _estaticos[clave] = (sello, comp)
+    else:
+        comp = _comprimir_bytes(datos, cod)
+    resp.set_data(comp)
+    resp.headers["Content-Encoding"] = cod
+    etag, debil = resp.get_etag()
+    if etag and not debil:
+        resp.set_etag(etag, weak=True)
+    return resp
+
+def instalar(server) -> None:
+    server.after_request(_comprimir)
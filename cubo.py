@@ -0,0 +1,287 @@
+# -----------------------------------------------------------------------------
+# Cubo de mortalidad pre-agregado (NumPy denso, ejes codificados por diccionario)
+#   - Departamental: DPTO × AÑO × MES × SEXO × GRUPO_EDAD × CAPÍTULO CIE-10
+#       (DPTO = 0 es el total nacional: valor "Todos" / "Colombia" de los controles)
+#   - Causas:        DPTO × CAUSA CIE-10 de 4 caracteres (codificar_cie10), para el Top-N
+#   - Municipal:     MUNICIPIO × AÑO × MES × SEXO × GRUPO_EDAD
+#       (el municipio ya implica el departamento; no se cruza con el capítulo
+#        para que el arreglo siga cabiendo en memoria con ~1.100 municipios)
+#   - Se construye aparte:  python precalcular.py  → data/.cache/cubo-<sello>.*.npy
+#     (un .npy por arreglo, abierto con mmap: los workers comparten las páginas);
+#     se arma por departamento (losa_dpto) y se ensambla con totales por eje ya sumados
+#   - El agregado disperso de cada archivo queda en data/.cache/cubo_parcial_*:
+#     al cambiar un año solo se reagrega ese archivo y se vuelve a densificar
+# -----------------------------------------------------------------------------
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cache_datos import cargar_arreglos, guardar_arreglos, frame_cacheado, huella_fuentes
+from microdatos import archivos_microdatos, ingerir_archivo, codificar_cie10
+
+VERSION = 4           # formato del cubo ensamblado (4: resúmenes por eje y serie mensual)
+VERSION_PARCIAL = 3   # formato de los agregados dispersos por archivo
+TOTAL = 0   # posición del total nacional en el eje de departamentos
+
+# GRU_ED1 (0..29) agrupado como en EDAD_REF del panel
+GRUPOS_EDAD = [("0–4", 0, 4), ("5–6", 5, 6), ("7–8", 7, 8), ("9–10", 9, 10), ("11", 11, 11),
+               ("12–13", 12, 13), ("14–16", 14, 16), ("17–19", 17, 19), ("20–24", 20, 24),
+               ("25–28", 25, 28), ("29", 29, 29)]
+_EDAD_IDX = np.full(256, len(GRUPOS_EDAD) - 1, dtype=np.int64)   # fuera de rango -> desconocida
+for _i, (_, _lo, _hi) in enumerate(GRUPOS_EDAD):
+    _EDAD_IDX[_lo:_hi + 1] = _i
+
+# Capítulos CIE-10 por código inicial de tres caracteres (la U va entre T y V)
+CAPITULOS = [("A00", 1), ("C00", 2), ("D50", 3), ("E00", 4), ("F00", 5), ("G00", 6),
+             ("H00", 7), ("H60", 8), ("I00", 9), ("J00", 10), ("K00", 11), ("L00", 12),
+             ("M00", 13), ("N00", 14), ("O00", 15), ("P00", 16), ("Q00", 17), ("R00", 18),
+             ("S00", 19), ("U00", 22), ("V01", 20), ("Z00", 21)]
+N_CAPITULOS = 23   # 0 = sin causa
+_CAP_INICIO = codificar_cie10([c + "0" for c, _ in CAPITULOS]).astype(np.int64)
+_CAP_NUM = np.array([n for _, n in CAPITULOS], dtype=np.int64)
+
+EJES = ["DPTO", "ANO", "MES", "SEXO", "EDAD", "CAPITULO"]
+N_MES, N_SEXO, N_EDAD = 13, 3, len(GRUPOS_EDAD)   # MES 0 = sin dato; SEXO 1/2/3(otro)
+
+
+def grupo_edad(gru_ed1: np.ndarray) -> np.ndarray:
+    # GRU_ED1 -> índice de GRUPOS_EDAD
+    return _EDAD_IDX[np.asarray(gru_ed1, dtype=np.int64)]
+
+
+def capitulo_cie10(causa: np.ndarray) -> np.ndarray:
+    causa = np.asarray(causa, dtype=np.int64)
+    pos = np.searchsorted(_CAP_INICIO, causa, side="right") - 1
+    return np.where((causa > 0) & (pos >= 0), _CAP_NUM[np.clip(pos, 0, None)], 0)
+
+
+# ====== Agregación dispersa (clave combinada + conteo) ========================
+# Un bloque de microdatos se reduce a pares (clave, n); los parciales de varios
+# archivos se suman antes de materializar los arreglos densos.
+N_CAUSAS = 1 + 26 * 1100   # espacio de codificar_cie10
+_BASES = [1000, 13, 3, N_EDAD, N_CAUSAS]   # COD_MUNIC, MES, SEXO, EDAD, CAUSA
+_RESTO = int(np.prod(_BASES))              # peso de ANO * 100 + COD_DPTO en la clave
+
+
+def _claves(micro: pd.DataFrame) -> np.ndarray:
+    mes = micro["MES"].to_numpy().astype(np.int64)
+    mes = np.where(mes <= 12, mes, 0)
+    sexo = micro["SEXO"].to_numpy().astype(np.int64)
+    sexo = np.where((sexo == 1) | (sexo == 2), sexo - 1, 2)
+    edad = grupo_edad(micro["GRU_ED1"].to_numpy())
+    causa = micro["CAUSA"].to_numpy().astype(np.int64)
+    k = micro["ANO"].to_numpy().astype(np.int64) * 100 + micro["COD_DPTO"].to_numpy().astype(np.int64)
+    for v, base in zip([micro["COD_MUNIC"].to_numpy().astype(np.int64) % 1000, mes, sexo, edad, causa], _BASES):
+        k = k * base + v
+    return k
+
+
+def agregar_parcial(micro: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    claves, n = np.unique(_claves(micro), return_counts=True)
+    return claves, n.astype(np.int64)
+
+
+def combinar_parciales(parciales) -> tuple[np.ndarray, np.ndarray]:
+    parciales = list(parciales)
+    if not parciales:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    claves = np.concatenate([c for c, _ in parciales])
+    n = np.concatenate([x for _, x in parciales])
+    u, inv = np.unique(claves, return_inverse=True)
+    return u, np.bincount(inv, weights=n, minlength=len(u)).astype(np.int64)
+
+
+def _descomponer(claves: np.ndarray) -> dict:
+    out, k = {}, claves.copy()
+    for nombre, base in zip(["CAUSA", "EDAD", "SEXO", "MES", "COD_MUNIC"], _BASES[::-1]):
+        k, out[nombre] = np.divmod(k, base)
+    out["ANO"], out["COD_DPTO"] = np.divmod(k, 100)
+    return out
+
+
+def particionar(claves: np.ndarray) -> tuple[np.ndarray, dict]:
+    # (años presentes, {COD_DPTO: posiciones de sus claves}): el cubo se arma por departamento
+    anio_dpto = claves // _RESTO
+    dpto = anio_dpto % 100
+    orden = np.argsort(dpto, kind="stable")
+    cods, inicio = np.unique(dpto[orden], return_index=True)
+    fin = np.append(inicio[1:], len(orden))
+    return np.unique(anio_dpto // 100), {int(d): orden[a:b] for d, a, b in zip(cods, inicio, fin)}
+
+
+def losa_dpto(claves: np.ndarray, n: np.ndarray, anos: np.ndarray) -> dict:
+    # arreglos densos de un departamento (claves de un solo COD_DPTO) sobre el eje de años común
+    c = _descomponer(claves)
+    i_ano = np.searchsorted(anos, c["ANO"])
+    forma = (len(anos), N_MES, N_SEXO, N_EDAD, N_CAPITULOS)
+    idx = np.ravel_multi_index((i_ano, c["MES"], c["SEXO"], c["EDAD"], capitulo_cie10(c["CAUSA"])), forma)
+    conteos = np.bincount(idx, weights=n, minlength=int(np.prod(forma))).reshape(forma)
+    causa_conteos = np.bincount(c["CAUSA"], weights=n, minlength=N_CAUSAS)
+    muns, i_mun = np.unique(c["COD_MUNIC"], return_inverse=True)
+    forma_m = (len(muns), len(anos), N_MES, N_SEXO, N_EDAD)
+    idx_m = np.ravel_multi_index((i_mun, i_ano, c["MES"], c["SEXO"], c["EDAD"]), forma_m)
+    mun_conteos = np.bincount(idx_m, weights=n, minlength=int(np.prod(forma_m))).reshape(forma_m)
+    return {"conteos": conteos.astype(np.uint32), "causa_conteos": causa_conteos.astype(np.uint32),
+            "mun_conteos": mun_conteos.astype(np.uint32), "mun_cod": muns.astype(np.int16)}
+
+
+def resumenes(conteos: np.ndarray, mun_conteos: np.ndarray) -> dict:
+    # totales por departamento y eje que el panel lee sin recorrer el cubo completo
+    return {
+        "mensual": conteos.sum(axis=(3, 4, 5), dtype=np.int64),          # DPTO × AÑO × MES
+        "por_SEXO": conteos.sum(axis=(1, 2, 4, 5), dtype=np.int64),
+        "por_EDAD": conteos.sum(axis=(1, 2, 3, 5), dtype=np.int64),
+        "por_CAPITULO": conteos.sum(axis=(1, 2, 3, 4), dtype=np.int64),
+        "mun_totales": mun_conteos.sum(axis=(1, 2, 3, 4), dtype=np.int64),
+    }
+
+
+def ensamblar(anos: np.ndarray, losas: dict) -> dict:
+    # losas por COD_DPTO -> arreglos del cubo (fila TOTAL = suma de los departamentos)
+    dptos = sorted(losas)
+    eje_dpto = np.array([TOTAL, *dptos], dtype=np.int16)
+    conteos = np.zeros((len(eje_dpto), len(anos), N_MES, N_SEXO, N_EDAD, N_CAPITULOS), dtype=np.uint32)
+    causa_conteos = np.zeros((len(eje_dpto), N_CAUSAS), dtype=np.uint32)
+    for i, d in enumerate(dptos, start=1):
+        conteos[i] = losas[d]["conteos"]
+        causa_conteos[i] = losas[d]["causa_conteos"]
+    conteos[TOTAL] = conteos[1:].sum(axis=0)
+    causa_conteos[TOTAL] = causa_conteos[1:].sum(axis=0)
+    mun_conteos = np.concatenate([np.zeros((0, len(anos), N_MES, N_SEXO, N_EDAD), dtype=np.uint32)]
+                                 + [losas[d]["mun_conteos"] for d in dptos])
+    return {
+        "conteos": conteos, "eje_dpto": eje_dpto, "eje_ano": np.asarray(anos).astype(np.int16),
+        "causa_conteos": causa_conteos, "mun_conteos": mun_conteos,
+        "mun_dpto": np.concatenate([np.zeros(0, dtype=np.int16)]
+                                   + [np.full(len(losas[d]["mun_cod"]), d, dtype=np.int16) for d in dptos]),
+        "mun_cod": np.concatenate([np.zeros(0, dtype=np.int16)] + [losas[d]["mun_cod"] for d in dptos]),
+        **resumenes(conteos, mun_conteos),
+    }
+
+
+def densificar(claves: np.ndarray, n: np.ndarray) -> dict:
+    anos, partes = particionar(claves)
+    return ensamblar(anos, {d: losa_dpto(claves[i], n[i], anos) for d, i in partes.items()})
+
+
+# ====== Cubo en memoria =======================================================
+class Cubo:
+    def __init__(self, a: dict):
+        self.conteos = a["conteos"]
+        self.causa_conteos = a["causa_conteos"]
+        self.mun_conteos = a["mun_conteos"]
+        self.mun_dpto = a["mun_dpto"]
+        self.mun_cod = a["mun_cod"]
+        self.eje_ano = a["eje_ano"]
+        self.mensual = a["mensual"]
+        self.mun_totales = a["mun_totales"]
+        # DPTO × eje, para los totales y desgloses que no necesitan el cubo completo
+        self.por = {"ANO": self.mensual.sum(axis=2), "MES": self.mensual.sum(axis=1),
+                    "SEXO": a["por_SEXO"], "EDAD": a["por_EDAD"], "CAPITULO": a["por_CAPITULO"]}
+        self.idx_dpto = {int(c): i for i, c in enumerate(a["eje_dpto"])}
+        self.idx_ano = {int(c): i for i, c in enumerate(a["eje_ano"])}
+        # municipios del departamento: rango contiguo (mun_dpto viene ordenado)
+        self.rango_mun = {}
+        for d in np.unique(self.mun_dpto):
+            lo, hi = np.searchsorted(self.mun_dpto, [d, d + 1])
+            self.rango_mun[int(d)] = (int(lo), int(hi))
+
+    def sumar(self, por=(), dpto: int = TOTAL, ano=None, mes=None, sexo=None, edad=None, capitulo=None):
+        # Corte del cubo: ejes en `por` se conservan, los filtrados se indexan y el resto se suma.
+        # Los filtros reciben índices de eje (MES 1..12, SEXO 0/1/2, EDAD 0..10, CAPITULO 0..22).
+        i = self.idx_dpto.get(int(dpto))
+        if i is None:
+            return np.zeros([self.conteos.shape[EJES.index(e)] for e in por], dtype=np.int64)
+        sel = [i, slice(None) if ano is None else self.idx_ano[int(ano)],
+               slice(None) if mes is None else mes, slice(None) if sexo is None else sexo,
+               slice(None) if edad is None else edad, slice(None) if capitulo is None else capitulo]
+        bloque = self.conteos[tuple(sel)]
+        ejes_restantes = [e for e, s in zip(EJES, sel) if isinstance(s, slice)]
+        sobran = tuple(k for k, e in enumerate(ejes_restantes) if e not in por)
+        out = bloque.sum(axis=sobran, dtype=np.int64) if sobran else bloque.astype(np.int64)
+        orden = [e for e in ejes_restantes if e in por]
+        return np.moveaxis(out, [orden.index(e) for e in por], range(len(por))) if por else out
+
+    def totales_dpto(self) -> pd.Series:
+        # muertes por código de departamento (sin el total nacional)
+        t = self.por["ANO"].sum(axis=1, dtype=np.int64)
+        return pd.Series(t[1:], index=[c for c in self.idx_dpto if c != TOTAL])
+
+    def por_dpto(self, eje: str) -> tuple[list[int], np.ndarray]:
+        # (códigos de departamento, matriz departamento × eje) sin el total nacional
+        return [c for c in self.idx_dpto if c != TOTAL], np.asarray(self.por[eje][1:], dtype=np.int64)
+
+    def causas(self, dpto: int = TOTAL) -> np.ndarray:
+        # vector de conteos en el espacio de codificar_cie10 (para causas_cie10.CatalogoCIE10)
+        i = self.idx_dpto.get(int(dpto))
+        return np.zeros(N_CAUSAS, dtype=np.int64) if i is None else self.causa_conteos[i].astype(np.int64)
+
+    def municipios(self, dpto: int) -> pd.DataFrame:
+        lo, hi = self.rango_mun.get(int(dpto), (0, 0))
+        n = np.asarray(self.mun_totales[lo:hi], dtype=np.int64)
+        return pd.DataFrame({"COD_DPTO": self.mun_dpto[lo:hi].astype(int),
+                             "COD_MUNIC": self.mun_cod[lo:hi].astype(int), "MUERTES": n})
+
+
+# ====== Construcción y carga ==================================================
+def parcial_archivo(p: Path, verbose: bool = False, forzar: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    # agregado disperso de un archivo (un año), guardado aparte: cuando llega un archivo
+    # nuevo o cambia uno, solo ese se vuelve a ingerir y agregar (forzar: aunque esté al día)
+    arreglos, huella = (None, huella_fuentes([p])) if forzar else \
+        cargar_arreglos(f"cubo_parcial_{p.name}", [p], VERSION_PARCIAL)
+    if arreglos is not None:
+        return arreglos["claves"], arreglos["n"]
+    t0 = time.perf_counter()
+    micro = frame_cacheado(f"micro_{p.name}", [p], lambda: ingerir_archivo(p))
+    claves, n = agregar_parcial(micro)
+    try:
+        guardar_arreglos(f"cubo_parcial_{p.name}", {"claves": claves, "n": n}, huella, VERSION_PARCIAL)
+    except OSError:
+        pass
+    if verbose:
+        print(f"[cubo] {p.name}: {len(micro):,} registros en {time.perf_counter() - t0:.1f}s")
+    return claves, n
+
+
+def construir(micro_dir: Path, verbose: bool = False) -> dict:
+    return densificar(*combinar_parciales(parcial_archivo(p, verbose) for p in archivos_microdatos(micro_dir)))
+
+
+def construir_y_guardar(micro_dir: Path, verbose: bool = False) -> dict:
+    huella = huella_fuentes(archivos_microdatos(micro_dir))
+    arreglos = construir(micro_dir, verbose)
+    guardar_arreglos("cubo", arreglos, huella, VERSION, mmap=True)
+    return arreglos
+
+
+def cargar_cubo(micro_dir: Path, construir_si_falta: bool = True) -> Cubo | None:
+    archivos = archivos_microdatos(micro_dir)
+    if not archivos:
+        return None
+    arreglos, _ = cargar_arreglos("cubo", archivos, VERSION)
+    if arreglos is None:
+        if not construir_si_falta:
+            return None
+        print("[cubo] artefacto ausente o desactualizado; construyendo (use `python precalcular.py` en el build)")
+        try:
+            construir_y_guardar(micro_dir)
+            arreglos, _ = cargar_arreglos("cubo", archivos, VERSION)   # se reabre mapeado en memoria
+        except OSError:
+            arreglos = None
+        arreglos = arreglos or construir(micro_dir)   # disco de solo lectura: cubo en memoria
+    return Cubo(arreglos)
+
+
+if __name__ == "__main__":
+    micro_dir = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).parent / "data" / "microdatos"
+    if not archivos_microdatos(micro_dir):
+        print(f"[cubo] sin microdatos en {micro_dir}; el panel usará los datos demo")
+        sys.exit(0)
+    t0 = time.perf_counter()
+    a = construir_y_guardar(micro_dir, verbose=True)
+    print(f"[cubo] forma departamental {a['conteos'].shape}, municipal {a['mun_conteos'].shape}, "
+          f"{(a['conteos'].nbytes + a['mun_conteos'].nbytes) / 1e6:.1f} MB en {time.perf_counter() - t0:.1f}s")
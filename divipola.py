@@ -0,0 +1,178 @@
+# -----------------------------------------------------------------------------
+# Dimensión DIVIPOLA: departamentos y municipios por código DANE
+#   - Departamento: código de 2 dígitos (microdatos.NOMBRE_DPTO + alias conocidos)
+#   - Municipio: código de 5 dígitos (COD_DPTO * 1000 + COD_MUNIC), desde el Excel
+#     DIVIPOLA de ./data (en la caché columnar); el índice de nombres de municipio
+#     va por departamento ("Rionegro", "La Unión" o "Candelaria" se repiten entre
+#     departamentos, no dentro de uno)
+#   - Los nombres se normalizan una vez por valor distinto (pd.factorize); lo que no
+#     coincide exacto se busca por parecido (difflib) y el resultado se recuerda
+#   - Las tablas del panel se cruzan por código; el nombre se pone al dibujar
+# -----------------------------------------------------------------------------
+
+import difflib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cache_datos import frame_cacheado
+from microdatos import NOMBRE_DPTO, _norm_col
+
+# Otras grafías de departamentos (encabezados del DANE, GeoJSON, entradas manuales)
+ALIAS_DPTO = {
+    "Bogotá": 11, "Bogotá, D.C.": 11, "Santafé de Bogotá": 11, "Distrito Capital": 11,
+    "Archipiélago de San Andrés, Providencia y Santa Catalina": 88, "San Andrés": 88,
+    "Valle": 76, "Guajira": 44, "N. de Santander": 54,
+}
+COLUMNAS = ["DEPARTAMENTO", "MUNICIPIO", "COD_DPTO", "COD_MUNIC"]
+CORTE_PARECIDO = 0.85
+MAX_RECORDADOS = 1024      # búsquedas aproximadas recordadas por índice (entradas libres)
+
+
+def normalizar(valores) -> pd.Series:
+    # mayúsculas, sin tildes ni signos, espacios simples; cada valor distinto una sola vez
+    s = pd.Series(valores, dtype="object")
+    cods, unicos = pd.factorize(s.fillna("").astype(str))
+    u = (pd.Series(unicos, dtype="string").str.upper().str.normalize("NFKD")
+         .str.replace(r"[\u0300-\u036f]", "", regex=True)
+         .str.replace(r"[^0-9A-Z]+", " ", regex=True).str.strip())
+    return pd.Series(u.to_numpy(dtype=object)[cods] if len(u) else [], index=s.index, dtype="object")
+
+
+class IndiceNombres:
+    # nombre en cualquier grafía -> código (-1 si no se reconoce)
+    def __init__(self, nombres: dict):
+        self._exactos = dict(zip(normalizar(list(nombres)), nombres.values()))
+        self._aprox = {}
+
+    def _buscar(self, clave: str) -> int:
+        if clave in self._exactos:
+            return self._exactos[clave]
+        cod = self._aprox.get(clave)
+        if cod is None:
+            parecido = difflib.get_close_matches(clave, list(self._exactos), n=1, cutoff=CORTE_PARECIDO)
+            cod = self._exactos[parecido[0]] if parecido else -1
+            if len(self._aprox) < MAX_RECORDADOS:
+                self._aprox[clave] = cod
+        return cod
+
+    def codigos(self, valores) -> np.ndarray:
+        cods, unicos = pd.factorize(normalizar(valores))
+        return np.array([self._buscar(u) for u in unicos], dtype=np.int64)[cods]
+
+    def codigo(self, valor) -> int:
+        return int(self.codigos([valor])[0])
+
+
+DPTOS = IndiceNombres({**{n: c for c, n in NOMBRE_DPTO.items()}, **ALIAS_DPTO})
+
+
+def cod_dpto(valor) -> int:
+    # código de 2 dígitos: los enteros (valores de los controles) pasan tal cual
+    if isinstance(valor, (int, np.integer)):
+        return int(valor)
+    if isinstance(valor, str) and valor.strip().isdigit():
+        return int(valor)
+    return DPTOS.codigo(valor)
+
+
+# ====== Municipios ============================================================
+def con_departamento(nombres, dptos) -> list[str]:
+    # muchos nombres de municipio se repiten entre departamentos
+    return [f"{n} ({NOMBRE_DPTO.get(int(d), f'{int(d):02d}')})" for n, d in zip(nombres, dptos)]
+
+
+class Divipola:
+    # índice: código de 5 dígitos; filas sin código de municipio no entran
+    def __init__(self, df: pd.DataFrame):
+        df = df[(df["COD_DPTO"].astype(int) > 0) & (df["COD_MUNIC"].astype(int) >= 0)]
+        m = pd.DataFrame({
+            "COD_DPTO": df["COD_DPTO"].astype(int).to_numpy(),
+            "MUNICIPIO": df["MUNICIPIO"].astype(str).to_numpy(),
+            "ORDEN": normalizar(df["MUNICIPIO"]).to_numpy(),
+        }, index=pd.Index((df["COD_DPTO"].astype(int) * 1000 + df["COD_MUNIC"].astype(int)).to_numpy(),
+                          name="COD_MPIO"))
+        self.municipios = m[~m.index.duplicated()].sort_values(["COD_DPTO", "ORDEN"])
+        self._nombre = dict(zip(self.municipios.index, self.municipios["MUNICIPIO"]))
+        self._indices = {int(d): IndiceNombres(dict(zip(g["MUNICIPIO"], g.index)))
+                         for d, g in self.municipios.groupby("COD_DPTO")}
+
+    @property
+    def vacia(self) -> bool:
+        return self.municipios.empty
+
+    def nombres(self, cods_mpio) -> list[str]:
+        # un código que DIVIPOLA no tiene se muestra completo (5 dígitos: único en el país)
+        return [self._nombre.get(int(c), f"Mpio. {int(c):05d}") for c in cods_mpio]
+
+    def etiquetas(self, cods_mpio) -> list[str]:
+        # "Nombre (Departamento)": para listas de varios departamentos (La Unión, Rionegro...)
+        cods = [int(c) for c in cods_mpio]
+        return con_departamento(self.nombres(cods), [c // 1000 for c in cods])
+
+    def de_dpto(self, dpto: int) -> pd.DataFrame:
+        # municipios del departamento, en orden alfabético
+        return self.municipios[self.municipios["COD_DPTO"] == int(dpto)]
+
+    def cod_mpio(self, dpto: int, nombre) -> int:
+        # código de 5 dígitos de un municipio buscado por nombre dentro de su departamento
+        indice = self._indices.get(int(dpto))
+        return -1 if indice is None else indice.codigo(nombre)
+
+
+def _leer_excel(data_dir: Path) -> pd.DataFrame:
+    frames = []
+    for p in data_dir.glob("*.xlsx"):
+        try:
+            sheets = pd.read_excel(p, sheet_name=None, engine="openpyxl")
+        except Exception:
+            continue
+        for _, df in sheets.items():
+            if not isinstance(df, pd.DataFrame) or df.empty:
+                continue
+            norm_cols = {_norm_col(c): c for c in df.columns}
+            # columnas de nombre (se prefieren a las de código) y de código DANE
+            dep_key = dep_cod = mun_key = mun_cod = None
+            for k, original in norm_cols.items():
+                es_cod = k.startswith("COD")
+                if any(t in k for t in ["DEPART", "DEPTO", "DPTO", "DEPARTAMENTO"]):
+                    if es_cod: dep_cod = dep_cod or original
+                    else: dep_key = dep_key or original
+                elif any(t in k for t in ["MUNICIP", "MPIO", "MUNICIPIO"]):
+                    if es_cod: mun_cod = mun_cod or original
+                    else: mun_key = mun_key or original
+            dep_key = dep_key or dep_cod
+            mun_key = mun_key or mun_cod
+            if dep_key and mun_key:
+                tmp = df[[dep_key, mun_key]].copy()
+                tmp.columns = ["DEPARTAMENTO", "MUNICIPIO"]
+                tmp["COD_DPTO"] = pd.to_numeric(df[dep_cod], errors="coerce") if dep_cod else np.nan
+                tmp["COD_MUNIC"] = pd.to_numeric(df[mun_cod], errors="coerce") if mun_cod else np.nan
+                tmp = tmp.dropna(subset=["DEPARTAMENTO", "MUNICIPIO"])
+                if not tmp.empty:
+                    frames.append(tmp)
+    if not frames:
+        return pd.DataFrame(columns=COLUMNAS)
+    out = pd.concat(frames, ignore_index=True)
+    out["DEPARTAMENTO"] = out["DEPARTAMENTO"].astype(str).str.strip()
+    out["MUNICIPIO"] = out["MUNICIPIO"].astype(str).str.strip()
+    # filas de encabezado o de solo códigos (p. ej. hojas con dos filas de títulos)
+    subtitulo = r"[0-9]*|CODIGO|NOMBRE"
+    out = out[~normalizar(out["DEPARTAMENTO"]).str.fullmatch(subtitulo)
+              & ~normalizar(out["MUNICIPIO"]).str.fullmatch(subtitulo)]
+    # hojas sin columna de código de departamento: se resuelve por nombre
+    sin_cod = out["COD_DPTO"].isna()
+    out.loc[sin_cod, "COD_DPTO"] = DPTOS.codigos(out.loc[sin_cod, "DEPARTAMENTO"])
+    out["COD_DPTO"] = out["COD_DPTO"].fillna(-1).astype(int)
+    out["COD_MUNIC"] = out["COD_MUNIC"].fillna(-1).astype(int)
+    return out.drop_duplicates(subset=["COD_DPTO", "COD_MUNIC"]).reset_index(drop=True)
+
+
+def cargar_divipola(data_dir: Path) -> Divipola:
+    # openpyxl es lento: la tabla se sirve desde la caché columnar y solo se vuelve
+    # a leer el Excel si cambia el contenido de algún .xlsx
+    if not data_dir.exists():
+        return Divipola(pd.DataFrame(columns=COLUMNAS))
+    fuentes = sorted(data_dir.glob("*.xlsx"))
+    return Divipola(frame_cacheado("divipola", fuentes, lambda: _leer_excel(data_dir), version=3))
@@ -0,0 +1,408 @@
+# -----------------------------------------------------------------------------
+# Descargas por streaming: /exportar/<nivel>.<formato>
+#   - agregado:  muertes por los ejes de `por` (ANO, MES, COD_DPTO, COD_MPIO, SEXO,
+#                EDAD, CAPITULO, CAUSA). Sale del cubo departamental o municipal si
+#                la selección cabe en él; si no (causa, o municipio con capítulo),
+#                de una pasada por los microdatos que suma bloque a bloque
+#   - registros: una fila por defunción, filtrada bloque a bloque
+#   - csv (gzip al vuelo si el cliente lo acepta) o parquet (con pyarrow: un
+#     row group por bloque); la respuesta se arma mientras se envía
+#   - Filtros en la query string (opcionales; listas separadas por coma):
+#       dpto (código o nombre), mpio (código de 5 dígitos, o nombre con un solo dpto),
+#       ano (2019 o 2015-2019), mes (1..12), sexo (1/2/3 o H/M), edad (grupo: 0–4 … 29),
+#       capitulo (1..22), causa (prefijos CIE-10: I21, C50, J)
+#     p. ej. /exportar/agregado.csv?dpto=5&ano=2019&por=MES,SEXO
+#   - Memoria: un bloque de TAM_BLOQUE filas; en el agregado por microdatos, además,
+#     los grupos (clave, conteo) acumulados. Nunca el resultado completo como texto
+# -----------------------------------------------------------------------------
+
+import zlib
+from typing import NamedTuple
+from urllib.parse import urlencode
+
+import numpy as np
+import pandas as pd
+from flask import Response, request
+
+import preparacion
+from cache_datos import cargar_frame
+from causas_cie10 import CatalogoCIE10
+from cubo import GRUPOS_EDAD, N_CAPITULOS, N_CAUSAS, N_EDAD, N_MES, TOTAL, capitulo_cie10, grupo_edad
+from divipola import cod_dpto
+from microdatos import NOMBRE_DPTO, archivos_microdatos, decodificar_cie10, leer_por_bloques
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+TAM_BLOQUE = 100_000
+# Ejes del agregado en el orden de las columnas (y del orden de las filas)
+DIMENSIONES = ["ANO", "MES", "COD_DPTO", "COD_MPIO", "SEXO", "EDAD", "CAPITULO", "CAUSA"]
+_BASES = {"ANO": 10_000, "MES": N_MES, "COD_DPTO": 100, "COD_MPIO": 100_000, "SEXO": 4,
+          "EDAD": N_EDAD, "CAPITULO": N_CAPITULOS, "CAUSA": N_CAUSAS}
+_SEXOS = {"1": 1, "H": 1, "HOMBRE": 1, "HOMBRES": 1, "2": 2, "M": 2, "MUJER": 2, "MUJERES": 2, "3": 3}
+_EDADES = {lbl: i for i, (lbl, _, _) in enumerate(GRUPOS_EDAD)}
+TIPOS_MIME = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+
+class Seleccion(NamedTuple):
+    # None = sin filtro; los valores ya en el dominio de los ejes
+    dpto: list | None = None        # códigos de 2 dígitos
+    mpio: list | None = None        # códigos de 5 dígitos
+    ano: list | None = None
+    mes: list | None = None         # 0..12 (0 = sin dato)
+    sexo: list | None = None        # 1, 2, 3 (otro / sin dato)
+    edad: list | None = None        # índice de GRUPOS_EDAD
+    capitulo: list | None = None    # 0..22 (0 = sin causa)
+    causa: list | None = None       # rangos [lo, hi) de codificar_cie10
+
+
+# ====== Selección =============================================================
+def _lista(args, nombre: str) -> list[str] | None:
+    v = args.get(nombre)
+    if v is None:
+        return None
+    partes = [p.strip() for p in v.split(",") if p.strip()]
+    return partes or None
+
+
+def _enteros(partes, nombre: str, lo: int, hi: int) -> list[int] | None:
+    if partes is None:
+        return None
+    out = []
+    for p in partes:
+        a, guion, b = p.partition("-")
+        if not (a.isdigit() and (not guion or b.isdigit())):
+            raise ValueError(f"{nombre}: valor no válido {p!r}")
+        a, b = int(a), int(b) if guion else int(a)
+        if not lo <= a <= b <= hi:
+            raise ValueError(f"{nombre}: fuera de rango {p!r} ({lo}..{hi})")
+        out += range(a, b + 1)
+    return out
+
+
+def seleccion(args, divipola=None) -> Seleccion:
+    # query string -> Seleccion; ValueError con un mensaje para el cliente si algo no se reconoce
+    dpto = None
+    if (partes := _lista(args, "dpto")) is not None:
+        dpto = [cod_dpto(p) for p in partes]
+        if any(c < 0 for c in dpto):
+            raise ValueError(f"dpto: departamento desconocido en {','.join(partes)!r}")
+        dpto = None if TOTAL in dpto else dpto       # 0 / "Todos": sin filtro
+    mpio = None
+    if (partes := _lista(args, "mpio")) is not None:
+        mpio = []
+        for p in partes:
+            if p.isdigit():
+                mpio.append(int(p)); continue
+            if divipola is None or not dpto or len(dpto) != 1:
+                raise ValueError(f"mpio: {p!r} por nombre requiere un solo dpto (o use el código de 5 dígitos)")
+            c = divipola.cod_mpio(dpto[0], p)
+            if c < 0:
+                raise ValueError(f"mpio: municipio desconocido {p!r} en {NOMBRE_DPTO.get(dpto[0], dpto[0])}")
+            mpio.append(c)
+    sexo = None
+    if (partes := _lista(args, "sexo")) is not None:
+        sexo = [_SEXOS.get(p.upper()) for p in partes]
+        if None in sexo:
+            raise ValueError(f"sexo: use 1/2/3 o H/M ({','.join(partes)!r})")
+    edad = None
+    if (partes := _lista(args, "edad")) is not None:
+        edad = [_EDADES.get(p.replace("-", "–")) for p in partes]
+        if None in edad:
+            raise ValueError(f"edad: grupos válidos {', '.join(_EDADES)}")
+    causa = None
+    if (partes := _lista(args, "causa")) is not None:
+        causa = [CatalogoCIE10.rango_prefijo(p) for p in partes]
+        if any(lo == 0 for lo, _ in causa):
+            raise ValueError(f"causa: prefijo CIE-10 no válido en {','.join(partes)!r}")
+    return Seleccion(dpto=dpto, mpio=mpio, ano=_enteros(_lista(args, "ano"), "ano", 1900, 9999),
+                     mes=_enteros(_lista(args, "mes"), "mes", 0, 12), sexo=sexo, edad=edad,
+                     capitulo=_enteros(_lista(args, "capitulo"), "capitulo", 0, N_CAPITULOS - 1),
+                     causa=causa)
+
+
+def url_exportar(nivel: str, formato: str = "csv", por=(), **filtros) -> str:
+    # enlace de descarga para una selección del panel (valores None u omitidos: sin filtro)
+    q = {k: ",".join(map(str, v)) if isinstance(v, (list, tuple)) else v
+         for k, v in filtros.items() if v is not None}
+    if por:
+        q["por"] = ",".join(por)
+    return f"/exportar/{nivel}.{formato}" + (f"?{urlencode(q)}" if q else "")
+
+
+# ====== Microdatos por bloques ================================================
+def _bloques_archivo(p):
+    # el archivo compacto de la caché columnar si existe (lo dejó cubo.py), si no el
+    # CSV por bloques; en ambos casos se entregan trozos de TAM_BLOQUE filas
+    micro, _ = cargar_frame(f"micro_{p.name}", [p])
+    if micro is None:
+        yield from leer_por_bloques(p, TAM_BLOQUE)
+        return
+    for i in range(0, len(micro), TAM_BLOQUE):
+        yield micro.iloc[i:i + TAM_BLOQUE]
+
+
+def _columnas(b: pd.DataFrame) -> dict:
+    # campos de un bloque en el dominio de los ejes del cubo (los mismos que filtra la selección)
+    dpto = b["COD_DPTO"].to_numpy().astype(np.int64)
+    mes = b["MES"].to_numpy().astype(np.int64)
+    sexo = b["SEXO"].to_numpy().astype(np.int64)
+    causa = b["CAUSA"].to_numpy().astype(np.int64)
+    return {
+        "ANO": b["ANO"].to_numpy().astype(np.int64), "MES": np.where(mes <= 12, mes, 0),
+        "COD_DPTO": dpto, "COD_MPIO": dpto * 1000 + b["COD_MUNIC"].to_numpy().astype(np.int64) % 1000,
+        "SEXO": np.where((sexo == 1) | (sexo == 2), sexo, 3),
+        "EDAD": grupo_edad(b["GRU_ED1"].to_numpy()), "CAPITULO": capitulo_cie10(causa), "CAUSA": causa,
+    }
+
+
+def _mascara(c: dict, sel: Seleccion) -> np.ndarray:
+    ok = np.ones(len(c["ANO"]), dtype=bool)
+    for campo, valores in [("COD_DPTO", sel.dpto), ("COD_MPIO", sel.mpio), ("ANO", sel.ano), ("MES", sel.mes),
+                           ("SEXO", sel.sexo), ("EDAD", sel.edad), ("CAPITULO", sel.capitulo)]:
+        if valores is not None:
+            ok &= np.isin(c[campo], valores)
+    if sel.causa is not None:
+        en_rango = np.zeros_like(ok)
+        for lo, hi in sel.causa:
+            en_rango |= (c["CAUSA"] >= lo) & (c["CAUSA"] < hi)
+        ok &= en_rango
+    return ok
+
+
+def _filtrados(archivos, sel: Seleccion):
+    # (bloque, columnas) de las filas que cumplen la selección, archivo por archivo
+    for p in archivos:
+        for b in _bloques_archivo(p):
+            c = _columnas(b)
+            ok = _mascara(c, sel)
+            if ok.any():
+                yield b[ok], {k: v[ok] for k, v in c.items()}
+
+
+def _texto_cie10(cods: np.ndarray) -> np.ndarray:
+    # decodificar_cie10 una vez por código distinto del bloque
+    u, inv = np.unique(cods, return_inverse=True)
+    return np.array(decodificar_cie10(u), dtype=object)[inv]
+
+
+def _registros(archivos, sel: Seleccion):
+    for b, c in _filtrados(archivos, sel):
+        yield pd.DataFrame({
+            "ANO": c["ANO"], "MES": c["MES"], "COD_DPTO": c["COD_DPTO"], "COD_MPIO": c["COD_MPIO"],
+            "SEXO": c["SEXO"], "GRU_ED1": b["GRU_ED1"].to_numpy().astype(np.int64),
+            "EDAD": np.array([lbl for lbl, _, _ in GRUPOS_EDAD], dtype=object)[c["EDAD"]],
+            "CAUSA": _texto_cie10(c["CAUSA"]),
+        })
+
+
+# ====== Agregados =============================================================
+def _tabla(valores: dict, n: np.ndarray, divipola) -> pd.DataFrame:
+    # ejes codificados -> columnas de la descarga (nombres junto a los códigos)
+    out = {}
+    for eje in DIMENSIONES:
+        if eje not in valores:
+            continue
+        v = np.asarray(valores[eje], dtype=np.int64)
+        if eje == "EDAD":
+            out[eje] = np.array([lbl for lbl, _, _ in GRUPOS_EDAD], dtype=object)[v]
+        elif eje == "CAUSA":
+            out[eje] = _texto_cie10(v)
+        else:
+            out[eje] = v
+        if eje == "COD_DPTO":
+            out["DEPARTAMENTO"] = [NOMBRE_DPTO.get(int(c), str(c)) for c in v]
+        elif eje == "COD_MPIO":
+            out["MUNICIPIO"] = divipola.nombres(v) if divipola is not None else [""] * len(v)
+    out["MUERTES"] = np.asarray(n, dtype=np.int64)
+    return pd.DataFrame(out)
+
+
+def _ejes_cubo(c, municipal: bool):
+    # (arreglo, nombres de sus ejes, valores de cada eje)
+    comunes = [("ANO", np.asarray(c.eje_ano, dtype=np.int64)), ("MES", np.arange(N_MES)),
+               ("SEXO", np.array([1, 2, 3])), ("EDAD", np.arange(N_EDAD))]
+    if municipal:
+        ejes = [("COD_MPIO", c.mun_dpto.astype(np.int64) * 1000 + c.mun_cod.astype(np.int64)), *comunes]
+        return c.mun_conteos, ejes
+    ejes = [("COD_DPTO", np.array(list(c.idx_dpto), dtype=np.int64)), *comunes,
+            ("CAPITULO", np.arange(N_CAPITULOS))]
+    return c.conteos, ejes
+
+
+def _desde_cubo(c, sel: Seleccion, por: list, divipola):
+    municipal = "COD_MPIO" in por or sel.mpio is not None
+    a, ejes = _ejes_cubo(c, municipal)
+    filtros = {"COD_DPTO": sel.dpto, "COD_MPIO": sel.mpio, "ANO": sel.ano, "MES": sel.mes,
+               "SEXO": sel.sexo, "EDAD": sel.edad, "CAPITULO": sel.capitulo}
+    indices = []
+    for eje, valores in ejes:
+        ok = np.ones(len(valores), dtype=bool)
+        if filtros[eje] is not None:
+            ok &= np.isin(valores, filtros[eje])
+        if eje == "COD_MPIO" and sel.dpto is not None:
+            ok &= np.isin(valores // 1000, sel.dpto)
+        if eje == "COD_DPTO":
+            # sin filtro ni eje de departamento basta la fila del total nacional
+            ok = (valores == TOTAL) if sel.dpto is None and eje not in por else ok & (valores != TOTAL)
+        indices.append(None if ok.all() else np.flatnonzero(ok))
+    # de atrás hacia adelante: quitar un eje no mueve los anteriores; sumar primero el
+    # último eje (capítulo o edad) deja el resto mucho más chico que el cubo
+    for k in reversed(range(len(ejes))):
+        if indices[k] is not None:
+            a = np.take(a, indices[k], axis=k)
+        if ejes[k][0] not in por:
+            a = a.sum(axis=k, dtype=np.int64)
+    quedan = [(eje, v if i is None else v[i]) for (eje, v), i in zip(ejes, indices) if eje in por]
+    orden = sorted(range(len(quedan)), key=lambda k: DIMENSIONES.index(quedan[k][0]))
+    a = np.ascontiguousarray(np.transpose(a, orden) if quedan else np.reshape(a, 1), dtype=np.int64)
+    quedan = [quedan[k] for k in orden]
+    plano = a.ravel()
+    for i in range(0, len(plano), TAM_BLOQUE):
+        nz = np.flatnonzero(plano[i:i + TAM_BLOQUE])
+        pos = np.unravel_index(i + nz, a.shape) if quedan else ()
+        valores = {eje: v[p] for (eje, v), p in zip(quedan, pos)}
+        if municipal and "COD_DPTO" in por:
+            valores["COD_DPTO"] = valores["COD_MPIO"] // 1000
+        yield _tabla(valores, plano[i + nz], divipola)
+
+
+def _desde_microdatos(archivos, sel: Seleccion, por: list, divipola):
+    # clave mixta por bloque (np.unique) y suma de parciales, como cubo.combinar_parciales
+    ejes = [e for e in DIMENSIONES if e in por and not (e == "COD_DPTO" and "COD_MPIO" in por)]
+    claves, n = np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+    for _, c in _filtrados(archivos, sel):
+        k = np.zeros(len(c["ANO"]), dtype=np.int64)
+        for eje in ejes:
+            k = k * _BASES[eje] + c[eje]
+        u, cuenta = np.unique(k, return_counts=True)
+        todas = np.concatenate([claves, u])
+        claves, inv = np.unique(todas, return_inverse=True)
+        n = np.bincount(inv, weights=np.concatenate([n, cuenta]), minlength=len(claves)).astype(np.int64)
+    for i in range(0, max(len(claves), 1), TAM_BLOQUE):
+        k, valores = claves[i:i + TAM_BLOQUE].copy(), {}
+        for eje in reversed(ejes):
+            k, valores[eje] = np.divmod(k, _BASES[eje])
+        if "COD_DPTO" in por and "COD_MPIO" in por:
+            valores["COD_DPTO"] = valores["COD_MPIO"] // 1000
+        yield _tabla(valores, n[i:i + TAM_BLOQUE], divipola)
+
+
+def _agregado(c, archivos, sel: Seleccion, por: list, divipola):
+    municipal = "COD_MPIO" in por or sel.mpio is not None
+    en_cubo = (sel.causa is None and "CAUSA" not in por
+               and not (municipal and ("CAPITULO" in por or sel.capitulo is not None))
+               and not (municipal and "COD_DPTO" in por and "COD_MPIO" not in por))
+    if en_cubo:
+        return _desde_cubo(c, sel, por, divipola)
+    return _desde_microdatos(archivos, sel, por, divipola)
+
+
+# ====== Formatos ==============================================================
+def _csv(tablas, gz: bool):
+    comp = zlib.compressobj(5, zlib.DEFLATED, 31) if gz else None   # wbits=31: cabecera gzip
+    encabezado = True
+    for t in tablas:
+        datos = t.to_csv(index=False, header=encabezado, lineterminator="\n").encode("utf-8")
+        encabezado = False
+        datos = comp.compress(datos) if comp else datos
+        if datos:
+            yield datos
+    if comp:
+        yield comp.flush()
+
+
+class _Tubo:
+    # destino de ParquetWriter que entrega lo escrito por partes; lleva la posición
+    # absoluta porque el pie del archivo guarda desplazamientos de cada row group
+    def __init__(self):
+        self._partes, self._pos, self.closed = [], 0, False
+
+    def write(self, datos) -> int:
+        datos = bytes(datos)
+        self._partes.append(datos)
+        self._pos += len(datos)
+        return len(datos)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def vaciar(self) -> bytes:
+        datos, self._partes = b"".join(self._partes), []
+        return datos
+
+
+def _parquet(tablas):
+    tubo, escritor = _Tubo(), None
+    for t in tablas:
+        tabla = pa.Table.from_pandas(t, preserve_index=False)
+        if escritor is None:
+            escritor = pq.ParquetWriter(pa.PythonFile(tubo, mode="w"), tabla.schema, compression="zstd")
+        if len(t):
+            escritor.write_table(tabla)
+        if datos := tubo.vaciar():
+            yield datos
+    escritor.close()
+    yield tubo.vaciar()
+
+
+def _al_menos_una(tablas, vacia: pd.DataFrame):
+    # el encabezado (csv) o el esquema (parquet) salen de la primera tabla
+    hubo = False
+    for t in tablas:
+        hubo = True
+        yield t
+    if not hubo:
+        yield vacia
+
+
+# ====== Ruta ==================================================================
+def instalar(server, cubo, divipola, micro_dir) -> None:
+    # cubo / divipola: funciones de datos de preparacion (app.cubo, app.divipola)
+
+    @server.route("/exportar/<any(agregado, registros):nivel>.<any(csv, parquet):formato>")
+    def exportar(nivel, formato):
+        if formato == "parquet" and pq is None:
+            return {"error": "parquet requiere pyarrow (pip install pyarrow); use .csv"}, 501
+        if not preparacion.lista("cubo"):
+            return {"error": "cargando datos; reintente en unos segundos"}, 503
+        # lo que se lee de la foto de la petición se toma aquí: el generador corre
+        # después de que la petición suelta su foto
+        c, archivos = cubo(), archivos_microdatos(micro_dir)
+        if c is None or not archivos:
+            return {"error": "sin microdatos: el panel está usando los datos demo"}, 404
+        mpios = divipola()
+        try:
+            sel = seleccion(request.args, mpios)
+            por = _lista(request.args, "por") or []
+            if nivel == "agregado" and (malos := [e for e in por if e not in DIMENSIONES]):
+                raise ValueError(f"por: ejes desconocidos {', '.join(malos)} (válidos: {', '.join(DIMENSIONES)})")
+        except ValueError as e:
+            return {"error": str(e)}, 400
+
+        if nivel == "registros":
+            tablas = _registros(archivos, sel)
+            vacia = pd.DataFrame(columns=["ANO", "MES", "COD_DPTO", "COD_MPIO", "SEXO", "GRU_ED1", "EDAD", "CAUSA"])
+        else:
+            tablas = _agregado(c, archivos, sel, por, mpios)
+            vacia = _tabla({e: [] for e in por}, [], mpios)
+        tablas = _al_menos_una(tablas, vacia)
+        cabeceras = {"Content-Disposition": f'attachment; filename="mortalidad_{nivel}.{formato}"',
+                     "X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+        if formato == "parquet":
+            cuerpo = _parquet(tablas)
+        else:
+            gz = "gzip" in request.headers.get("Accept-Encoding", "").lower()
+            cuerpo = _csv(tablas, gz)
+            if gz:
+                cabeceras["Content-Encoding"] = "gzip"
+        return Response(cuerpo, mimetype=TIPOS_MIME[formato], headers=cabeceras)
@@ -0,0 +1,42 @@
+# -----------------------------------------------------------------------------
+# Configuración de gunicorn (se carga sola al ejecutar gunicorn desde esta carpeta)
+#   - preload_app: el maestro importa app.py una sola vez (GeoJSON, cubo) y los
+#     workers heredan esos datos copy-on-write en lugar de cargarlos cada uno
+#   - Los datos de las demás pestañas se cargan en cada worker al activarlas;
+#     MORTALIDAD_PRECARGAR=1 los carga en el maestro antes de crear los workers
+#     (arranque más lento, memoria compartida)
+#   - gc.freeze(): los objetos cargados en el maestro quedan fuera del recolector,
+#     así los workers no "tocan" (ni copian) esas páginas al recolectar basura
+#   - MORTALIDAD_CARGA_FONDO=1: el maestro no carga datos; cada worker atiende de
+#     inmediato (/healthz, /readyz, estado "cargando") y los carga en un hilo
+#     (preparacion.py), así ni el despliegue ni el reciclaje de workers agotan --timeout
+#   - Los dos modos se excluyen: con CARGA_FONDO=1 el maestro no precarga nada
+#     (MORTALIDAD_PRECARGAR se ignora) y cada worker arma su propia copia. En
+#     producción (render.yaml) se usa PRECARGAR=1: el build deja los artefactos
+#     listos, el maestro los abre antes de crear los workers y /readyz sigue
+#     siendo el chequeo del balanceador
+# -----------------------------------------------------------------------------
+
+import gc
+import os
+
+preload_app = True
+
+
+def when_ready(server):
+    # corre en el maestro, antes de crear los workers
+    import preparacion
+    if os.environ.get("MORTALIDAD_PRECARGAR") == "1":
+        if preparacion.EN_FONDO:
+            server.log.warning("MORTALIDAD_PRECARGAR=1 se ignora con MORTALIDAD_CARGA_FONDO=1 "
+                               "(cada worker carga sus datos en segundo plano)")
+        else:
+            import app
+            app.precargar()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # hilos del worker: carga (MORTALIDAD_CARGA_FONDO=1) y recarga de ./data (MORTALIDAD_RECARGA_S)
+    import preparacion
+    preparacion.iniciar()
@@ -0,0 +1,162 @@
+# -----------------------------------------------------------------------------
+# Índice de mapas de bits para el filtro compartido del panel
+#   - Filas: combinaciones distintas MUNICIPIO × AÑO × MES × SEXO × EDAD × CAUSA
+#     del agregado disperso (cubo.combinar_parciales), con su conteo `n`
+#   - Ordenadas por municipio: departamento y municipio son rangos de filas
+#     (un tramo por valor, sin bits); MES, SEXO, EDAD y CAPÍTULO llevan un mapa
+#     de bits por valor (1 bit por fila, palabras de 64 bits)
+#   - Un filtro se resuelve con AND entre ejes y OR entre los valores de un eje,
+#     solo sobre las palabras de los tramos pedidos; las filas que quedan se
+#     cuentan con np.bincount sobre columnas chicas (uint8 / uint16)
+#   - Se recorre por bloques de palabras (BLOQUE): entre bloques se llama
+#     revisar() si se pasa, el punto de cancelación de trabajos.py
+#   - Lo arma precalcular.py (etapa "indice") → data/.cache/indice-<sello>.*.npy,
+#     abierto con mmap como el cubo
+# -----------------------------------------------------------------------------
+
+import numpy as np
+
+from cache_datos import cargar_arreglos, guardar_arreglos, huella_fuentes
+from cubo import (N_CAPITULOS, N_CAUSAS, N_EDAD, N_MES, N_SEXO, _descomponer, capitulo_cie10,
+                  combinar_parciales, parcial_archivo)
+from microdatos import archivos_microdatos
+
+VERSION = 1
+BITS = {"MES": N_MES, "SEXO": N_SEXO, "EDAD": N_EDAD, "CAPITULO": N_CAPITULOS}   # ejes con mapa de bits
+COLUMNAS = {"ANO": np.uint8, "MES": np.uint8, "SEXO": np.uint8, "EDAD": np.uint8,
+            "CAPITULO": np.uint8, "CAUSA": np.uint16}
+EJES = ["DPTO", "MPIO", "ANO", *BITS, "CAUSA"]   # ejes por los que se puede contar
+BLOQUE = 1 << 14        # palabras de 64 bits por bloque (~1 M filas)
+
+
+def _bits(valores: np.ndarray, n_valores: int) -> np.ndarray:
+    # valores por fila -> mapas de bits (valor × palabras uint64); bit i de la palabra j = fila 64·j + i
+    palabras = -(-len(valores) // 64)
+    out = np.zeros((n_valores, palabras * 8), dtype=np.uint8)
+    for v in range(n_valores):
+        b = np.packbits(valores == v, bitorder="little")
+        out[v, :len(b)] = b
+    return out.view(np.uint64)
+
+
+def construir(claves: np.ndarray, n: np.ndarray) -> dict:
+    c = _descomponer(claves)
+    mpio = c["COD_DPTO"] * 1000 + c["COD_MUNIC"]
+    orden = np.argsort(mpio, kind="stable")    # las claves ya vienen por año, mes, sexo, edad, causa
+    mpio = mpio[orden]
+    anos, i_ano = np.unique(c["ANO"][orden], return_inverse=True)
+    cols = {"ANO": i_ano, "MES": c["MES"][orden], "SEXO": c["SEXO"][orden], "EDAD": c["EDAD"][orden],
+            "CAUSA": c["CAUSA"][orden]}
+    cols["CAPITULO"] = capitulo_cie10(cols["CAUSA"])
+    mpio_cod, inicio = np.unique(mpio, return_index=True)
+    return {
+        "n": np.asarray(n)[orden].astype(np.uint32),
+        **{f"col_{e}": cols[e].astype(t) for e, t in COLUMNAS.items()},
+        **{f"bits_{e}": _bits(cols[e], k) for e, k in BITS.items()},
+        "mpio_cod": mpio_cod.astype(np.int32), "mpio_inicio": np.append(inicio, len(mpio)).astype(np.int64),
+        "eje_ano": anos.astype(np.int16),
+    }
+
+
+class IndiceBits:
+    def __init__(self, a: dict):
+        self.n = a["n"]
+        self.col = {e: a[f"col_{e}"] for e in COLUMNAS}
+        self.bits = {e: a[f"bits_{e}"] for e in BITS}
+        self.mpio_cod = np.asarray(a["mpio_cod"], dtype=np.int64)
+        self.mpio_inicio = np.asarray(a["mpio_inicio"], dtype=np.int64)
+        self.eje_ano = np.asarray(a["eje_ano"], dtype=np.int64)
+        self.filas_total = len(self.n)
+        # departamentos: tramos contiguos de municipios (mpio_cod viene ordenado)
+        self.dptos, self._dpto_de_mpio = np.unique(self.mpio_cod // 1000, return_inverse=True)
+        self._tamanos = {"DPTO": len(self.dptos), "MPIO": len(self.mpio_cod), "ANO": len(self.eje_ano),
+                         **BITS, "CAUSA": N_CAUSAS}
+
+    def _tramos(self, dpto, mpio) -> np.ndarray:
+        # (inicio, fin) de las filas de los municipios pedidos, de menor a mayor
+        ok = np.ones(len(self.mpio_cod), dtype=bool)
+        if dpto is not None:
+            ok &= np.isin(self.mpio_cod // 1000, dpto)
+        if mpio is not None:
+            ok &= np.isin(self.mpio_cod, mpio)
+        i = np.flatnonzero(ok)
+        return np.column_stack([self.mpio_inicio[i], self.mpio_inicio[i + 1]])
+
+    def filas(self, dpto=None, mpio=None, mes=None, sexo=None, edad=None, capitulo=None,
+              revisar=None) -> np.ndarray:
+        # posiciones de las filas que cumplen el filtro (None = sin filtro en ese eje)
+        tramos = self._tramos(dpto, mpio) if dpto is not None or mpio is not None \
+            else np.array([[0, self.filas_total]], dtype=np.int64)
+        if not len(tramos) or tramos[-1, 1] <= tramos[0, 0]:
+            return np.zeros(0, dtype=np.int64)
+        w0, w1 = tramos[0, 0] // 64, -(-tramos[-1, 1] // 64)   # ventana de palabras de los tramos
+        pedidos = [(eje, [v for v in valores if 0 <= int(v) < BITS[eje]])
+                   for eje, valores in (("MES", mes), ("SEXO", sexo), ("EDAD", edad), ("CAPITULO", capitulo))
+                   if valores is not None]
+        if not pedidos:
+            return np.concatenate([np.arange(lo, hi) for lo, hi in tramos])
+        partes = []
+        for a in range(w0, w1, BLOQUE):
+            if revisar is not None:
+                revisar()
+            b = min(a + BLOQUE, w1)
+            ok = None
+            for eje, valores in pedidos:
+                m = np.bitwise_or.reduce(self.bits[eje][:, a:b][valores], axis=0) if valores \
+                    else np.zeros(b - a, dtype=np.uint64)
+                ok = m if ok is None else ok & m
+            partes.append(np.flatnonzero(np.unpackbits(ok.view(np.uint8), bitorder="little")) + a * 64)
+        pos = np.concatenate(partes)
+        if len(tramos) > 1 or tramos[0, 0] > w0 * 64 or tramos[0, 1] < w1 * 64:
+            # fuera de los tramos (entre municipios no pedidos o en los bordes de la ventana)
+            t = np.searchsorted(tramos[:, 0], pos, side="right") - 1
+            pos = pos[(t >= 0) & (pos < tramos[np.clip(t, 0, None), 1])]
+        return pos
+
+    def columna(self, eje: str, pos: np.ndarray) -> np.ndarray:
+        # valor de `eje` en las filas `pos` (DPTO y MPIO como posición en self.dptos / self.mpio_cod)
+        if eje in ("DPTO", "MPIO"):
+            m = np.searchsorted(self.mpio_inicio, pos, side="right") - 1
+            return self._dpto_de_mpio[m] if eje == "DPTO" else m
+        return self.col[eje][pos].astype(np.int64)
+
+    def contar(self, por=(), revisar=None, **filtro) -> np.ndarray:
+        # muertes de las filas del filtro, en un arreglo denso con un eje por cada elemento de `por`
+        pos = self.filas(revisar=revisar, **filtro)
+        if not por:
+            return np.asarray(self.n[pos].sum(dtype=np.int64))
+        forma = [self._tamanos[e] for e in por]
+        total = np.zeros(int(np.prod(forma)), dtype=np.float64)
+        for i in range(0, len(pos), BLOQUE * 64):
+            if revisar is not None:
+                revisar()
+            p = pos[i:i + BLOQUE * 64]
+            idx = np.zeros(len(p), dtype=np.int64)
+            for eje, tam in zip(por, forma):
+                idx = idx * tam + self.columna(eje, p)
+            total += np.bincount(idx, weights=self.n[p], minlength=len(total))
+        return total.reshape(forma).astype(np.int64)
+
+def construir_y_guardar(micro_dir) -> dict:
+    archivos = archivos_microdatos(micro_dir)
+    arreglos = construir(*combinar_parciales(parcial_archivo(p) for p in archivos))
+    guardar_arreglos("indice", arreglos, huella_fuentes(archivos), VERSION, mmap=True)
+    return arreglos
+
+
+def cargar_indice(micro_dir, construir_si_falta: bool = True) -> IndiceBits | None:
+    archivos = archivos_microdatos(micro_dir)
+    if not archivos:
+        return None
+    arreglos, _ = cargar_arreglos("indice", archivos, VERSION)
+    if arreglos is None:
+        if not construir_si_falta:
+            return None
+        print("[indice] artefacto ausente o desactualizado; construyendo (use `python precalcular.py` en el build)")
+        try:
+            construir_y_guardar(micro_dir)
+            arreglos, _ = cargar_arreglos("indice", archivos, VERSION)
+        except OSError:
+            arreglos = None
+        arreglos = arreglos or construir(*combinar_parciales(parcial_archivo(p) for p in archivos))
+    return IndiceBits(arreglos)
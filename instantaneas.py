@@ -0,0 +1,205 @@
+# -----------------------------------------------------------------------------
+# Instantáneas de figuras: respuestas de callbacks precalculadas en el build
+#   - Dominio finito: el filtro compartido vacío o con un solo departamento (lo
+#     que pide la mayoría de las visitas) en barras, mapa, sexo y edad; en la
+#     torta, además, cada Top N del slider. Los modos de presentación ya son
+#     del navegador (assets/panel.js) y no multiplican las combinaciones
+#   - Cada combinación se arma una vez (la función del callback, como en
+#     benchmark.py) y se guarda el cuerpo exacto que Dash enviaría, comprimido
+#     (gzip y, si está instalado, brotli). Nombre = sha256 del cuerpo: respuestas
+#     iguales (p. ej. sexo, que ignora el departamento) ocupan un solo archivo
+#   - manifiesto.json: (salida, entradas) -> hash, con la versión de los datos
+#     (app.version_datos) y del código que las generó: todos los módulos .py de
+#     la raíz, que es de donde importan los callbacks
+#   - Servidor: un before_request atiende /_dash-update-component desde el
+#     paquete, sin pandas ni Plotly, con ETag = hash (304 si llega If-None-Match).
+#     Los navegadores no revalidan un POST: el ETag solo sirve a clientes que lo
+#     reenvían (scripts, proxies); para el navegador la ganancia es no calcular la figura.
+#     Si la versión no coincide, la entrada no está o la petición sigue un
+#     trabajo en segundo plano (?cacheKey / ?job), pasa al callback de siempre
+#   - MORTALIDAD_INSTANTANEAS=0 las desactiva
+#
+#   python instantaneas.py                   # en el build, después de precalcular.py
+# -----------------------------------------------------------------------------
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from flask import Response, request
+from plotly.io.json import to_json_plotly
+
+from cache_datos import CACHE_DIR, version_fuentes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE = Path(__file__).parent
+DIR = CACHE_DIR / "instantaneas"
+MANIFIESTO = DIR / "manifiesto.json"
+HABILITADAS = os.environ.get("MORTALIDAD_INSTANTANEAS", "1") == "1"
+CODIGO = version_fuentes(sorted(BASE.glob("*.py")))   # figuras armadas con este código
+CALLBACKS = ["actualizar_barras", "actualizar_mapa_y_card", "actualizar_barras_sexo",
+             "actualizar_histograma_edad", "actualizar_pie"]
+CODIFICACIONES = ("br", "gzip")
+
+_lock = threading.Lock()
+_manifiesto = {"mtime_ns": None, "datos": None}
+_contadores = {"aciertos": 0, "revalidadas": 0}
+
+
+def _clave(salida: str, valores: list) -> str:
+    return json.dumps([salida, valores], sort_keys=True, separators=(",", ":"))
+
+
+def _salidas(salida: str) -> list[tuple[str, str]]:
+    # "base_barras.data" o "..fig_map.figure...card-depto.children.." -> [(id, propiedad)]
+    partes = salida[2:-2].split("...") if salida.startswith("..") else [salida]
+    return [tuple(p.rsplit(".", 1)) for p in partes]
+
+
+# ====== Build =================================================================
+def _dominios(app_mod) -> dict:
+    # entradas de cada callback, tomadas de las opciones del layout (como benchmark.py)
+    from dash import html
+    arbol = html.Div([app_mod._barra_filtros(), *[c for _, crear in app_mod.PESTANAS.values() for c in crear()]])
+    comp = {getattr(c, "id", None): c for c in arbol._traverse()}
+    vacio = {"dpto": app_mod.COD_TOTAL, **{e: [] for e in app_mod.EJES_FILTRO}}
+    filtros = [vacio] + [{**vacio, "dpto": o["value"]} for o in comp["filtro_dpto"].options]
+    s = comp["topn"]
+    return {**{cb: [(f,) for f in filtros] for cb in CALLBACKS if cb != "actualizar_pie"},
+            "actualizar_pie": [(f, n) for f in filtros for n in range(s.min, s.max + 1, s.step)]}
+
+
+def _cuerpo(salidas: list, valor) -> bytes:
+    # lo que responde Dash 2.x: {"multi": true, "response": {id: {propiedad: valor}}}
+    valores = valor if len(salidas) > 1 else (valor,)
+    respuesta = {}
+    for (id_componente, prop), v in zip(salidas, valores):
+        respuesta.setdefault(id_componente, {})[prop] = v
+    return to_json_plotly({"multi": True, "response": respuesta}).encode("utf-8")
+
+
+def _guardar(cuerpo: bytes) -> str:
+    h = hashlib.sha256(cuerpo).hexdigest()[:24]
+    if not (DIR / f"{h}.gzip").exists():
+        (DIR / f"{h}.gzip").write_bytes(gzip.compress(cuerpo, compresslevel=9, mtime=0))
+        if brotli is not None:
+            (DIR / f"{h}.br").write_bytes(brotli.compress(cuerpo, quality=11))
+    return h
+
+
+def construir(app_mod) -> dict:
+    # arma todas las combinaciones con los datos ya cargados y reemplaza el paquete
+    salida_de = {cb["callback"].__name__: s for s, cb in app_mod.app.callback_map.items() if "callback" in cb}
+    DIR.mkdir(parents=True, exist_ok=True)
+    entradas, tiempos = {}, {}
+    for nombre, dominio in _dominios(app_mod).items():
+        fn, salida = getattr(app_mod, nombre), salida_de[nombre]
+        t0 = time.perf_counter()
+        for args in dominio:
+            valores = json.loads(to_json_plotly(list(args)))   # como llegan del navegador (códigos numpy -> int)
+            entradas[_clave(salida, valores)] = _guardar(_cuerpo(_salidas(salida), fn(*args)))
+        tiempos[nombre] = {"combinaciones": len(dominio), "segundos": time.perf_counter() - t0}
+    datos = {"version": app_mod.version_datos(), "codigo": CODIGO, "entradas": entradas}
+    tmp = MANIFIESTO.with_suffix(".tmp")
+    tmp.write_text(json.dumps(datos, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, MANIFIESTO)
+    # archivos de paquetes anteriores que ya nadie referencia
+    vigentes = set(entradas.values())
+    for p in DIR.iterdir():
+        if p.suffix in (".gzip", ".br") and p.stem not in vigentes:
+            p.unlink(missing_ok=True)
+    return {"entradas": len(entradas), "archivos": len(vigentes),
+            "bytes_gzip": sum((DIR / f"{h}.gzip").stat().st_size for h in vigentes), "callbacks": tiempos}
+
+
+# ====== Servidor ==============================================================
+def _leer_manifiesto() -> dict | None:
+    # se relee si el build lo reemplazó (mtime)
+    try:
+        mtime = MANIFIESTO.stat().st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        if _manifiesto["mtime_ns"] != mtime:
+            try:
+                datos = json.loads(MANIFIESTO.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                datos = None
+            _manifiesto.update(mtime_ns=mtime, datos=datos)
+        return _manifiesto["datos"]
+
+
+def _respuesta(h: str) -> Response | None:
+    aceptadas = request.headers.get("Accept-Encoding", "").lower()
+    cod = next((c for c in CODIFICACIONES if c in aceptadas and (DIR / f"{h}.{c}").exists()), None)
+    try:
+        datos = (DIR / f"{h}.{cod or 'gzip'}").read_bytes()
+    except OSError:
+        return None
+    resp = Response(datos if cod else gzip.decompress(datos), mimetype="application/json")
+    if cod:
+        resp.headers["Content-Encoding"] = cod      # compacto no la vuelve a comprimir
+    resp.vary.add("Accept-Encoding")
+    resp.set_etag(h, weak=True)                    # mismo contenido, bytes distintos según la codificación
+    resp.headers["Cache-Control"] = "no-cache"      # siempre se revalida: el hash cambia con los datos
+    return resp
+
+
+def instalar(server, version) -> None:
+    # después de preparacion.instalar: version() lee la foto de datos de la petición
+    if not HABILITADAS:
+        return
+
+    @server.before_request
+    def _servir():
+        if request.method != "POST" or not request.path.endswith("/_dash-update-component") or request.args:
+            return None
+        m = _leer_manifiesto()
+        if not m or m.get("codigo") != CODIGO or m.get("version") != version():
+            return None
+        cuerpo = request.get_json(silent=True) or {}
+        if cuerpo.get("state"):
+            return None
+        try:
+            h = m["entradas"].get(_clave(cuerpo["output"], [e["value"] for e in cuerpo["inputs"]]))
+        except (KeyError, TypeError):
+            return None
+        if h is None:
+            return None
+        if request.if_none_match.contains_weak(h):
+            with _lock:
+                _contadores["revalidadas"] += 1
+            return Response(status=304, headers={"ETag": f'W/"{h}"'})
+        resp = _respuesta(h)
+        if resp is not None:
+            with _lock:
+                _contadores["aciertos"] += 1
+        return resp
+
+
+def estadisticas() -> dict:
+    m = _leer_manifiesto() if HABILITADAS else None
+    return {"habilitadas": HABILITADAS, "entradas": len(m["entradas"]) if m else 0,
+            "version": m.get("version") if m else None, "worker": os.getpid(), **_contadores}
+
+
+if __name__ == "__main__":
+    # el build no llena la caché de figuras: cada combinación se arma una sola vez
+    os.environ.setdefault("MORTALIDAD_CACHE_FIGURAS_MB", "0")
+    t0 = time.perf_counter()
+    import app as app_mod
+    app_mod.precargar()
+    resultado = construir(app_mod)
+    print(f"[instantaneas] {resultado['entradas']} combinaciones, {resultado['archivos']} archivos, "
+          f"{resultado['bytes_gzip'] / 1e6:.1f} MB (gzip) en {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    for nombre, t in resultado["callbacks"].items():
+        print(f"[instantaneas]   {nombre}: {t['combinaciones']} en {t['segundos']:.2f}s", file=sys.stderr)
@@ -0,0 +1,326 @@
+# -----------------------------------------------------------------------------
+# Instrumentación de callbacks y ruta /metrics (formato de texto de Prometheus)
+#   - @instrumentar(callback, pestana): tiempo de pared, CPU del hilo, errores
+#     y reparto por fase: "figura" y "cache" se marcan con `with fase(...)`,
+#     "datos" es el resto del callback y "serializacion" lo que Dash tarda
+#     después (JSON + envío), medido en el after_request de Flask
+#   - Cada worker vuelca sus contadores a data/.cache/metricas/<pid>.json cada
+#     VOLCAR_CADA segundos (hilo propio); /metrics los junta con worker="<pid>"
+#   - Fases de arranque (app.FASES_ARRANQUE) y aciertos/fallos de la caché de
+#     figuras (contar_cache, en memoria como los demás contadores)
+#   - Perfilador por muestreo para UNA petición (MORTALIDAD_PERFILADOR=1):
+#     cabecera `X-Perfilar: 1` o GET /metrics/perfil?armar=1 (próxima petición
+#     de ese worker); el último perfil (pilas colapsadas) se sirve en /metrics/perfil
+# -----------------------------------------------------------------------------
+
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+from cache_datos import CACHE_DIR
+
+DIR = CACHE_DIR / "metricas"
+CUBETAS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FASES = ("datos", "figura", "cache", "serializacion")
+VOLCAR_CADA = 1.0          # segundos entre volcados del worker a disco
+PERFILADOR = os.environ.get("MORTALIDAD_PERFILADOR", "0") == "1"
+INTERVALO_MUESTREO = 0.001
+
+_lock = threading.Lock()
+_local = threading.local()
+_callbacks = {}            # nombre -> contadores
+_pestanas = {}             # nombre -> pestaña del panel
+_arranque = {}
+_cambios = [0]             # se incrementa con cada anotación; el volcador lo compara
+_volcador_pid = None
+_perfil = {"armado": False}
+ULTIMO_PERFIL = DIR / "perfil-ultimo.txt"
+
+
+def _nuevo() -> dict:
+    return {"llamadas": 0, "errores": 0, "segundos": 0.0, "cpu_segundos": 0.0, "bytes": 0,
+            "cubetas": [0] * (len(CUBETAS) + 1), "fases": dict.fromkeys(FASES, 0.0),
+            "cache_aciertos": 0, "cache_fallos": 0}
+
+
+# ====== Registro ==============================================================
+def registrar_arranque(fases: dict) -> None:
+    _arranque.update(fases)
+
+
+@contextmanager
+def fase(nombre: str):
+    # suma el tiempo del bloque a la fase del callback en curso (si lo hay)
+    fases = getattr(_local, "fases", None)
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if fases is not None:
+            fases[nombre] = fases.get(nombre, 0.0) + time.perf_counter() - t0
+
+
+def instrumentar(callback: str, pestana: str = ""):
+    from dash.exceptions import PreventUpdate
+
+    def deco(fn):
+        _pestanas[callback] = pestana
+
+        @functools.wraps(fn)
+        def envoltura(*args):
+            _local.fases = fases = {}
+            t0, c0 = time.perf_counter(), time.thread_time()
+            error = False
+            try:
+                return fn(*args)
+            except PreventUpdate:
+                raise
+            except Exception:
+                error = True
+                raise
+            finally:
+                dt, dc = time.perf_counter() - t0, time.thread_time() - c0
+                _local.fases = None
+                fases["datos"] = max(0.0, dt - fases.get("figura", 0.0) - fases.get("cache", 0.0))
+                with _lock:
+                    m = _callbacks.setdefault(callback, _nuevo())
+                    m["llamadas"] += 1; m["errores"] += error
+                    m["segundos"] += dt; m["cpu_segundos"] += dc
+                    m["cubetas"][_cubeta(dt)] += 1
+                    _cambios[0] += 1
+                    for k, v in fases.items():
+                        m["fases"][k] += v
+                try:
+                    g.metricas_callback = (callback, dt)     # para el after_request
+                except RuntimeError:
+                    pass                                      # llamado fuera de una petición (benchmark)
+
+        return envoltura
+    return deco
+
+
+def contar_cache(callback: str, acierto: bool) -> None:
+    # lo llama cache_figuras.leer en cada consulta
+    with _lock:
+        m = _callbacks.setdefault(callback, _nuevo())
+        m["cache_aciertos" if acierto else "cache_fallos"] += 1
+        _cambios[0] += 1
+
+
+def _cubeta(dt: float) -> int:
+    # índice de la primera cubeta con límite >= dt (la última posición es +Inf)
+    return bisect.bisect_left(CUBETAS, dt)
+
+
+# ====== Perfilador por muestreo ===============================================
+class _Muestreador(threading.Thread):
+    def __init__(self, hilo: int):
+        super().__init__(daemon=True)
+        self.hilo, self.pilas, self.muestras = hilo, {}, 0
+        self._alto = threading.Event()
+
+    def run(self):
+        while not self._alto.wait(INTERVALO_MUESTREO):
+            f = sys._current_frames().get(self.hilo)
+            pila = []
+            while f is not None:
+                pila.append(f"{f.f_code.co_filename.rsplit('/', 1)[-1]}:{f.f_code.co_name}")
+                f = f.f_back
+            if pila:
+                clave = ";".join(reversed(pila))
+                self.pilas[clave] = self.pilas.get(clave, 0) + 1
+                self.muestras += 1
+
+    def detener(self) -> str:
+        self._alto.set()
+        self.join()
+        # formato de pilas colapsadas (flamegraph.pl / speedscope)
+        return "\n".join(f"{k} {v}" for k, v in sorted(self.pilas.items(), key=lambda x: -x[1]))
+
+
+# ====== Flask =================================================================
+def _antes():
+    if request.path != "/_dash-update-component":
+        return
+    _asegurar_volcador()
+    g.metricas_t0 = time.perf_counter()
+    if PERFILADOR and (request.headers.get("X-Perfilar") or _perfil["armado"]):
+        _perfil["armado"] = False
+        g.muestreador = _Muestreador(threading.get_ident())
+        g.muestreador.start()
+
+
+def _despues(resp):
+    cb = g.pop("metricas_callback", None)
+    muestreador = g.pop("muestreador", None)
+    if muestreador is not None:
+        pilas = muestreador.detener()
+        texto = (f"# {cb[0] if cb else request.path} · {muestreador.muestras} muestras "
+                 f"cada {INTERVALO_MUESTREO * 1e3:g} ms · pid {os.getpid()}\n{pilas}\n")
+        _escribir(ULTIMO_PERFIL, texto)
+        resp.headers["X-Perfil"] = f"/metrics/perfil ({muestreador.muestras} muestras)"
+    if cb is None or not hasattr(g, "metricas_t0"):
+        return resp
+    nombre, dt_callback = cb
+    total = time.perf_counter() - g.metricas_t0
+    n = resp.calculate_content_length()
+    if n is None:
+        n = 0 if resp.direct_passthrough else len(resp.get_data())
+    with _lock:
+        m = _callbacks.setdefault(nombre, _nuevo())
+        m["fases"]["serializacion"] += max(0.0, total - dt_callback)
+        m["bytes"] += n
+        _cambios[0] += 1
+    return resp
+
+
+def _escribir(destino, texto: str) -> None:
+    try:
+        DIR.mkdir(parents=True, exist_ok=True)
+        tmp = destino.with_name(f"{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(texto, encoding="utf-8")
+        tmp.replace(destino)
+    except OSError:
+        pass
+
+
+def _volcar() -> None:
+    with _lock:
+        estado = json.dumps({"callbacks": _callbacks, "pestanas": _pestanas})
+    _escribir(DIR / f"{os.getpid()}.json", estado)
+
+
+def _asegurar_volcador() -> None:
+    # un hilo por proceso: tras el fork de gunicorn cada worker arranca el suyo
+    global _volcador_pid
+    if _volcador_pid == os.getpid():
+        return
+    _volcador_pid = os.getpid()
+
+    def bucle():
+        previo = None
+        while True:
+            time.sleep(VOLCAR_CADA)
+            actual = _cambios[0]
+            if actual != previo:
+                _volcar()
+                previo = actual
+
+    threading.Thread(target=bucle, daemon=True, name="metricas-volcado").start()
+
+
+def _vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _workers() -> dict:
+    # pid -> estado, de los archivos de los workers vivos (el propio, en memoria)
+    out = {}
+    for p in DIR.glob("*.json") if DIR.exists() else []:
+        try:
+            pid = int(p.stem)
+            if pid != os.getpid() and _vivo(pid):
+                out[pid] = json.loads(p.read_text(encoding="utf-8"))
+        except (ValueError, OSError):
+            continue
+    with _lock:
+        out[os.getpid()] = json.loads(json.dumps({"callbacks": _callbacks, "pestanas": _pestanas}))
+    return out
+
+
+def aciertos_cache() -> dict:
+    # callback -> {aciertos, fallos} de la caché de figuras, sumados entre workers
+    out = {}
+    for w in _workers().values():
+        for cb, m in w["callbacks"].items():
+            c = out.setdefault(cb, {"aciertos": 0, "fallos": 0})
+            c["aciertos"] += m.get("cache_aciertos", 0)
+            c["fallos"] += m.get("cache_fallos", 0)
+    return {cb: c for cb, c in out.items() if c["aciertos"] or c["fallos"]}
+
+
+def texto_prometheus() -> str:
+    lineas = []
+
+    def meta(nombre, tipo, ayuda):
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+
+    workers = _workers()
+    filas = [(pid, cb, w["pestanas"].get(cb, ""), m) for pid, w in sorted(workers.items())
+             for cb, m in sorted(w["callbacks"].items())]
+
+    def etiquetas(pid, cb, pestana, **extra):
+        e = {"worker": pid, "callback": cb, "pestana": pestana, **extra}
+        return "{" + ",".join(f'{k}="{v}"' for k, v in e.items()) + "}"
+
+    for nombre, campo, tipo, ayuda in [
+        ("mortalidad_callback_llamadas_total", "llamadas", "counter", "Llamadas al callback"),
+        ("mortalidad_callback_errores_total", "errores", "counter", "Excepciones en el callback"),
+        ("mortalidad_callback_cpu_segundos_total", "cpu_segundos", "counter", "CPU del hilo dentro del callback"),
+        ("mortalidad_callback_respuesta_bytes_total", "bytes", "counter", "Bytes de las respuestas"),
+        ("mortalidad_cache_figuras_aciertos_total", "cache_aciertos", "counter", "Aciertos de la caché de figuras"),
+        ("mortalidad_cache_figuras_fallos_total", "cache_fallos", "counter", "Fallos de la caché de figuras"),
+    ]:
+        meta(nombre, tipo, ayuda)
+        lineas += [f"{nombre}{etiquetas(pid, cb, p)} {m.get(campo, 0)}" for pid, cb, p, m in filas]
+
+    meta("mortalidad_callback_fase_segundos_total", "counter",
+         "Tiempo por fase: datos, figura (Plotly), cache (SQLite) y serializacion (JSON + Dash)")
+    lineas += [f"mortalidad_callback_fase_segundos_total{etiquetas(pid, cb, p, fase=f)} {v}"
+               for pid, cb, p, m in filas for f, v in m["fases"].items()]
+
+    meta("mortalidad_callback_segundos", "histogram", "Tiempo de pared del callback")
+    for pid, cb, p, m in filas:
+        acumulado = 0
+        for c, n in zip(CUBETAS, m["cubetas"]):
+            acumulado += n
+            lineas.append(f"mortalidad_callback_segundos_bucket{etiquetas(pid, cb, p, le=c)} {acumulado}")
+        lineas.append(f"mortalidad_callback_segundos_bucket{etiquetas(pid, cb, p, le='+Inf')} {m['llamadas']}")
+        lineas.append(f"mortalidad_callback_segundos_sum{etiquetas(pid, cb, p)} {m['segundos']}")
+        lineas.append(f"mortalidad_callback_segundos_count{etiquetas(pid, cb, p)} {m['llamadas']}")
+
+    meta("mortalidad_arranque_fase_segundos", "gauge", "Duración de cada fase de carga de app.py")
+    lineas += [f'mortalidad_arranque_fase_segundos{{fase="{k}"}} {v}' for k, v in _arranque.items()]
+
+    import cache_figuras
+    est = cache_figuras.estadisticas()
+    if est.get("habilitada") and "bytes" in est:
+        meta("mortalidad_cache_figuras_bytes", "gauge", "Bytes almacenados en la caché de figuras")
+        lineas.append(f"mortalidad_cache_figuras_bytes {est['bytes']}")
+    return "\n".join(lineas) + "\n"
+
+
+def instalar(server) -> None:
+    server.before_request(_antes)
+    server.after_request(_despues)
+
+    @server.route("/metrics")
+    def metricas_prometheus():
+        _volcar()
+        return Response(texto_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    @server.route("/metrics/perfil")
+    def metricas_perfil():
+        if not PERFILADOR:
+            return Response("perfilador deshabilitado (MORTALIDAD_PERFILADOR=1)\n", status=404, mimetype="text/plain")
+        if request.args.get("armar"):
+            _perfil["armado"] = True
+            return Response(f"armado en el worker {os.getpid()}\n", mimetype="text/plain")
+        try:
+            return Response(ULTIMO_PERFIL.read_text(encoding="utf-8"), mimetype="text/plain")
+        except OSError:
+            return Response("sin perfiles todavía\n", mimetype="text/plain")
@@ -0,0 +1,176 @@
+# -----------------------------------------------------------------------------
+# Ingesta por bloques de los microdatos de defunciones no fetales (DANE)
+#   - Lee los CSV/TXT anuales de ./data/microdatos en bloques (chunksize)
+#   - Conserva solo las columnas que usa el panel, como enteros compactos:
+#       ANO, COD_DPTO, COD_MUNIC, MES, SEXO, GRU_ED1 y CAUSA (CIE-10 codificada)
+#   - Cada archivo ingerido se guarda en la caché columnar (cache_datos)
+# -----------------------------------------------------------------------------
+
+import gzip
+import re
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cache_datos import frame_cacheado
+
+TAM_BLOQUE = 500_000
+
+# Encabezados aceptados (normalizados: mayúsculas, sin tildes) para cada campo
+CAMPOS = {
+    "COD_DPTO":  ["COD_DPTO", "COD_DEPARTAMENTO", "CODIGO_DEPARTAMENTO", "CODPTO"],
+    "COD_MUNIC": ["COD_MUNIC", "COD_MUNICIPIO", "CODIGO_MUNICIPIO", "CODMUNIC"],
+    "ANO":       ["ANO", "ANIO", "ANO_DEFUNCION"],
+    "MES":       ["MES", "MES_DEFUNCION"],
+    "SEXO":      ["SEXO"],
+    "GRU_ED1":   ["GRU_ED1", "GRUPO_EDAD1", "GRU_EDAD1"],
+    "CAUSA":     ["C_BAS1", "CAUSA_BASICA", "COD_CAUSA", "CIE10"],
+}
+OPCIONALES = {"ANO"}
+
+TIPOS = {"ANO": np.uint16, "COD_DPTO": np.uint8, "COD_MUNIC": np.uint16, "MES": np.uint8,
+         "SEXO": np.uint8, "GRU_ED1": np.uint8, "CAUSA": np.uint16}
+COLUMNAS = list(TIPOS)
+
+EDAD_DESCONOCIDA = 29   # GRU_ED1 = 29: "Edad desconocida"
+
+# Nombres de departamento (tal como aparecen en el GeoJSON) por código DANE
+NOMBRE_DPTO = {
+    5: "Antioquia", 8: "Atlántico", 11: "Bogotá D.C.", 13: "Bolívar", 15: "Boyacá",
+    17: "Caldas", 18: "Caquetá", 19: "Cauca", 20: "Cesar", 23: "Córdoba",
+    25: "Cundinamarca", 27: "Chocó", 41: "Huila", 44: "La Guajira", 47: "Magdalena",
+    50: "Meta", 52: "Nariño", 54: "Norte de Santander", 63: "Quindío", 66: "Risaralda",
+    68: "Santander", 70: "Sucre", 73: "Tolima", 76: "Valle del Cauca", 81: "Arauca",
+    85: "Casanare", 86: "Putumayo", 88: "San Andrés y Providencia", 91: "Amazonas",
+    94: "Guainía", 95: "Guaviare", 97: "Vaupés", 99: "Vichada",
+}
+
+
+def _norm_col(s) -> str:
+    s = unicodedata.normalize("NFKD", str(s).strip().upper())
+    return "".join(c for c in s if not unicodedata.combining(c))
+
+
+# ====== CIE-10 como entero de 16 bits =========================================
+# 1 + letra*1100 + (dos dígitos)*11 + cuarto carácter (0-9, o 10 para 'X'); 0 = sin dato.
+# Los 11 valores de un mismo código de tres caracteres son contiguos.
+def codificar_cie10(codigos) -> np.ndarray:
+    s = pd.Series(codigos, dtype="string").str.upper().str.replace(r"[^A-Z0-9]", "", regex=True)
+    s = s.fillna("").str.pad(4, side="right", fillchar="X").str[:4]
+    b = np.array(s.tolist(), dtype="S4").view(np.uint8).reshape(-1, 4).astype(np.int32)
+    letra, d1, d2, c4 = b[:, 0] - 65, b[:, 1] - 48, b[:, 2] - 48, b[:, 3]
+    d4 = np.where(c4 == ord("X"), 10, c4 - 48)
+    ok = ((letra >= 0) & (letra < 26) & (d1 >= 0) & (d1 <= 9) & (d2 >= 0) & (d2 <= 9)
+          & (d4 >= 0) & (d4 <= 10))
+    cod = 1 + letra * 1100 + (d1 * 10 + d2) * 11 + d4
+    return np.where(ok, cod, 0).astype(np.uint16)
+
+
+def decodificar_cie10(cods) -> list[str]:
+    out = []
+    for c in np.asarray(cods, dtype=np.int64).ravel():
+        if c <= 0:
+            out.append(""); continue
+        c -= 1
+        letra, resto = divmod(int(c), 1100)
+        dd, d4 = divmod(resto, 11)
+        out.append(f"{chr(65 + letra)}{dd:02d}{'X' if d4 == 10 else d4}")
+    return out
+
+
+# ====== Lectura por bloques ===================================================
+def _abrir_texto(p: Path, encoding: str):
+    return gzip.open(p, "rt", encoding=encoding) if p.suffix.lower() == ".gz" else open(p, "r", encoding=encoding)
+
+
+def _detectar_formato(p: Path) -> tuple[str, str, list[str]]:
+    # (separador, codificación, encabezados) a partir de la primera línea
+    for enc in ("utf-8-sig", "latin-1"):
+        try:
+            with _abrir_texto(p, enc) as f:
+                linea = f.readline()
+            break
+        except UnicodeDecodeError:
+            continue
+    sep = max([";", ",", "\t", "|"], key=linea.count)
+    cols = [c.strip().strip('"') for c in linea.rstrip("\r\n").split(sep)]
+    return sep, enc, cols
+
+
+def _mapear_columnas(cols: list[str]) -> dict:
+    norm = {_norm_col(c): c for c in cols}
+    out = {}
+    for campo, candidatos in CAMPOS.items():
+        original = next((norm[c] for c in candidatos if c in norm), None)
+        if original is None and campo not in OPCIONALES:
+            raise ValueError(f"columna {campo} no encontrada (encabezados: {cols[:12]}...)")
+        if original is not None:
+            out[campo] = original
+    return out
+
+
+def _compactar(chunk: pd.DataFrame, ano_defecto: int) -> pd.DataFrame:
+    out = {}
+    for campo in COLUMNAS:
+        if campo == "CAUSA":
+            out[campo] = codificar_cie10(chunk[campo])
+            continue
+        if campo not in chunk:
+            out[campo] = np.full(len(chunk), ano_defecto, dtype=TIPOS[campo]); continue
+        v = pd.to_numeric(chunk[campo], errors="coerce")
+        if campo == "COD_MUNIC":
+            v = v % 1000          # algunos años traen el código de 5 dígitos
+        defecto = {"GRU_ED1": EDAD_DESCONOCIDA, "ANO": ano_defecto}.get(campo, 0)
+        out[campo] = v.fillna(defecto).clip(lower=0, upper=np.iinfo(TIPOS[campo]).max).to_numpy().astype(TIPOS[campo])
+    return pd.DataFrame(out)
+
+
+def leer_por_bloques(p: Path, tam_bloque: int = TAM_BLOQUE):
+    # Generador de bloques compactos; nunca materializa el archivo completo como texto
+    p = Path(p)
+    sep, enc, cols = _detectar_formato(p)
+    mapa = _mapear_columnas(cols)
+    m = re.search(r"(19|20)\d{2}", p.name)
+    ano_defecto = int(m.group(0)) if m else 0
+    lector = pd.read_csv(p, sep=sep, encoding=enc, usecols=list(mapa.values()), dtype=str,
+                         chunksize=tam_bloque, encoding_errors="replace")
+    inverso = {v: k for k, v in mapa.items()}
+    for chunk in lector:
+        yield _compactar(chunk.rename(columns=inverso), ano_defecto)
+
+
+def ingerir_archivo(p: Path, tam_bloque: int = TAM_BLOQUE) -> pd.DataFrame:
+    partes = list(leer_por_bloques(p, tam_bloque))
+    if not partes:
+        return vacio()
+    return pd.concat(partes, ignore_index=True)
+
+
+def vacio() -> pd.DataFrame:
+    return pd.DataFrame({c: np.array([], dtype=t) for c, t in TIPOS.items()})
+
+
+def archivos_microdatos(micro_dir: Path) -> list[Path]:
+    if not micro_dir.exists():
+        return []
+    return sorted(p for p in micro_dir.iterdir()
+                  if p.is_file() and p.name.lower().endswith((".csv", ".txt", ".csv.gz", ".txt.gz")))
+
+
+def cargar_microdatos(micro_dir: Path) -> pd.DataFrame:
+    # Un archivo = una entrada de caché: agregar un año nuevo no reingiere los demás
+    partes = []
+    for p in archivos_microdatos(micro_dir):
+        try:
+            partes.append(frame_cacheado(f"micro_{p.name}", [p], lambda p=p: ingerir_archivo(p)))
+        except (ValueError, OSError) as e:
+            print(f"[microdatos] se omite {p.name}: {e}")
+    if not partes:
+        return vacio()
+    return pd.concat(partes, ignore_index=True).astype(TIPOS)
+
+
+def contar(micro: pd.DataFrame, por: list[str]) -> pd.DataFrame:
+    return micro.groupby(por, observed=True).size().rename("MUERTES").reset_index()
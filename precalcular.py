@@ -0,0 +1,166 @@
+# -----------------------------------------------------------------------------
+# Precálculo fuera de línea de los artefactos del panel (en el build, no en un worker web)
+#   1. parciales: un proceso por archivo anual ingiere y agrega (cubo.parcial_archivo)
+#   2. combinar:  suma de los parciales dispersos y partición por departamento
+#   3. losas:     un proceso por departamento arma sus arreglos densos
+#                 (mes × sexo × edad × capítulo, causas CIE-10 y municipios)
+#   4. cubo:      ensambla las losas (total nacional, serie mensual y totales por
+#                 eje) y guarda el artefacto versionado que app.py abre con mmap
+#   5. indice:    mapas de bits del filtro compartido sobre las claves combinadas
+#                 (indice_bits.py); se rehace solo si falta o cambiaron las fuentes
+#   6. tablas:    DIVIPOLA y catálogo CIE-10 en la caché columnar
+#   - Reanudable: parciales y losas quedan en data/.cache con la huella de sus
+#     fuentes; al relanzar tras una interrupción solo se rehace lo que falta.
+#     --forzar rehace todo: parciales, losas, cubo e índice
+#   - Tiempos por etapa (y por archivo / departamento): en stderr, en --salida y
+#     en el manifiesto del cubo (data/.cache/cubo.json)
+#
+#   python precalcular.py                      # ./data/microdatos, un proceso por CPU
+#   python precalcular.py data/sintetico/x10 --procesos 4 --salida tiempos.json
+# -----------------------------------------------------------------------------
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import cubo
+import indice_bits
+from cache_datos import cargar_arreglos, guardar_arreglos, huella_fuentes
+from causas_cie10 import cargar_catalogo
+from divipola import cargar_divipola
+from microdatos import NOMBRE_DPTO, archivos_microdatos
+
+BASE = Path(__file__).parent
+DATA_DIR = BASE / "data"
+
+
+# ====== Trabajo de cada proceso ===============================================
+def _parcial(p: Path, forzar: bool) -> tuple[str, object, object, float, bool]:
+    t0 = time.perf_counter()
+    reanudado = not forzar and cargar_arreglos(f"cubo_parcial_{p.name}", [p], cubo.VERSION_PARCIAL)[0] is not None
+    claves, n = cubo.parcial_archivo(p, forzar=forzar)
+    return p.name, claves, n, time.perf_counter() - t0, reanudado
+
+
+def _losa(dpto: int, claves, n, anos, huella: dict) -> tuple[int, dict, float]:
+    t0 = time.perf_counter()
+    losa = cubo.losa_dpto(claves, n, anos)
+    try:
+        guardar_arreglos(f"cubo_losa_{dpto:02d}", {**losa, "anos": anos}, huella, cubo.VERSION)
+    except OSError:
+        pass
+    return dpto, losa, time.perf_counter() - t0
+
+
+def _losa_guardada(dpto: int, archivos, anos) -> dict | None:
+    # la losa de una corrida interrumpida sirve si sus fuentes y su eje de años son los mismos
+    a, _ = cargar_arreglos(f"cubo_losa_{dpto:02d}", archivos, cubo.VERSION)
+    if a is None or list(a["anos"]) != list(anos):
+        return None
+    return {k: v for k, v in a.items() if k != "anos"}
+
+
+def _en_paralelo(pool, fn, tareas: list[tuple]):
+    # resultados en orden de llegada; sin pool (un proceso) corre aquí mismo
+    if pool is None:
+        for t in tareas:
+            yield fn(*t)
+        return
+    futuros = [pool.submit(fn, *t) for t in tareas]
+    for f in as_completed(futuros):
+        yield f.result()
+
+
+# ====== Etapas ================================================================
+class Tiempos:
+    def __init__(self):
+        self.etapas, self.detalle = {}, {}
+        self._t0 = time.perf_counter()
+
+    def marcar(self, etapa: str, nota: str = "") -> None:
+        ahora = time.perf_counter()
+        self.etapas[etapa] = ahora - self._t0
+        self._t0 = ahora
+        print(f"[precalcular] {etapa}: {self.etapas[etapa]:.2f}s{' — ' + nota if nota else ''}", file=sys.stderr)
+
+
+def _rehacer(archivos: list, procesos: int, al_dia: dict, t: Tiempos, forzar: bool = False) -> None:
+    # etapas 1 a 5; lo que ya esté al día (cubo o índice) no se vuelve a armar;
+    # con forzar tampoco se reusan parciales ni losas guardados
+    huella = huella_fuentes(archivos)
+    pool = ProcessPoolExecutor(max_workers=procesos) if procesos > 1 else None
+    try:
+        parciales, reanudados = {}, 0
+        t.detalle["parciales_s"] = {}
+        for nombre, claves, n, dt, reanudado in _en_paralelo(pool, _parcial, [(p, forzar) for p in archivos]):
+            parciales[nombre] = (claves, n)
+            t.detalle["parciales_s"][nombre] = dt
+            reanudados += reanudado
+        t.marcar("parciales", f"{len(archivos)} archivos, {reanudados} ya estaban")
+
+        claves, n = cubo.combinar_parciales(parciales[p.name] for p in archivos)
+        anos, partes = cubo.particionar(claves)
+        t.marcar("combinar", f"{len(claves):,} claves, {len(anos)} años, {len(partes)} departamentos")
+
+        if not al_dia["cubo"]:
+            losas = {} if forzar else \
+                {d: l for d in partes if (l := _losa_guardada(d, archivos, anos)) is not None}
+            pendientes = [(d, claves[i], n[i], anos, huella) for d, i in partes.items() if d not in losas]
+            t.detalle["losas_s"] = {}
+            for d, losa, dt in _en_paralelo(pool, _losa, pendientes):
+                losas[d] = losa
+                t.detalle["losas_s"][NOMBRE_DPTO.get(d, str(d))] = dt
+            t.marcar("losas", f"{len(pendientes)} armadas, {len(partes) - len(pendientes)} ya estaban")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    if not al_dia["cubo"]:
+        arreglos = cubo.ensamblar(anos, losas)
+        t.marcar("ensamblar", f"departamental {arreglos['conteos'].shape}, municipal {arreglos['mun_conteos'].shape}")
+        guardar_arreglos("cubo", arreglos, huella, cubo.VERSION, mmap=True,
+                         extra={"etapas_s": t.etapas, "procesos": procesos})
+        t.marcar("guardar", f"{sum(a.nbytes for a in arreglos.values()) / 1e6:.1f} MB")
+    if not al_dia["indice"]:
+        arreglos = indice_bits.construir(claves, n)
+        guardar_arreglos("indice", arreglos, huella, indice_bits.VERSION, mmap=True)
+        t.marcar("indice", f"{len(arreglos['n']):,} filas, {sum(a.nbytes for a in arreglos.values()) / 1e6:.1f} MB")
+
+
+def precalcular(micro_dir: Path, procesos: int, forzar: bool = False) -> dict:
+    t = Tiempos()
+    archivos = archivos_microdatos(micro_dir)
+    if not archivos:
+        print(f"[precalcular] sin microdatos en {micro_dir}; el panel usará los datos demo", file=sys.stderr)
+    else:
+        al_dia = {nombre: not forzar and cargar_arreglos(nombre, archivos, version)[0] is not None
+                  for nombre, version in (("cubo", cubo.VERSION), ("indice", indice_bits.VERSION))}
+        if all(al_dia.values()):
+            t.marcar("cubo", "cubo e índice al día (use --forzar para rehacerlos)")
+        else:
+            _rehacer(archivos, procesos, al_dia, t, forzar)
+
+    cargar_divipola(DATA_DIR)
+    cargar_catalogo(DATA_DIR)
+    t.marcar("tablas", "DIVIPOLA y catálogo CIE-10")
+    return {"micro_dir": str(micro_dir), "procesos": procesos, "etapas_s": t.etapas, **t.detalle}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Precálculo de los artefactos del panel (cubo y tablas)")
+    ap.add_argument("micro_dir", nargs="?", type=Path,
+                    default=Path(os.environ.get("MORTALIDAD_MICRODATOS", DATA_DIR / "microdatos")))
+    ap.add_argument("--procesos", type=int, default=os.cpu_count() or 1, help="procesos del pool (1: sin pool)")
+    ap.add_argument("--forzar", action="store_true", help="rehacer parciales, losas, cubo e índice aunque estén al día")
+    ap.add_argument("--salida", type=Path, help="tiempos por etapa en JSON")
+    a = ap.parse_args()
+
+    t0 = time.perf_counter()
+    resultado = precalcular(a.micro_dir, max(1, a.procesos), a.forzar)
+    print(f"[precalcular] total: {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+    if a.salida:
+        a.salida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
@@ -0,0 +1,285 @@
+# -----------------------------------------------------------------------------
+# Preparación de los datos del panel
+#   - @dato(nombre): función que arma un conjunto de datos; corre una sola vez
+#     por versión de sus fuentes (con lock) y su duración queda en DURACIONES y en /metrics.
+#     El orden de registro es el orden de prioridad de la carga en segundo plano
+#   - Modo por defecto: cada conjunto se arma al pedirlo (primera activación de
+#     su pestaña) y el cubo en `import app`
+#   - MORTALIDAD_CARGA_FONDO=1: el servidor atiende de inmediato y un hilo de
+#     cada worker arma todo en orden de prioridad; los callbacks marcados con
+#     @requiere devuelven un estado "cargando" mientras falte algo que necesitan
+#   - /healthz: el proceso atiende; /readyz: 200 con todo cargado, 503 si no
+#   - Los valores viven en una Foto inmutable con número de versión; cada petición
+#     fija la foto vigente al llegar y la usa hasta responder (nunca ve datos a medias)
+#   - Recarga en caliente (MORTALIDAD_RECARGA_S > 0): un hilo revisa cada N s las
+#     fuentes de cada dato (nombre, tamaño, mtime); cuando cambian y siguen iguales
+#     en la revisión siguiente (archivo ya escrito), rearma solo esos datos y los
+#     que dependen de ellos, y publica una foto nueva de una sola vez
+# -----------------------------------------------------------------------------
+
+import functools
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+from cache_datos import version_fuentes
+from metricas import registrar_arranque
+
+EN_FONDO = os.environ.get("MORTALIDAD_CARGA_FONDO", "0") == "1"
+RECARGA_S = float(os.environ.get("MORTALIDAD_RECARGA_S", "15"))
+
+
+class Foto(NamedTuple):
+    version: int                   # sube en cada recarga
+    sello: str                     # huella de las fuentes: igual entre workers con los mismos archivos
+    fuentes: Mapping[str, str]     # nombre -> version_fuentes de sus archivos
+    valores: Mapping[str, object]  # nombre -> valor ya armado
+
+
+def _foto_nueva(version: int, fuentes: dict, valores: dict) -> Foto:
+    fuentes = dict(fuentes)
+    sello = hashlib.sha1(json.dumps(fuentes, sort_keys=True).encode()).hexdigest()[:12]
+    return Foto(version, sello, MappingProxyType(fuentes), MappingProxyType(dict(valores)))
+
+
+DURACIONES = {}            # nombre -> segundos que tomó armarlo (la última vez)
+_cargadores = {}           # nombre -> función (en orden de prioridad)
+_fuentes = {}              # nombre -> función que lista sus archivos
+_dependientes = {}         # nombre -> datos que se arman a partir de él
+_foto = _foto_nueva(0, {}, {})
+_local = threading.local()     # .foto: fijada por la petición; .borrador: recarga en curso
+_en_curso = set()
+_errores = {}              # nombre -> último error
+_lock = threading.Lock()
+_lock_recarga = threading.Lock()
+_hilo_pid = None
+_vistas = None             # versiones de la última revisión que no coincidían con la foto
+
+
+# ====== Registro ==============================================================
+def dato(nombre: str, fuentes=None, depende: tuple = ()):
+    # fuentes(): archivos de los que sale el dato (para la recarga); depende: datos
+    # que lee al armarse, que al cambiar obligan a rearmarlo
+    def deco(fn):
+        lock = threading.Lock()
+
+        @functools.wraps(fn)
+        def cargar():
+            foto = actual()
+            if nombre in foto.valores:
+                return foto.valores[nombre]
+            with lock:
+                foto = actual()
+                if nombre in foto.valores:
+                    return foto.valores[nombre]
+                _en_curso.add(nombre)
+                t0 = time.perf_counter()
+                try:
+                    valor = fn()
+                except Exception as e:
+                    _errores[nombre] = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    _en_curso.discard(nombre)
+                DURACIONES[nombre] = time.perf_counter() - t0
+                _errores.pop(nombre, None)
+                _publicar(nombre, valor, foto)
+                registrar_arranque({f"dato_{nombre}": DURACIONES[nombre]})
+            return valor
+        _cargadores[nombre] = cargar
+        _fuentes[nombre] = fuentes or (lambda: [])
+        for d in depende:
+            _dependientes.setdefault(d, []).append(nombre)
+        _registrar_fuentes(nombre)
+        return cargar
+    return deco
+
+
+def _registrar_fuentes(nombre: str) -> None:
+    # versión de las fuentes al registrar el dato: la recarga compara contra ella
+    global _foto
+    version = _version(nombre)
+    with _lock:
+        _foto = _foto_nueva(_foto.version, {**_foto.fuentes, nombre: version}, _foto.valores)
+
+
+def _version(nombre: str) -> str:
+    return version_fuentes([p for p in _fuentes[nombre]() if os.path.exists(p)])
+
+
+def requiere(*nombres: str, cargando):
+    # mientras falte algún dato (solo en modo fondo) el callback devuelve `cargando()`
+    # sin calcular; va por fuera de cache_figuras.memoizar para no guardar ese estado
+    def deco(fn):
+        @functools.wraps(fn)
+        def envoltura(*args):
+            if all(lista(n) for n in nombres):
+                return fn(*args)
+            return cargando()
+        return envoltura
+    return deco
+
+
+# ====== Fotos =================================================================
+def actual() -> Foto:
+    # foto en construcción (hilo de recarga), la fijada por la petición o la vigente
+    borrador = getattr(_local, "borrador", None)
+    if borrador is not None:
+        return borrador
+    return getattr(_local, "foto", None) or _foto
+
+
+def _publicar(nombre: str, valor, base: Foto) -> None:
+    # el valor se armó leyendo `base`: entra a la foto vigente solo si sigue siendo la misma
+    # versión (si hubo una recarga en medio, se arma de nuevo desde la foto nueva)
+    global _foto
+
+    def con_valor(f: Foto) -> Foto:
+        return _foto_nueva(f.version, f.fuentes, {**f.valores, nombre: valor})
+
+    if getattr(_local, "borrador", None) is not None:
+        _local.borrador = con_valor(_local.borrador)
+        return
+    with _lock:
+        if _foto.version == base.version:
+            _foto = con_valor(_foto)
+    if getattr(_local, "foto", None) is not None:
+        _local.foto = con_valor(_local.foto)
+
+
+def fijar(foto: Foto | None = None) -> None:
+    # la vigente (al llegar la petición) o una dada: la de la petición que lanzó un trabajo
+    _local.foto = foto or _foto
+
+
+def soltar(_=None) -> None:
+    _local.foto = None
+
+
+def sello() -> str:
+    # versión de los datos para claves de caché (cache_figuras)
+    return actual().sello
+
+
+# ====== Estado ================================================================
+def lista(nombre: str) -> bool:
+    # en el modo por defecto todo está "listo": lo que falte se arma al pedirlo
+    return not EN_FONDO or nombre in actual().valores
+
+
+def listos() -> list[str]:
+    return [n for n in _cargadores if lista(n)]
+
+
+def todo_listo() -> bool:
+    return all(lista(n) for n in _cargadores)
+
+
+def estado() -> dict:
+    valores = actual().valores
+
+    def uno(n):
+        if n in valores:
+            return "listo"
+        if n in _errores:
+            return "error: " + _errores[n]
+        return "cargando" if n in _en_curso else "pendiente"
+    return {n: uno(n) for n in _cargadores}
+
+
+# ====== Carga =================================================================
+def cargar_todo() -> None:
+    for nombre, cargar in list(_cargadores.items()):
+        try:
+            cargar()
+        except Exception as e:
+            print(f"[preparacion] {nombre}: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+def recargar() -> list[str]:
+    # rearma los datos cuyas fuentes cambiaron (y sus dependientes) sobre un borrador
+    # y lo publica como foto nueva; los que aún no se habían armado quedan pendientes
+    global _foto, _vistas
+    with _lock_recarga:
+        base = _foto
+        versiones = {n: _version(n) for n in _cargadores}
+        if versiones == dict(base.fuentes):
+            _vistas = None
+            return []
+        if versiones != _vistas:
+            _vistas = versiones    # se espera una revisión más: el archivo puede estar a medio escribir
+            return []
+        _vistas = None
+        cambiados = [n for n in _cargadores if versiones[n] != base.fuentes.get(n)]
+        afectados, pila = set(), list(cambiados)
+        while pila:
+            n = pila.pop()
+            if n not in afectados:
+                afectados.add(n)
+                pila += _dependientes.get(n, [])
+        _local.borrador = _foto_nueva(base.version + 1, versiones,
+                                      {n: v for n, v in base.valores.items() if n not in afectados})
+        try:
+            for n in _cargadores:
+                if n in afectados and n in base.valores:
+                    _cargadores[n]()
+            nueva = _local.borrador
+        finally:
+            _local.borrador = None
+        with _lock:
+            _foto = nueva
+        print(f"[preparacion] versión {nueva.version}: cambió {', '.join(cambiados)}; "
+              f"rearmado {', '.join(n for n in _cargadores if n in afectados and n in nueva.valores) or '-'}",
+              file=sys.stderr)
+        return sorted(afectados)
+
+
+def _vigilar() -> None:
+    while True:
+        time.sleep(RECARGA_S)
+        try:
+            recargar()
+        except Exception as e:
+            # la foto anterior sigue vigente; se reintenta en la próxima revisión
+            print(f"[preparacion] recarga: {type(e).__name__}: {e}", file=sys.stderr)
+
+
+def iniciar() -> None:
+    # hilos de carga (modo fondo) y de recarga, uno de cada uno por proceso: tras el
+    # fork de gunicorn los del maestro no existen en el worker (por eso se compara el pid)
+    global _hilo_pid
+    if _hilo_pid == os.getpid():
+        return
+    with _lock:
+        if _hilo_pid == os.getpid():
+            return
+        _hilo_pid = os.getpid()
+    if EN_FONDO:
+        threading.Thread(target=cargar_todo, name="preparacion", daemon=True).start()
+    if RECARGA_S > 0:
+        threading.Thread(target=_vigilar, name="recarga", daemon=True).start()
+
+
+def _al_recibir() -> None:
+    iniciar()   # respaldo si el servidor no llama a iniciar() (python app.py)
+    fijar()
+
+
+def instalar(server) -> None:
+    server.before_request(_al_recibir)
+    server.teardown_request(soltar)
+
+    @server.route("/healthz")
+    def healthz():
+        return {"vivo": True, "pid": os.getpid(), "version": _foto.version}
+
+    @server.route("/readyz")
+    def readyz():
+        listo = todo_listo()
+        return ({"listo": listo, "en_fondo": EN_FONDO, "version": _foto.version, "sello": _foto.sello,
+                 "datos": estado(), "pid": os.getpid()}, 200 if listo else 503)
@@ -0,0 +1,99 @@
+# -----------------------------------------------------------------------------
+# Series de tiempo de la pestaña de tendencia
+#   - Matriz DPTO × MES (meses corridos de todos los años del cubo; el total nacional
+#     es una fila más): todas las series pedidas salen de un solo índice sobre ella
+#   - Resoluciones: mes, trimestre, año (suma de meses consecutivos con np.add.reduceat).
+#     Los microdatos del DANE traen ANO y MES pero no el día de la defunción: el mes
+#     es la resolución más fina disponible
+#   - Vista: solo el rango visible (más un periodo a cada lado, para que la línea
+#     llegue al borde) y, si aún hay más puntos que píxeles, LTTB al ancho del gráfico
+#   - revisar (opcional): punto de cancelación de trabajos.py, cada REVISAR_CADA buckets
+# -----------------------------------------------------------------------------
+
+import numpy as np
+
+RESOLUCIONES = {"mes": 1, "trimestre": 3, "ano": 12}   # meses por periodo
+ANCHO_DEFECTO = 800     # píxeles del área de trazado antes de conocer el gráfico
+MIN_PUNTOS = 3          # LTTB conserva siempre el primero y el último
+REVISAR_CADA = 256      # buckets de LTTB entre puntos de cancelación
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_salida: int, revisar=None) -> np.ndarray:
+    # Largest-Triangle-Three-Buckets para varias series con el mismo eje x (y: series × puntos).
+    # Devuelve los índices elegidos (series × n_salida); los buckets son comunes, así que
+    # cada paso se resuelve para todas las series a la vez
+    k, n = y.shape
+    if n_salida >= n or n_salida < MIN_PUNTOS:
+        return np.tile(np.arange(n), (k, 1))
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    bordes = np.linspace(1, n - 1, n_salida - 1).astype(np.int64)   # n_salida - 2 buckets interiores
+    bordes = np.append(bordes, n)
+    filas = np.arange(k)
+    elegidos = np.zeros((k, n_salida), dtype=np.int64)
+    elegidos[:, -1] = n - 1
+    a = np.zeros(k, dtype=np.int64)
+    for i in range(n_salida - 2):
+        if revisar is not None and i % REVISAR_CADA == 0:
+            revisar()
+        lo, hi, sig = bordes[i], bordes[i + 1], bordes[i + 2]
+        # tercer vértice: promedio del bucket siguiente (el último punto, al final)
+        cx, cy = x[hi:sig].mean(), y[:, hi:sig].mean(axis=1)
+        ax, ay = x[a], y[filas, a]
+        area = np.abs((ax - cx)[:, None] * (y[:, lo:hi] - ay[:, None])
+                      - (ax[:, None] - x[None, lo:hi]) * (cy - ay)[:, None])
+        a = lo + area.argmax(axis=1)
+        elegidos[:, i + 1] = a
+    return elegidos
+
+
+def _mes(texto) -> np.datetime64 | None:
+    # "2019-03", "2019-03-14 05:12:33.1" (rango de Plotly) -> mes
+    try:
+        return np.datetime64(str(texto)[:7], "M")
+    except ValueError:
+        return None
+
+
+class Series:
+    def __init__(self, cods, meses: np.ndarray, conteos: np.ndarray):
+        # cods: código de cada fila (0 = total nacional); meses: datetime64[M] de cada columna
+        self.meses = np.asarray(meses, dtype="datetime64[M]")
+        self.conteos = np.asarray(conteos, dtype=np.int64)
+        self._fila = {int(c): i for i, c in enumerate(cods)}
+
+    @classmethod
+    def desde_conteos(cls, cods, anos, mensual) -> "Series":
+        # mensual: DPTO × AÑO × MES con el mes desconocido en la posición 0 (se descarta)
+        m = np.asarray(mensual, dtype=np.int64)[:, :, 1:13]
+        anos = np.asarray(anos, dtype=np.int64)
+        meses = ((anos[:, None] - 1970) * 12 + np.arange(12)).ravel().astype("datetime64[M]")
+        return cls(list(cods), meses, m.reshape(len(m), -1))
+
+    @classmethod
+    def desde_cubo(cls, c) -> "Series":
+        # DPTO × AÑO × MES, ya sumado al armar el cubo
+        return cls.desde_conteos(c.idx_dpto, c.eje_ano, c.mensual)
+
+    def seleccion(self, cods, resolucion: str = "mes", desde=None, hasta=None,
+                  ancho: int = ANCHO_DEFECTO, revisar=None) -> tuple[list, np.ndarray]:
+        # ([x de cada serie como "AAAA-MM"], ...) y los valores: listas por serie, ya reducidas
+        vacia = np.zeros((1, len(self.meses)), dtype=np.int64)
+        filas = [self._fila.get(int(c)) for c in cods]
+        m = np.vstack([vacia if f is None else self.conteos[f:f + 1] for f in filas])
+        p = RESOLUCIONES.get(resolucion, 1)
+        grupo = self.meses.astype(np.int64) // p
+        grupos, inicio = np.unique(grupo, return_index=True)
+        if len(grupos):
+            m = np.add.reduceat(m, inicio, axis=1)
+        x = (grupos * p).astype("datetime64[M]")
+        d, h = _mes(desde), _mes(hasta)
+        if d is not None and h is not None and len(x):
+            lo = max(int(np.searchsorted(x, d, side="right")) - 2, 0)
+            hi = int(np.searchsorted(x, h, side="right")) + 1
+            x, m = x[lo:hi], m[:, lo:hi]
+        if revisar is not None:
+            revisar()
+        idx = lttb(np.arange(len(x)), m, max(int(ancho), MIN_PUNTOS), revisar)
+        textos = np.datetime_as_string(x, unit="M")
+        return [textos[i].tolist() for i in idx], [m[j, i] for j, i in enumerate(idx)]
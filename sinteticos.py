@@ -0,0 +1,182 @@
+# -----------------------------------------------------------------------------
+# Generador de microdatos sintéticos para pruebas de carga y de escala
+#   - Mismo formato que los archivos anuales del DANE (nofetalAAAA.csv, separador ";")
+#   - Municipios reales (DIVIPOLA en ./data) y códigos reales del Anexo2 CIE-10
+#   - Vectorizado por bloques: cada bloque tiene su propia semilla (semilla, año, bloque),
+#     así que cualquier bloque se puede regenerar (o generar en paralelo) por separado
+#   - Escala: 1× ≈ volumen nacional anual (~250 mil defunciones); 10× y 100× para estrés
+#
+#   python sinteticos.py --escala 10 --anos 2019 2020 --salida data/sintetico/x10
+#   python precalcular.py data/sintetico/x10
+# -----------------------------------------------------------------------------
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from cache_datos import frame_cacheado
+from causas_cie10 import cargar_catalogo
+from cubo import GRUPOS_EDAD
+from microdatos import NOMBRE_DPTO, TAM_BLOQUE, _norm_col, decodificar_cie10
+
+VOLUMEN_ANUAL = 250_000
+COLUMNAS = ["COD_DPTO", "COD_MUNIC", "A_DEFUN", "ANO", "MES", "SEXO", "GRU_ED1", "C_BAS1"]
+
+# Mismas proporciones que los datos demo de app.py (VALORES por mes, PESOS_EDAD por grupo)
+PESOS_MES = np.array([19, 17, 18, 18, 19, 20, 21, 20, 18, 19, 19, 21], dtype=float)
+PESOS_GRUPO_EDAD = np.array([0.01, 0.02, 0.03, 0.05, 0.05, 0.10, 0.16, 0.22, 0.22, 0.13, 0.01])
+PESOS_SEXO = np.array([0.555, 0.444, 0.001])           # 1 hombre, 2 mujer, 3 indeterminado
+PESOS_AREA = np.array([0.78, 0.07, 0.15])               # A_DEFUN: cabecera, centro poblado, rural
+# Población aproximada por departamento (millones, CNPV 2018): reparte el volumen nacional
+POBLACION_DPTO = {
+    5: 6.4, 8: 2.5, 11: 7.4, 13: 2.1, 15: 1.2, 17: 1.0, 18: 0.40, 19: 1.5, 20: 1.2, 23: 1.8,
+    25: 2.9, 27: 0.46, 41: 1.1, 44: 0.88, 47: 1.3, 50: 1.0, 52: 1.35, 54: 1.5, 63: 0.54, 66: 0.94,
+    68: 2.2, 70: 0.9, 73: 1.3, 76: 4.5, 81: 0.26, 85: 0.42, 86: 0.35, 88: 0.06, 91: 0.07,
+    94: 0.05, 95: 0.08, 97: 0.04, 99: 0.11,
+}
+PESO_CAPITAL = 0.4     # fracción del departamento que ocurre en la capital (código 001)
+# Causas frecuentes que encabezan el ranking sintético (en este orden)
+CAUSAS_FRECUENTES = ["I219", "C349", "J189", "I10X", "E119", "C169", "I64X", "J449", "A419", "X954",
+                     "N179", "C61X", "C509", "K746", "V892"]
+
+
+def _p(w) -> np.ndarray:
+    w = np.asarray(w, dtype=float)
+    return w / w.sum()
+
+
+# ====== Dimensiones reales ====================================================
+def _leer_municipios(data_dir: Path) -> pd.DataFrame:
+    # pares (COD_DPTO, COD_MUNIC) desde cualquier hoja del DIVIPOLA con columnas de código
+    for p in sorted(data_dir.glob("*.xlsx")):
+        try:
+            hojas = pd.read_excel(p, sheet_name=None, engine="openpyxl")
+        except Exception:
+            continue
+        for df in hojas.values():
+            cols = {_norm_col(c): c for c in df.columns}
+            dep = next((o for k, o in cols.items() if k.startswith("COD") and "DEPART" in k), None)
+            mun = next((o for k, o in cols.items() if k.startswith("COD") and "MUNICIP" in k), None)
+            if dep is None or mun is None:
+                continue
+            out = pd.DataFrame({"COD_DPTO": pd.to_numeric(df[dep], errors="coerce"),
+                                "COD_MUNIC": pd.to_numeric(df[mun], errors="coerce") % 1000}).dropna()
+            out = out.astype(np.int64)
+            out = out[out["COD_DPTO"].isin(list(NOMBRE_DPTO))].drop_duplicates()
+            if not out.empty:
+                return out.sort_values(["COD_DPTO", "COD_MUNIC"]).reset_index(drop=True)
+    return pd.DataFrame({"COD_DPTO": np.array([], dtype=np.int64), "COD_MUNIC": np.array([], dtype=np.int64)})
+
+
+def municipios(data_dir: Path) -> pd.DataFrame:
+    fuentes = sorted(data_dir.glob("*.xlsx"))
+    return frame_cacheado("sint_municipios", fuentes, lambda: _leer_municipios(data_dir))
+
+
+class Generador:
+    def __init__(self, data_dir: Path, semilla: int = 2019):
+        self.semilla = int(semilla)
+        rng = np.random.default_rng([self.semilla, 0])
+
+        mun = municipios(data_dir)
+        if mun.empty:
+            # sin DIVIPOLA: solo la capital (COD_MUNIC 1) de cada departamento
+            mun = pd.DataFrame({"COD_DPTO": sorted(NOMBRE_DPTO), "COD_MUNIC": 1})
+        self.mun_dpto = mun["COD_DPTO"].to_numpy(dtype=np.uint8)
+        self.mun_cod = mun["COD_MUNIC"].to_numpy(dtype=np.uint16)
+        # departamento ∝ población; dentro de él, la capital se lleva PESO_CAPITAL y el
+        # resto se reparte con tamaños lognormales
+        w = rng.lognormal(0.0, 1.0, len(mun))
+        capital = self.mun_cod == 1
+        for d in np.unique(self.mun_dpto):
+            en_d = self.mun_dpto == d
+            cap, otros = en_d & capital, en_d & ~capital
+            share_cap = 1.0 if not otros.any() else (PESO_CAPITAL if cap.any() else 0.0)
+            w[cap] = share_cap / cap.sum() if cap.any() else 0.0
+            if otros.any():
+                w[otros] = (1.0 - share_cap) * w[otros] / w[otros].sum()
+            w[en_d] *= POBLACION_DPTO.get(int(d), 0.1)
+        self.p_mun = _p(w)
+
+        cat = cargar_catalogo(data_dir)
+        if cat is not None:
+            cods = np.flatnonzero(cat.nombre4 != "")
+            self.causas = np.array(decodificar_cie10(cods))
+        else:
+            self.causas = np.array(CAUSAS_FRECUENTES)
+        # Zipf sobre una permutación fija de los códigos, con las causas frecuentes al frente
+        frecuentes = [c for c in CAUSAS_FRECUENTES if c in set(self.causas)]
+        resto = rng.permutation(np.setdiff1d(self.causas, frecuentes))
+        self.causas = np.concatenate([frecuentes, resto]).astype("U4")
+        self.p_causa = _p(1.0 / np.arange(1, len(self.causas) + 1) ** 1.1)
+
+        # GRU_ED1: peso del grupo repartido por igual entre sus códigos DANE
+        codigos, pesos = [], []
+        for (_, lo, hi), w in zip(GRUPOS_EDAD, PESOS_GRUPO_EDAD):
+            codigos += list(range(lo, hi + 1)); pesos += [w / (hi - lo + 1)] * (hi - lo + 1)
+        self.edades = np.array(codigos, dtype=np.uint8)
+        self.p_edad = _p(pesos)
+
+    def bloque(self, ano: int, i: int, n: int) -> pd.DataFrame:
+        rng = np.random.default_rng([self.semilla, int(ano), int(i) + 1])
+        m = rng.choice(len(self.p_mun), size=n, p=self.p_mun)
+        return pd.DataFrame({
+            "COD_DPTO": self.mun_dpto[m],
+            "COD_MUNIC": self.mun_cod[m],
+            "A_DEFUN": (rng.choice(3, size=n, p=PESOS_AREA) + 1).astype(np.uint8),
+            "ANO": np.full(n, ano, dtype=np.uint16),
+            "MES": (rng.choice(12, size=n, p=_p(PESOS_MES)) + 1).astype(np.uint8),
+            "SEXO": (rng.choice(3, size=n, p=PESOS_SEXO) + 1).astype(np.uint8),
+            "GRU_ED1": self.edades[rng.choice(len(self.edades), size=n, p=self.p_edad)],
+            "C_BAS1": self.causas[rng.choice(len(self.causas), size=n, p=self.p_causa)],
+        }, columns=COLUMNAS)
+
+    def escribir_ano(self, ano: int, total: int, salida: Path, tam_bloque: int = TAM_BLOQUE,
+                     comprimir: bool = False) -> Path:
+        salida.mkdir(parents=True, exist_ok=True)
+        destino = salida / f"nofetal{ano}.csv{'.gz' if comprimir else ''}"
+        tmp = destino.with_name(destino.name + ".tmp")
+        with open(tmp, "wb") as f:
+            for i, ini in enumerate(range(0, total, tam_bloque)):
+                df = self.bloque(ano, i, min(tam_bloque, total - ini))
+                df.to_csv(f, sep=";", index=False, header=(i == 0),
+                          compression="gzip" if comprimir else None)
+        tmp.replace(destino)
+        return destino
+
+
+def generar(salida: Path, escala: float = 1.0, anos=(2019,), semilla: int = 2019,
+            data_dir: Path | None = None, tam_bloque: int = TAM_BLOQUE, comprimir: bool = False,
+            verbose: bool = False) -> list[Path]:
+    data_dir = data_dir or Path(__file__).parent / "data"
+    gen = Generador(data_dir, semilla)
+    total = int(round(VOLUMEN_ANUAL * escala))
+    rutas = []
+    for ano in anos:
+        t0 = time.perf_counter()
+        rutas.append(gen.escribir_ano(int(ano), total, salida, tam_bloque, comprimir))
+        if verbose:
+            dt = time.perf_counter() - t0
+            print(f"[sinteticos] {rutas[-1].name}: {total:,} registros en {dt:.1f}s "
+                  f"({total / max(dt, 1e-9) / 1e6:.2f} M/s, {rutas[-1].stat().st_size / 1e6:.0f} MB)")
+    return rutas
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Microdatos sintéticos de defunciones (formato DANE)")
+    ap.add_argument("--escala", type=float, default=1.0, help="múltiplo del volumen nacional anual (1, 10, 100)")
+    ap.add_argument("--anos", type=int, nargs="+", default=[2019])
+    ap.add_argument("--semilla", type=int, default=2019)
+    ap.add_argument("--salida", type=Path, default=None, help="por defecto data/sintetico/x<escala>")
+    ap.add_argument("--bloque", type=int, default=TAM_BLOQUE)
+    ap.add_argument("--gzip", action="store_true", help="escribir .csv.gz")
+    a = ap.parse_args()
+    salida = a.salida or Path(__file__).parent / "data" / "sintetico" / f"x{a.escala:g}"
+    t0 = time.perf_counter()
+    rutas = generar(salida, a.escala, a.anos, a.semilla, tam_bloque=a.bloque, comprimir=a.gzip, verbose=True)
+    print(f"[sinteticos] {len(rutas)} archivo(s) en {salida} ({time.perf_counter() - t0:.1f}s)")
+    sys.exit(0)
@@ -0,0 +1,151 @@
+# -----------------------------------------------------------------------------
+# Tabla de causas servida por páginas (DataTable en modo "custom")
+#   - Se construye una vez: columnas como arreglos numpy + permutaciones de orden
+#     precalculadas por columna (asc/desc)
+#   - Filtros de la DataTable (filter_query) → máscaras vectorizadas
+#       * CODIGO con "datestartswith" (prefijo) o "=" (exacto) se resuelve por
+#         búsqueda binaria (los códigos ordenados dejan cada prefijo en un rango
+#         contiguo); "contains" busca la subcadena en cualquier posición
+#   - Solo viaja al navegador la página visible
+# -----------------------------------------------------------------------------
+
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+from microdatos import _norm_col
+
+COLUMNAS = ("CODIGO", "NOMBRE", "CASOS")
+NUMERICAS = {"CASOS"}
+
+# operadores que emite la DataTable, en el orden en que deben probarse
+_OPERADORES = [
+    ("ge", ">="), ("le", "<="), ("lt", "<"), ("gt", ">"), ("ne", "!="), ("eq", "="),
+    ("contains", "contains"), ("datestartswith", "datestartswith"),
+]
+_TERMINO = re.compile(r"^\s*\{(?P<col>[^}]+)\}\s*(?P<op>\S+)\s*(?P<valor>.*?)\s*$")
+_SINONIMOS = {"s<": "lt", "<": "lt", "s>": "gt", ">": "gt", "s<=": "le", "<=": "le", "s>=": "ge",
+              ">=": "ge", "s!=": "ne", "!=": "ne", "s=": "eq", "=": "eq"}
+
+
+def _partir_filtro(parte: str):
+    # "{CASOS} > 100" → ("CASOS", "gt", 100.0); "{NOMBRE} contains infarto" → (..., "contains", "infarto")
+    m = _TERMINO.match(parte)
+    if not m:
+        return None
+    col, op, valor = m.group("col"), m.group("op").lower(), m.group("valor")
+    op = _SINONIMOS.get(op, op)
+    if op not in dict(_OPERADORES):
+        return None
+    if len(valor) >= 2 and valor[0] == valor[-1] and valor[0] in "\"'`":
+        valor = valor[1:-1].replace("\\" + valor[0], valor[0])
+    return col, op, valor
+
+
+class TablaCausas:
+    def __init__(self, df: pd.DataFrame):
+        df = df.reindex(columns=list(COLUMNAS))
+        self.codigo = df["CODIGO"].fillna("").astype(str).str.upper().to_numpy(dtype="U")
+        self.nombre = df["NOMBRE"].fillna("").astype(str).to_numpy(dtype="U")
+        self.casos = pd.to_numeric(df["CASOS"], errors="coerce").fillna(0).astype(np.int64).to_numpy()
+        self.n = len(df)
+        # versiones normalizadas (sin tildes, mayúsculas) para "contains"
+        self._texto = {"CODIGO": self.codigo,
+                       "NOMBRE": np.array([_norm_col(s) for s in self.nombre], dtype="U")}
+        # orden por defecto: casos desc, código asc (el Top-10 es la primera página)
+        por_codigo = np.argsort(self.codigo, kind="stable")
+        self._codigos_ordenados = self.codigo[por_codigo]
+        self._por_codigo = por_codigo
+        defecto = np.lexsort((self.codigo, -self.casos))
+        self._orden = {
+            ("CODIGO", "asc"): por_codigo,
+            ("CODIGO", "desc"): por_codigo[::-1],
+            ("NOMBRE", "asc"): np.argsort(self._texto["NOMBRE"], kind="stable"),
+            ("CASOS", "asc"): np.lexsort((self.codigo, self.casos)),
+            ("CASOS", "desc"): defecto,
+        }
+        self._orden[("NOMBRE", "desc")] = self._orden[("NOMBRE", "asc")][::-1]
+        self._defecto = defecto
+        # rango (posición) de cada fila en cada orden ascendente, para ordenar por varias columnas
+        self._rango = {}
+        for col in COLUMNAS:
+            r = np.empty(self.n, dtype=np.int64)
+            r[self._orden[(col, "asc")]] = np.arange(self.n)
+            self._rango[col] = r
+
+    # ---- filtros
+    def _mascara_termino(self, col: str, op: str, valor: str) -> np.ndarray | None:
+        if col not in COLUMNAS:
+            return None
+        if col in NUMERICAS:
+            try:
+                x = float(valor)
+            except ValueError:
+                return None
+            v = self.casos
+            return {"eq": v == x, "contains": v == x, "ne": v != x, "lt": v < x, "le": v <= x,
+                    "gt": v > x, "ge": v >= x}.get(op)
+        if col == "CODIGO":
+            valor = valor.strip().upper().replace(".", "")
+            # prefijo ("I2", "I21") o código exacto: búsqueda binaria en los códigos ordenados;
+            # "contains" busca la subcadena en cualquier posición (abajo, como NOMBRE)
+            if op in ("datestartswith", "eq") and valor.isalnum():
+                return self._rango_codigo(valor, prefijo=op == "datestartswith")
+        else:
+            valor = _norm_col(valor)
+        texto = self._texto[col]
+        if op in ("contains", "datestartswith"):
+            if not valor:
+                return None
+            pos = np.char.find(texto, valor)
+            return pos == 0 if op == "datestartswith" else pos >= 0
+        return {"eq": texto == valor, "ne": texto != valor, "lt": texto < valor, "le": texto <= valor,
+                "gt": texto > valor, "ge": texto >= valor}.get(op)
+
+    def _rango_codigo(self, valor: str, prefijo: bool) -> np.ndarray:
+        # filas cuyo código empieza con `valor` (o es igual a él): un rango de los códigos ordenados
+        lo = np.searchsorted(self._codigos_ordenados, valor, side="left")
+        hi = np.searchsorted(self._codigos_ordenados, valor + "￿" if prefijo else valor, side="right")
+        m = np.zeros(self.n, dtype=bool)
+        m[self._por_codigo[lo:hi]] = True
+        return m
+
+    def filtrar(self, filter_query: str | None) -> np.ndarray | None:
+        # None = sin filtro (todas las filas)
+        if not filter_query:
+            return None
+        mascara = None
+        for parte in filter_query.split(" && "):
+            t = _partir_filtro(parte)
+            m = self._mascara_termino(*t) if t else None
+            if m is None:
+                continue
+            mascara = m if mascara is None else mascara & m
+        return mascara
+
+    # ---- orden
+    def ordenar(self, sort_by: list | None) -> np.ndarray:
+        claves = [(s.get("column_id"), s.get("direction", "asc")) for s in (sort_by or [])
+                  if s.get("column_id") in COLUMNAS]
+        if not claves:
+            return self._defecto
+        if len(claves) == 1:
+            return self._orden[claves[0]]
+        # varias columnas: lexsort sobre los rangos precalculados (la última clave es la primaria)
+        return np.lexsort([self._rango[c] if d == "asc" else -self._rango[c] for c, d in reversed(claves)])
+
+    # ---- página
+    def pagina(self, page_current: int, page_size: int, sort_by=None, filter_query=None) -> tuple[list, int]:
+        orden = self.ordenar(sort_by)
+        mascara = self.filtrar(filter_query)
+        if mascara is not None:
+            orden = orden[mascara[orden]]
+        tam = max(1, int(page_size or 10))
+        n_paginas = max(1, math.ceil(len(orden) / tam))
+        i = min(max(0, int(page_current or 0)), n_paginas - 1)
+        idx = orden[i * tam:(i + 1) * tam]
+        filas = [{"CODIGO": str(c), "NOMBRE": str(n), "CASOS": int(k)}
+                 for c, n, k in zip(self.codigo[idx], self.nombre[idx], self.casos[idx])]
+        return filas, n_paginas
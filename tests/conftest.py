@@ -0,0 +1,5 @@
+# Los módulos del panel están en la raíz del repositorio (sin paquete instalable)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
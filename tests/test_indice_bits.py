@@ -0,0 +1,78 @@
+# Índice de mapas de bits (indice_bits.IndiceBits) contra una máscara de NumPy fila por fila
+
+import numpy as np
+import pytest
+
+import indice_bits
+from cubo import _BASES, N_CAUSAS, N_EDAD, _descomponer, capitulo_cie10
+from indice_bits import IndiceBits, construir
+
+DPTOS = [5, 11, 25, 91]
+
+
+@pytest.fixture(scope="module")
+def datos():
+    rng = np.random.default_rng(7)
+    m = 5000
+    ano = rng.integers(2015, 2022, m)
+    dpto = rng.choice(DPTOS, m)
+    campos = [rng.integers(1, 40, m), rng.integers(0, 13, m), rng.integers(0, 3, m),
+              rng.integers(0, N_EDAD, m), rng.integers(0, N_CAUSAS, m)]   # como cubo._claves
+    k = ano * 100 + dpto
+    for v, base in zip(campos, _BASES):
+        k = k * base + v
+    claves = np.unique(k)
+    n = rng.integers(1, 6, len(claves))
+    c = _descomponer(claves)
+    cols = {"dpto": c["COD_DPTO"], "mpio": c["COD_DPTO"] * 1000 + c["COD_MUNIC"], "mes": c["MES"],
+            "sexo": c["SEXO"], "edad": c["EDAD"], "capitulo": capitulo_cie10(c["CAUSA"]),
+            "ANO": c["ANO"]}
+    return IndiceBits(construir(claves, n)), cols, n
+
+
+def _mascara(cols, filtro):
+    ok = np.ones(len(cols["dpto"]), dtype=bool)
+    for eje, valores in filtro.items():
+        ok &= np.isin(cols[eje], valores)
+    return ok
+
+
+FILTROS = [
+    {},
+    {"dpto": [11]},
+    {"dpto": [5, 91], "sexo": [1]},
+    {"mes": [1, 2, 12], "edad": [0, 3]},
+    {"dpto": [25], "mes": [6], "sexo": [0, 2], "capitulo": [9, 10]},
+    {"sexo": []},                                                    # eje pedido sin valores: nada
+]
+
+
+@pytest.mark.parametrize("filtro", FILTROS)
+@pytest.mark.parametrize("bloque", [indice_bits.BLOQUE, 1])       # de a una palabra: varios bloques
+def test_contar_igual_a_mascara(datos, filtro, bloque, monkeypatch):
+    monkeypatch.setattr(indice_bits, "BLOQUE", bloque)
+    idx, cols, n = datos
+    ok = _mascara(cols, filtro)
+    assert int(idx.contar(**filtro)) == int(n[ok].sum())
+    por_ano = idx.contar(("ANO",), **filtro)
+    esperado = np.bincount(np.searchsorted(idx.eje_ano, cols["ANO"][ok]), weights=n[ok],
+                           minlength=len(idx.eje_ano))
+    assert por_ano.tolist() == esperado.astype(np.int64).tolist()
+    por_dpto = idx.contar(("DPTO",), **filtro)
+    assert {int(d): int(v) for d, v in zip(idx.dptos, por_dpto)} == \
+        {d: int(n[ok & (cols["dpto"] == d)].sum()) for d in DPTOS}
+
+
+def test_filas_sin_duplicados_y_ordenadas(datos):
+    idx, cols, _ = datos
+    pos = idx.filas(dpto=[5, 25], sexo=[1])
+    assert len(pos) == int(_mascara(cols, {"dpto": [5, 25], "sexo": [1]}).sum())
+    assert np.all(np.diff(pos) > 0)
+
+
+def test_revisar_se_llama_por_bloque(datos, monkeypatch):
+    monkeypatch.setattr(indice_bits, "BLOQUE", 1)
+    idx, _, _ = datos
+    llamadas = []
+    idx.contar(("MES",), revisar=lambda: llamadas.append(1), sexo=[0])
+    assert len(llamadas) >= -(-idx.filas_total // 64)
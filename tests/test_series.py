@@ -0,0 +1,50 @@
+# LTTB de la pestaña de tendencia (series.lttb) y su uso en Series.seleccion
+
+import numpy as np
+import pytest
+
+from series import MIN_PUNTOS, Series, lttb
+
+
+@pytest.fixture(scope="module")
+def y():
+    rng = np.random.default_rng(3)
+    return rng.integers(0, 1000, (3, 500)).astype(float)
+
+
+@pytest.mark.parametrize("n_salida", [MIN_PUNTOS, 10, 137, 499])
+def test_forma_y_extremos(y, n_salida):
+    idx = lttb(np.arange(y.shape[1]), y, n_salida)
+    assert idx.shape == (len(y), n_salida)
+    assert (idx[:, 0] == 0).all() and (idx[:, -1] == y.shape[1] - 1).all()
+    assert (np.diff(idx, axis=1) > 0).all()          # crecientes, sin repetidos
+
+
+@pytest.mark.parametrize("n_salida", [500, 800, MIN_PUNTOS - 1])
+def test_sin_reduccion(y, n_salida):
+    # con tantos puntos como la serie (o menos de MIN_PUNTOS) no se reduce nada
+    idx = lttb(np.arange(y.shape[1]), y, n_salida)
+    assert idx.tolist() == [list(range(y.shape[1]))] * len(y)
+
+
+def test_conserva_el_pico():
+    y = np.zeros((1, 300))
+    y[0, 123] = 50.0
+    assert 123 in lttb(np.arange(300), y, 20)[0]
+
+
+def test_revisar_por_bucket(y):
+    llamadas = []
+    lttb(np.arange(y.shape[1]), y, 300, revisar=lambda: llamadas.append(1))
+    assert len(llamadas) >= 1
+
+
+def test_seleccion_reduce_al_ancho():
+    meses = np.arange("2000-01", "2020-01", dtype="datetime64[M]")
+    s = Series([0, 5], meses, np.arange(2 * len(meses)).reshape(2, -1))
+    xs, ys = s.seleccion([0, 5, 99], "mes", ancho=50)
+    assert [len(x) for x in xs] == [50, 50, 50]
+    assert xs[0][0] == "2000-01" and xs[0][-1] == "2019-12"
+    assert ys[2].sum() == 0                          # código sin serie: ceros
+    xs, _ = s.seleccion([0], "ano")
+    assert xs[0] == [f"{a}-01" for a in range(2000, 2020)]
@@ -0,0 +1,42 @@
+# Operadores del filtro de la DataTable sobre CODIGO (tabla_causas.TablaCausas)
+
+import pandas as pd
+import pytest
+
+from tabla_causas import TablaCausas
+
+CODIGOS = ["A09X", "C349", "I210", "I219", "I251", "J189", "X210", "X599"]
+
+
+@pytest.fixture
+def tabla():
+    return TablaCausas(pd.DataFrame({"CODIGO": CODIGOS, "NOMBRE": [f"causa {c}" for c in CODIGOS],
+                                     "CASOS": range(len(CODIGOS), 0, -1)}))
+
+
+def _codigos(t, consulta):
+    return sorted(t.codigo[t.filtrar(consulta)].tolist())
+
+
+@pytest.mark.parametrize("consulta, esperados", [
+    ("{CODIGO} contains 21", ["I210", "I219", "X210"]),           # subcadena en cualquier posición
+    ('{CODIGO} contains "I2"', ["I210", "I219", "I251"]),
+    ("{CODIGO} contains 9X", ["A09X"]),
+    ("{CODIGO} datestartswith I21", ["I210", "I219"]),             # prefijo
+    ("{CODIGO} datestartswith 21", []),
+    ("{CODIGO} = I219", ["I219"]),                                 # exacto
+    ("{CODIGO} = I21", []),
+    ("{CODIGO} = i21.9", ["I219"]),                                # mayúsculas y punto como en CIE-10
+    ("{CODIGO} != I219", [c for c in CODIGOS if c != "I219"]),
+    ("{CODIGO} > X", ["X210", "X599"]),
+    ("{CODIGO} contains 21 && {CASOS} > 5", ["I210"]),
+])
+def test_operadores_codigo(tabla, consulta, esperados):
+    assert _codigos(tabla, consulta) == esperados
+
+
+def test_contains_igual_a_subcadena(tabla):
+    # contra la búsqueda directa en Python, para todas las subcadenas de los códigos
+    subcadenas = {c[i:j] for c in CODIGOS for i in range(len(c)) for j in range(i + 1, len(c) + 1)}
+    for s in subcadenas:
+        assert _codigos(tabla, f"{{CODIGO}} contains {s}") == sorted(c for c in CODIGOS if s in c)
@@ -0,0 +1,44 @@
+# Top N de municipios de la torta (top_municipios.TopMunicipios): etiquetas únicas en el país
+
+import numpy as np
+import pandas as pd
+
+from cubo import TOTAL
+from divipola import Divipola
+from top_municipios import TopMunicipios
+
+# nombres que se repiten entre departamentos, como en DIVIPOLA
+DIVIPOLA = pd.DataFrame([
+    ("Antioquia", "La Unión", 5, 400), ("Nariño", "La Unión", 52, 399), ("Valle del Cauca", "La Unión", 76, 400),
+    ("Antioquia", "Rionegro", 5, 615), ("Santander", "Rionegro", 68, 615),
+    ("Valle del Cauca", "Candelaria", 76, 130), ("Atlántico", "Candelaria", 8, 141),
+    ("Antioquia", "Medellín", 5, 1),
+], columns=["DEPARTAMENTO", "MUNICIPIO", "COD_DPTO", "COD_MUNIC"])
+
+
+def _top_nacional():
+    d = Divipola(DIVIPOLA)
+    cods = np.append(d.municipios.index.to_numpy(dtype=np.int64), [5002, 52002])   # sin nombre en DIVIPOLA
+    muertes = np.arange(len(cods)) + 10
+    return d, cods, TopMunicipios(cods // 1000, cods, d.nombres(cods), muertes, d.etiquetas(cods))
+
+
+def test_etiquetas_nacionales_unicas():
+    _, cods, top = _top_nacional()
+    nombres, muertes, otros, n_otros = top.top(TOTAL, 20)
+    assert len(nombres) == len(cods) and len(set(nombres)) == len(nombres)
+    assert "La Unión (Nariño)" in nombres and "Rionegro (Santander)" in nombres
+    assert otros == 0 and n_otros == 0 and muertes.sum() == (np.arange(len(cods)) + 10).sum()
+
+
+def test_codigo_sin_nombre_completo():
+    d, _, top = _top_nacional()
+    assert d.nombres([5002, 52002]) == ["Mpio. 05002", "Mpio. 52002"]
+    assert "Mpio. 05002 (Antioquia)" in top.top(TOTAL, 20)[0]
+
+
+def test_dentro_del_departamento_solo_el_nombre():
+    _, _, top = _top_nacional()
+    nombres, *_ = top.top(5, 3)
+    assert set(nombres) <= {"La Unión", "Rionegro", "Medellín", "Mpio. 05002"}
+    assert len(nombres) == 3
@@ -0,0 +1,61 @@
+# -----------------------------------------------------------------------------
+# Agregado municipal de la torta: Top N de municipios y el resto como "Otros"
+#   - Todos los municipios de DIVIPOLA (más los que traigan los microdatos con
+#     un código que DIVIPOLA no tenga), con sus muertes, agrupados por
+#     departamento y, dentro de cada grupo, de mayor a menor. El total nacional
+#     es un grupo más con todos los municipios
+#   - El orden y la suma acumulada de cada grupo se fijan al armarlo: el Top N
+#     es un tramo del grupo y "Otros" = total − acumulado hasta N, en tiempo
+#     constante sea cual sea el departamento o la posición del slider
+#   - Etiquetas: el nombre solo dentro de un departamento; en el grupo nacional
+#     "Nombre (Departamento)", porque los nombres se repiten entre departamentos
+#     y la torta juntaría porciones con la misma etiqueta
+#   - Conteos ya filtrados (cruces del índice de bits): top_n() con selección
+#     parcial (np.argpartition), como CatalogoCIE10.top_n
+# -----------------------------------------------------------------------------
+
+import numpy as np
+
+from cubo import TOTAL
+
+
+def top_n(cods: np.ndarray, muertes: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray, int, int]:
+    # (códigos y muertes del Top N, de mayor a menor; muertes y municipios del resto)
+    muertes = np.asarray(muertes, dtype=np.int64)
+    con_muertes = int(np.count_nonzero(muertes))
+    n = max(0, min(int(n), con_muertes))
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), 0, 0
+    idx = np.argpartition(-muertes, n - 1)[:n]       # selección parcial O(N)
+    idx = idx[np.lexsort((idx, -muertes[idx]))]      # solo se ordenan los n elegidos
+    top = muertes[idx]
+    return np.asarray(cods)[idx], top, int(muertes.sum() - top.sum()), con_muertes - n
+
+
+class TopMunicipios:
+    def __init__(self, dpto, cod_mpio, nombres, muertes, etiquetas=None):
+        # una fila por municipio: departamento (2 dígitos), código (5 dígitos), nombre y muertes;
+        # etiquetas: las del total nacional, únicas en el país (por defecto, los nombres)
+        dpto = np.asarray(dpto, dtype=np.int64)
+        muertes = np.asarray(muertes, dtype=np.int64)
+        nombres = np.asarray(nombres, dtype=object)
+        etiquetas = nombres if etiquetas is None else np.asarray(etiquetas, dtype=object)
+        cod_mpio = np.asarray(cod_mpio, dtype=np.int64)
+        self.n_municipios = len(dpto)
+        self._grupos = {}
+        grupos = [(int(d), np.flatnonzero(dpto == d)) for d in np.unique(dpto)]
+        for d, filas in [*grupos, (TOTAL, np.arange(len(dpto)))]:
+            # de mayor a menor; empates por código (orden estable entre builds)
+            filas = filas[np.lexsort((cod_mpio[filas], -muertes[filas]))]
+            n = muertes[filas]
+            self._grupos[d] = (list((etiquetas if d == TOTAL else nombres)[filas]), n,
+                               np.concatenate([[0], np.cumsum(n)]), int(np.count_nonzero(n)))
+
+    def top(self, dpto: int, n: int) -> tuple[list[str], np.ndarray, int, int]:
+        # (nombres y muertes del Top N, muertes y municipios de "Otros"); sin municipios con 0
+        grupo = self._grupos.get(int(dpto))
+        if grupo is None:
+            return [], np.zeros(0, dtype=np.int64), 0, 0
+        nombres, muertes, acumulado, con_muertes = grupo
+        n = max(0, min(int(n), con_muertes))
+        return nombres[:n], muertes[:n], int(acumulado[-1] - acumulado[n]), con_muertes - n
@@ -0,0 +1,224 @@
+# -----------------------------------------------------------------------------
+# Callbacks pesados como trabajos en segundo plano (background callbacks de Dash)
+#   - La petición deja el trabajo en una cola y vuelve de inmediato; el navegador
+#     pregunta por el resultado cada INTERVALO_MS. Cada worker corre sus trabajos
+#     en HILOS hilos propios (con la foto de datos de la petición que los lanzó)
+#   - Hilos y no procesos: un fork desde un worker con varios hilos puede heredar
+#     un mutex de SQLite tomado por otro hilo y el hijo queda colgado para siempre
+#     (el DiskcacheManager de Dash hace ese fork por cada llamada)
+#   - Cancelación: si una entrada cambia antes de que termine, el navegador manda
+#     el trabajo anterior en la petición nueva (y con cancelar=[Input(...)] al
+#     activar esa entrada). Si aún no empezó, sale de la cola; si ya corre, se
+#     detiene en su próximo punto de control
+#   - La cancelación es cooperativa (un hilo no se puede matar): los puntos de
+#     control son avanzar() y revisar(). Los bucles
+#     largos (IndiceBits.contar, Series.seleccion / lttb) llaman revisar() por
+#     bloque, así que un trabajo reemplazado deja de gastar CPU en milisegundos
+#   - Avance: avanzar("texto") desde el callback se muestra en indicador(id)
+#   - Resultados, avance y estado de cada trabajo van por diskcache en
+#     data/.cache/trabajos: cualquier worker de gunicorn atiende las consultas.
+#     La clave lleva las entradas y el sello de los datos, y el resultado dura
+#     EXPIRA_S: otra petición igual en ese lapso lo reutiliza sin encolar nada
+#   - Sin diskcache o con MORTALIDAD_TRABAJOS=0 los callbacks corren como
+#     siempre, dentro de la petición, y avanzar() no hace nada
+# -----------------------------------------------------------------------------
+
+import functools
+import itertools
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from dash import html
+from dash.dependencies import Output
+from dash.exceptions import PreventUpdate
+
+import preparacion
+from cache_datos import CACHE_DIR
+
+try:
+    import diskcache
+    from dash.long_callback.managers import BaseLongCallbackManager
+except ImportError:
+    diskcache = None
+    BaseLongCallbackManager = object
+
+DIR = CACHE_DIR / "trabajos"
+HILOS = int(os.environ.get("MORTALIDAD_TRABAJOS_HILOS", "2"))
+INTERVALO_MS = 250      # sondeo del navegador mientras el trabajo corre
+EXPIRA_S = 60           # vida de un resultado (la caché larga es cache_figuras)
+MAX_S = 600             # marca de "corriendo" de un trabajo cuyo worker murió
+REVISAR_CADA_S = 0.02   # revisar() consulta la marca de cancelación a lo sumo con este intervalo
+VISIBLE = {"display": "block", "color": "#888", "fontSize": "13px", "margin": "4px 0"}
+OCULTO = {"display": "none"}
+
+_local = threading.local()
+
+
+class Cancelado(BaseException):
+    # fuera de Exception: Dash no lo toma por un error del callback ni guarda un resultado
+    pass
+
+
+class GestorHilos(BaseLongCallbackManager):
+    # gestor de background callbacks de Dash con los trabajos en un pool de hilos del worker
+    def __init__(self, cache, cache_by=None, expire=None):
+        super().__init__(cache_by)
+        self.handle, self.expire = cache, expire
+        self._ids = itertools.count(1)
+        self._pool, self._pid = None, None
+        self._futuros = {}
+
+    def _cola(self) -> ThreadPoolExecutor:
+        # un pool por proceso (los workers de gunicorn se crean con fork)
+        if self._pid != os.getpid():
+            self._pool = ThreadPoolExecutor(max_workers=HILOS, thread_name_prefix="trabajos")
+            self._pid, self._futuros = os.getpid(), {}
+        return self._pool
+
+    # ---- Trabajos
+    def make_job_fn(self, fn, progress, key=None):
+        # el avance no llega como argumento (set_progress): el callback llama avanzar()
+        return functools.partial(self._correr, fn)
+
+    def call_job_fn(self, key, job_fn, args, context):
+        job = f"{os.getpid()}-{next(self._ids)}"
+        if self.result_ready(key):
+            return job          # resultado vigente de otra petición igual: nada que correr
+        self.handle.set(f"{job}-corriendo", True, expire=MAX_S)
+        self._futuros[job] = self._cola().submit(job_fn, job, key, args, preparacion.actual())
+        return job
+
+    def _correr(self, fn, job: str, key: str, args, foto):
+        ultima = [0.0]
+
+        def revisar(forzar=False):
+            ahora = time.monotonic()
+            if not forzar and ahora - ultima[0] < REVISAR_CADA_S:
+                return
+            ultima[0] = ahora
+            if self.handle.get(f"{job}-cancelar"):
+                raise Cancelado
+
+        def aviso(valor):
+            revisar(forzar=True)
+            self.handle.set(self._make_progress_key(key), [valor], expire=self.expire)
+
+        preparacion.fijar(foto)
+        _local.aviso, _local.revisar = aviso, revisar
+        try:
+            if self.handle.get(f"{job}-cancelar"):
+                return
+            try:
+                resultado = fn(**args) if isinstance(args, dict) else fn(*args)
+            except PreventUpdate:
+                resultado = {"_dash_no_update": "_dash_no_update"}
+            except Exception as e:
+                resultado = {"long_callback_error": {"msg": str(e), "tb": traceback.format_exc()}}
+            self.handle.set(key, resultado, expire=self.expire)
+        except Cancelado:
+            pass
+        finally:
+            _local.aviso = _local.revisar = None
+            preparacion.soltar()
+            self._futuros.pop(job, None)
+            self.handle.delete(f"{job}-corriendo")
+            self.handle.delete(f"{job}-cancelar")
+
+    def terminate_job(self, job):
+        if not job or not self.job_running(job):
+            return
+        futuro = self._futuros.get(job)
+        if futuro is not None and futuro.cancel():
+            # aún en la cola de este worker: no llega a correr
+            self._futuros.pop(job, None)
+            self.handle.delete(f"{job}-corriendo")
+        else:
+            # corriendo, o en otro worker: se detiene en su próximo avanzar()
+            self.handle.set(f"{job}-cancelar", True, expire=MAX_S)
+
+    def terminate_unhealthy_job(self, job):
+        return False
+
+    def job_running(self, job):
+        return bool(job) and self.handle.get(f"{job}-corriendo") is not None
+
+    # ---- Resultados (como el DiskcacheManager de Dash)
+    def get_progress(self, key):
+        clave = self._make_progress_key(key)
+        avance = self.handle.get(clave)
+        if avance:
+            self.handle.delete(clave)
+        return avance
+
+    def result_ready(self, key):
+        return self.handle.get(key) is not None
+
+    def get_result(self, key, job):
+        resultado = self.handle.get(key, self.UNDEFINED)
+        if resultado is self.UNDEFINED:
+            return self.UNDEFINED
+        self.handle.delete(self._make_progress_key(key))
+        self.terminate_job(job)
+        return resultado
+
+    def get_updated_props(self, key):
+        return {}           # sin set_props en los trabajos
+
+    def clear_cache_entry(self, key):
+        self.handle.delete(key)
+
+
+def _gestor() -> GestorHilos | None:
+    if diskcache is None or os.environ.get("MORTALIDAD_TRABAJOS", "1") != "1":
+        return None
+    try:
+        DIR.mkdir(parents=True, exist_ok=True)
+        cache = diskcache.Cache(str(DIR))
+        cache.close()       # se reabre al usarla: ninguna conexión SQLite cruza el fork de gunicorn
+        return GestorHilos(cache, cache_by=[preparacion.sello], expire=EXPIRA_S)
+    except OSError as e:
+        print(f"[trabajos] deshabilitados: {e}")
+        return None
+
+
+GESTOR = _gestor()      # para Dash(background_callback_manager=...)
+
+
+def avanzar(texto: str) -> None:
+    # mensaje de la etapa en curso; fuera de un trabajo no hace nada.
+    # Es también el punto donde un trabajo reemplazado se detiene
+    aviso = getattr(_local, "aviso", None)
+    if aviso is not None:
+        aviso(texto)
+
+
+def revisar() -> None:
+    # punto de cancelación sin mensaje, para llamar por bloque dentro de bucles largos;
+    # fuera de un trabajo no hace nada
+    revisar_ = getattr(_local, "revisar", None)
+    if revisar_ is not None:
+        revisar_()
+
+
+def indicador(id_componente: str):
+    # línea de avance; Dash la muestra solo mientras corre el trabajo
+    return html.Small(id=id_componente, style=OCULTO)
+
+
+def callback(app, *dependencias, progreso: str, cancelar=(), **kw):
+    # como @app.callback; con GESTOR, en segundo plano con el avance en `progreso`.
+    # Devuelve la función sin envolver (benchmark.py la llama directamente)
+    def deco(fn):
+        if GESTOR is None:
+            app.callback(*dependencias, **kw)(fn)
+            return fn
+        app.callback(*dependencias, background=True, interval=INTERVALO_MS,
+                     progress=[Output(progreso, "children")],
+                     progress_default=[None],
+                     running=[(Output(progreso, "style"), VISIBLE, OCULTO)],
+                     cancel=list(cancelar) or None, **kw)(fn)
+        return fn
+    return deco